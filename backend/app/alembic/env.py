@@ -32,6 +32,16 @@ def get_url():
     return str(settings.db_dsn)
 
 
+# On Postgres the primary key of the partitioned runs table, (id, run_at), stands for it
+RUN_KEY = "monitored_prompt_runs_id_run_at_key"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "unique_constraint" and name == RUN_KEY:
+        return context.get_context().dialect.name != "postgresql"
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -48,6 +58,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -73,7 +84,12 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            compare_type=True,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,118 @@
+"""run partitions
+
+Revision ID: 5a6c803e7713
+Revises: 8206ce925bb9
+Create Date: 2026-10-18 03:28:47.282917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a6c803e7713'
+down_revision: Union[str, None] = '8206ce925bb9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RUN_FOREIGN_KEYS = {
+    'monitored_prompt_run_payloads': 'monitored_prompt_run_payloads_run_id_fkey',
+    'run_citations': 'run_citations_run_id_fkey',
+}
+
+# Months of the existing runs up to 3 months ahead, scheduled.maintain_run_partitions
+# creates the next ones. Same names and bounds as app.crud.run_partitions.
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    partition_month timestamp;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(
+            date_trunc('month', coalesce(min(run_at), now() AT TIME ZONE 'UTC')),
+            date_trunc('month', greatest(max(run_at), now() AT TIME ZONE 'UTC')) + interval '3 months',
+            interval '1 month'
+        )
+        FROM monitored_prompt_runs_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF monitored_prompt_runs FOR VALUES FROM (%L) TO (%L)',
+            'monitored_prompt_runs_' || to_char(partition_month, 'YYYY_MM'),
+            partition_month::date,
+            (partition_month + interval '1 month')::date
+        );
+    END LOOP;
+END $$
+"""
+
+
+def _create_run_constraints(primary_key: list[str]) -> None:
+    op.create_primary_key('monitored_prompt_runs_pkey', 'monitored_prompt_runs', primary_key)
+    op.create_foreign_key('monitored_prompt_runs_monitored_prompt_id_fkey', 'monitored_prompt_runs', 'monitored_prompts', ['monitored_prompt_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_monitored_prompt_runs_monitored_prompt_id'), 'monitored_prompt_runs', ['monitored_prompt_id'], unique=False)
+    op.create_index('ix_monitored_prompt_runs_prompt_id_run_at', 'monitored_prompt_runs', ['monitored_prompt_id', 'run_at'], unique=False)
+
+
+def _partition_runs() -> None:
+    # Copied to a table partitioned by month of run_at, its key has to include run_at
+    op.rename_table('monitored_prompt_runs', 'monitored_prompt_runs_unpartitioned')
+    op.execute('CREATE TABLE monitored_prompt_runs (LIKE monitored_prompt_runs_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (run_at)')
+    op.execute(CREATE_PARTITIONS)
+    op.execute('INSERT INTO monitored_prompt_runs SELECT * FROM monitored_prompt_runs_unpartitioned')
+    op.execute('ALTER SEQUENCE monitored_prompt_runs_id_seq OWNED BY NONE')
+    op.drop_table('monitored_prompt_runs_unpartitioned')
+    op.execute('ALTER SEQUENCE monitored_prompt_runs_id_seq OWNED BY monitored_prompt_runs.id')
+    # Built on every partition, and on the ones created later
+    _create_run_constraints(['id', 'run_at'])
+    # Autovacuum analyzes the partitions, never the partitioned table
+    op.execute('ANALYZE monitored_prompt_runs')
+
+
+def _unpartition_runs() -> None:
+    op.execute('CREATE TABLE monitored_prompt_runs_unpartitioned (LIKE monitored_prompt_runs INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO monitored_prompt_runs_unpartitioned SELECT * FROM monitored_prompt_runs')
+    op.execute('ALTER SEQUENCE monitored_prompt_runs_id_seq OWNED BY NONE')
+    op.drop_table('monitored_prompt_runs')
+    op.rename_table('monitored_prompt_runs_unpartitioned', 'monitored_prompt_runs')
+    op.execute('ALTER SEQUENCE monitored_prompt_runs_id_seq OWNED BY monitored_prompt_runs.id')
+    _create_run_constraints(['id'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tables referencing runs carry their run_at, part of the runs' key on Postgres
+    for table, foreign_key in RUN_FOREIGN_KEYS.items():
+        op.add_column(table, sa.Column('run_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET run_at = (SELECT run_at FROM monitored_prompt_runs WHERE monitored_prompt_runs.id = {table}.run_id)')
+        # Left behind by deleted runs, SQLite doesn't enforce foreign keys
+        op.execute(f'DELETE FROM {table} WHERE run_at IS NULL')
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('run_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.drop_constraint(foreign_key, type_='foreignkey')
+    if op.get_context().dialect.name == 'postgresql':
+        _partition_runs()
+    else:
+        # Foreign keys need a unique key to reference, Postgres' is the primary key
+        with op.batch_alter_table('monitored_prompt_runs') as batch_op:
+            batch_op.create_unique_constraint('monitored_prompt_runs_id_run_at_key', ['id', 'run_at'])
+    for table, foreign_key in RUN_FOREIGN_KEYS.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_foreign_key(foreign_key, 'monitored_prompt_runs', ['run_id', 'run_at'], ['id', 'run_at'], onupdate='CASCADE', ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, foreign_key in RUN_FOREIGN_KEYS.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(foreign_key, type_='foreignkey')
+    if op.get_context().dialect.name == 'postgresql':
+        _unpartition_runs()
+    else:
+        with op.batch_alter_table('monitored_prompt_runs') as batch_op:
+            batch_op.drop_constraint('monitored_prompt_runs_id_run_at_key', type_='unique')
+    for table, foreign_key in RUN_FOREIGN_KEYS.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_foreign_key(foreign_key, 'monitored_prompt_runs', ['run_id'], ['id'], ondelete='CASCADE')
+            batch_op.drop_column('run_at')
@@ -7,9 +7,13 @@ from sqlmodel import Session
 
 from app.api.v1.prompts import PromptMonitoringResponse
 from app.crud.company import get_company_by_id
-from app.crud.dashboard import get_dashboard_stats, get_prompts_citing_domain
+from app.crud.dashboard import (
+    get_dashboard_stats,
+    get_dashboard_trends,
+    get_prompts_citing_domain,
+)
 from app.db import get_db_dep
-from app.models.dashboard import DashboardStats
+from app.models.dashboard import DashboardStats, DashboardTrends
 
 router = APIRouter()
 
@@ -25,6 +29,22 @@ def read_dashboard_stats(
     return get_dashboard_stats(db, company_id)
 
 
+@router.get("/{company_id}/trends", response_model=DashboardTrends)
+def read_dashboard_trends(
+    company_id: int,
+    db: Annotated[Session, Depends(get_db_dep)],
+    days: int = 30,
+    provider: str | None = None,
+    domains: int = 10,
+) -> DashboardTrends:
+    company = get_company_by_id(db, company_id)
+    if company is None:
+        raise HTTPException(status_code=404)
+    if not 1 <= days <= 366 or not 0 <= domains <= 50:
+        raise HTTPException(status_code=400)
+    return get_dashboard_trends(db, company_id, days, provider, domains)
+
+
 @router.get(
     "/{company_id}/share_of_voice/{domain}",
     response_model=PromptMonitoringResponse,
@@ -1,13 +1,17 @@
+import tempfile
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlmodel import Session
+from starlette.background import BackgroundTask
 
 from app.api.deps import (
     get_available_prompts_count_dep,
     get_min_monitored_prompt_refresh_interval_seconds_dep,
 )
+from app.archive import export_company_runs
 from app.crud.company import get_company_by_id
 from app.crud.llm_costs import save_cost
 from app.crud.prompts import (
@@ -18,13 +22,18 @@ from app.crud.prompts import (
     get_monitored_prompt_by_id,
     get_monitored_prompt_run,
     get_monitored_prompt_runs,
+    get_run_raw_response,
     save_monitored_prompt,
     set_prompts_active,
     update_monitored_prompt,
 )
 from app.db import get_db_dep
 from app.llm.prompt_suggestions import create_prompts_from_guidance
-from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun
+from app.models.monitored_prompt import (
+    MonitoredPrompt,
+    MonitoredPromptRun,
+    MonitoredPromptRunItem,
+)
 from app.models.prompt_monitoring import PromptMonitoringItem
 from app.settings import settings
 from app.worker.scheduled.trigger_prompt_monitoring import trigger_prompt_monitoring
@@ -45,8 +54,8 @@ def trigger_prompt_monitoring_endpoint(
     has_valid_secret = settings.cron_secret in {x_cron_secret, bearer_token, token}
     if settings.cron_secret and not has_valid_secret:
         raise HTTPException(status_code=401)
-    trigger_prompt_monitoring()
-    return {"status": "success"}
+    stats = trigger_prompt_monitoring()
+    return {"status": "success", **stats}
 
 
 class PromptLimitResponse(BaseModel):
@@ -77,7 +86,7 @@ class PromptUpdatePayload(BaseModel):
 
 class PromptRunsResponse(BaseModel):
     total: int
-    items: list[MonitoredPromptRun]
+    items: list[MonitoredPromptRunItem]
 
 
 class PromptSuggestionsPayload(BaseModel):
@@ -104,6 +113,26 @@ class PromptIn(BaseModel):
     target_country: str = "US"
 
 
+@router.get("/{company_id}/runs/export")
+def export_runs(
+    company_id: int,
+    db: Annotated[Session, Depends(get_db_dep)],
+):
+    company = get_company_by_id(db, company_id)
+    if company is None:
+        raise HTTPException(status_code=404)
+    # Written with the request's session, then streamed from the file
+    file = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    export_company_runs(db, company_id, file)
+    file.seek(0)
+    return StreamingResponse(
+        iter(lambda: file.read(64 * 1024), b""),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="runs-{company_id}.jsonl.gz"'},
+        background=BackgroundTask(file.close),
+    )
+
+
 @router.post("/{company_id}", response_model=MonitoredPrompt)
 def add_monitored_prompt(
     company_id: int,
@@ -178,6 +207,10 @@ def get_prompt_run(
     run = get_monitored_prompt_run(db, run_id)
     if run is None or run.monitored_prompt_id != prompt_id:
         raise HTTPException(status_code=404)
+    raw_response = get_run_raw_response(db, run)
+    # Only for the response, not to be written back inline
+    db.expunge(run)
+    run.raw_response = raw_response
     return run
 
 
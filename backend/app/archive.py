@@ -0,0 +1,97 @@
+"""Archive of old monitored_prompt_runs, gzipped JSON lines partitioned by company and month:
+
+    <run_archive_dir>/company=<id>/month=<YYYY-MM>/runs-<first id>-<last id>.jsonl.gz
+
+One line per run, its columns plus company_id and the uncompressed raw_response.
+A run can end up in two files of its partition if archiving is interrupted
+between writing a file and deleting the runs, readers keep the first one.
+"""
+
+import gzip
+import json
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+from sqlmodel import Session
+
+from app.crud.prompts import iter_company_runs
+from app.models.monitored_prompt import MonitoredPromptRun
+from app.settings import settings
+
+
+def run_to_record(run: MonitoredPromptRun, company_id: int, raw_response: str | None) -> dict:
+    return {
+        **run.model_dump(mode="json", exclude={"raw_response"}),
+        "company_id": company_id,
+        "raw_response": raw_response,
+    }
+
+
+def get_partition_dir(company_id: int, month: str) -> Path:
+    return Path(settings.run_archive_dir) / f"company={company_id}" / f"month={month}"
+
+
+def write_archive_file(path: Path, records: Iterable[dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and renamed, readers never see a partial file
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+
+
+def archive_runs(company_id: int, month: str, records: list[dict]) -> Path:
+    path = get_partition_dir(company_id, month) / (
+        f"runs-{records[0]['id']}-{records[-1]['id']}.jsonl.gz"
+    )
+    write_archive_file(path, records)
+    return path
+
+
+def list_archive_files(company_id: int | None = None) -> list[tuple[int, Path]]:
+    """(company_id, path) of the archive files, by company, month and first run"""
+    root = Path(settings.run_archive_dir)
+    pattern = f"company={company_id}" if company_id is not None else "company=*"
+    files = []
+    for company_dir in root.glob(pattern):
+        for path in company_dir.glob("month=*/runs-*.jsonl.gz"):
+            first_id = int(path.name.split("-")[1])
+            files.append((int(company_dir.name.split("=")[1]), path.parent.name, first_id, path))
+    return [(company, path) for company, _, _, path in sorted(files)]
+
+
+def read_archive_file(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def iter_archived_runs(company_id: int | None = None) -> Iterator[dict]:
+    seen: set[int] = set()
+    partition = None
+    for _, path in list_archive_files(company_id):
+        if path.parent != partition:
+            # A run is only ever archived to the partition of its company and month
+            partition = path.parent
+            seen.clear()
+        for record in read_archive_file(path):
+            if record["id"] not in seen:
+                seen.add(record["id"])
+                yield record
+
+
+def export_company_runs(db: Session, company_id: int, file: BinaryIO):
+    """Writes the runs of the company, stored then archived ones, as gzipped JSON lines"""
+    exported: set[int] = set()
+    with gzip.open(file, "wt", encoding="utf-8", compresslevel=6) as f:
+        for run, run_company_id, raw_response in iter_company_runs(db, company_id):
+            assert run.id is not None
+            exported.add(run.id)
+            f.write(json.dumps(run_to_record(run, run_company_id, raw_response)) + "\n")
+        for record in iter_archived_runs(company_id):
+            # Archived but not deleted yet, see scheduled.archive_runs
+            if record["id"] not in exported:
+                f.write(json.dumps(record) + "\n")
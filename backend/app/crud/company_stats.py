@@ -0,0 +1,183 @@
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, col, delete, func, insert, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.models.company_stats import CompanyDomainCount, CompanyStats
+from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptResult, RunCitation
+from app.models.types import default_now
+
+STATS_COLUMNS = ("total_runs", "product_runs", "product_brand_mentions", "cited_runs")
+
+
+def _get_contributions(
+    db: Session, prompt_ids: Sequence[int] | SelectOfScalar[int | None]
+) -> tuple[Counter[tuple[int, str]], Counter[tuple[int, str]]]:
+    """What the latest runs of the prompts add to the stats and domain counts of
+    their companies, keyed by (company_id, column) and (company_id, domain)"""
+    latest = (
+        select(
+            MonitoredPromptResult.monitored_prompt_id,
+            func.max(MonitoredPromptResult.run_at).label("max_run_at"),
+        )
+        .where(col(MonitoredPromptResult.monitored_prompt_id).in_(prompt_ids))
+        .group_by(col(MonitoredPromptResult.monitored_prompt_id))
+        .subquery()
+    )
+    # Channels of a cycle share its run_at, the latest runs are all of them
+    runs = db.exec(
+        select(
+            MonitoredPrompt.company_id,
+            MonitoredPrompt.prompt_type,
+            MonitoredPromptResult.run_id,
+            MonitoredPromptResult.brand_mentioned,
+            MonitoredPromptResult.company_domain_rank,
+        )
+        .join(
+            latest,
+            (latest.c.monitored_prompt_id == MonitoredPromptResult.monitored_prompt_id)
+            & (latest.c.max_run_at == MonitoredPromptResult.run_at),
+        )
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptResult.monitored_prompt_id)
+        .where(col(MonitoredPrompt.is_active).is_(True))
+    ).all()
+    stats: Counter[tuple[int, str]] = Counter()
+    for company_id, prompt_type, _, brand_mentioned, company_domain_rank in runs:
+        stats[company_id, "total_runs"] += 1
+        if prompt_type == "product":
+            stats[company_id, "product_runs"] += 1
+            if brand_mentioned:
+                stats[company_id, "product_brand_mentions"] += 1
+        if company_domain_rank is not None:
+            stats[company_id, "cited_runs"] += 1
+    domains: Counter[tuple[int, str]] = Counter()
+    if runs:
+        # A domain counts once per run
+        citations = db.exec(
+            select(RunCitation.run_id, RunCitation.company_id, RunCitation.domain)
+            .where(col(RunCitation.run_id).in_([run[2] for run in runs]))
+            .distinct()
+        ).all()
+        domains.update((company_id, domain) for _, company_id, domain in citations)
+    return stats, domains
+
+
+def _check_dialect(db: Session):
+    dialect = db.bind.dialect.name  # type: ignore
+    if dialect != "postgresql" and dialect != "sqlite":
+        raise ValueError(f"Unsupported dialect: {dialect}")
+
+
+def _increment_stats(db: Session, company_id: int, values: dict[str, int]):
+    _check_dialect(db)
+    statement = postgresql.insert(CompanyStats).values(
+        company_id=company_id, updated_at=default_now(), **values
+    )
+    current = CompanyStats.__table__.c  # type: ignore
+    set_ = {column: current[column] + statement.excluded[column] for column in STATS_COLUMNS}
+    set_["updated_at"] = statement.excluded.updated_at
+    statement = statement.on_conflict_do_update(index_elements=["company_id"], set_=set_)
+    db.connection().execute(statement)
+
+
+def _increment_domain_counts(db: Session, company_id: int, counts: dict[str, int]):
+    _check_dialect(db)
+    statement = postgresql.insert(CompanyDomainCount).values(
+        [
+            {"company_id": company_id, "domain": domain, "runs": runs}
+            for domain, runs in counts.items()
+        ]
+    )
+    current = CompanyDomainCount.__table__.c  # type: ignore
+    statement = statement.on_conflict_do_update(
+        index_elements=["company_id", "domain"],
+        set_={"runs": current.runs + statement.excluded.runs},
+    )
+    db.connection().execute(statement)
+    db.exec(
+        delete(CompanyDomainCount).where(  # type: ignore
+            CompanyDomainCount.company_id == company_id,
+            col(CompanyDomainCount.domain).in_(counts),
+            col(CompanyDomainCount.runs) <= 0,
+        )
+    )
+
+
+@contextmanager
+def updating_company_stats(db: Session, prompt_ids: Sequence[int]) -> Iterator[None]:
+    """Applies what the block changes in the prompts, their runs, results or
+    citations to the stats of their companies. Not to be nested."""
+    before_stats, before_domains = _get_contributions(db, prompt_ids)
+    yield
+    db.flush()
+    after_stats, after_domains = _get_contributions(db, prompt_ids)
+    stats: dict[int, dict[str, int]] = {}
+    for company_id, column in before_stats.keys() | after_stats.keys():
+        change = after_stats[company_id, column] - before_stats[company_id, column]
+        if change:
+            stats.setdefault(company_id, {})[column] = change
+    domains: dict[int, dict[str, int]] = {}
+    for company_id, domain in before_domains.keys() | after_domains.keys():
+        change = after_domains[company_id, domain] - before_domains[company_id, domain]
+        if change:
+            domains.setdefault(company_id, {})[domain] = change
+    company_ids = stats.keys() | domains.keys()
+    if not company_ids:
+        return
+    existing = set(
+        db.exec(
+            select(CompanyStats.company_id).where(col(CompanyStats.company_id).in_(company_ids))
+        ).all()
+    )
+    for company_id in company_ids:
+        if company_id not in existing:
+            # Never built, or deleted to be rebuilt
+            rebuild_company_stats(db, company_id)
+            continue
+        _increment_stats(db, company_id, stats.get(company_id, {}))
+        if company_id in domains:
+            _increment_domain_counts(db, company_id, domains[company_id])
+    db.flush()
+
+
+def rebuild_company_stats(db: Session, company_id: int) -> CompanyStats:
+    """Recomputes the stats of the company from the latest runs of its prompts"""
+    prompt_ids = select(MonitoredPrompt.id).where(MonitoredPrompt.company_id == company_id)
+    stats, domains = _get_contributions(db, prompt_ids)
+    db.exec(delete(CompanyDomainCount).where(CompanyDomainCount.company_id == company_id))  # type: ignore
+    if domains:
+        db.exec(
+            insert(CompanyDomainCount),  # type: ignore
+            params=[
+                {"company_id": company_id, "domain": domain, "runs": runs}
+                for (_, domain), runs in domains.items()
+            ],
+        )
+    company_stats = db.merge(
+        CompanyStats(
+            company_id=company_id,
+            updated_at=default_now(),
+            **{column: stats[company_id, column] for column in STATS_COLUMNS},
+        )
+    )
+    db.flush()
+    return company_stats
+
+
+def get_company_stats(
+    db: Session, company_id: int
+) -> tuple[CompanyStats, Sequence[CompanyDomainCount]]:
+    # Incremented with plain statements, don't trust the session's copy
+    company_stats = db.get(CompanyStats, company_id, populate_existing=True)
+    if company_stats is None:
+        company_stats = rebuild_company_stats(db, company_id)
+    domain_counts = db.exec(
+        select(CompanyDomainCount)
+        .where(CompanyDomainCount.company_id == company_id)
+        .order_by(col(CompanyDomainCount.runs).desc(), col(CompanyDomainCount.domain).asc())
+        .execution_options(populate_existing=True)
+    ).all()
+    return company_stats, domain_counts
@@ -1,16 +1,31 @@
 from __future__ import annotations
 
-import json
+import datetime
 from collections import Counter
-from collections.abc import Sequence
 
-from sqlmodel import Session, case, col, func, select
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, case, col, func, select, tuple_
 
 from app.crud.company import get_company_by_id, list_competitors
+from app.crud.company_stats import get_company_stats
+from app.crud.prompts import get_last_result
+from app.crud.rollups import get_daily_domain_stats, get_daily_stats
 from app.llm.prompt_analyzers.helpers import normalize_domain
-from app.models.dashboard import DashboardStats, ShareOfVoiceItem
-from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun
+from app.models.dashboard import (
+    DashboardStats,
+    DashboardTrends,
+    ShareOfVoiceItem,
+    ShareOfVoiceTrendPoint,
+    TrendPoint,
+)
+from app.models.monitored_prompt import (
+    MonitoredPrompt,
+    MonitoredPromptResult,
+    MonitoredPromptRun,
+    RunCitation,
+)
 from app.models.prompt_monitoring import PromptMonitoringItem
+from app.models.types import default_now
 
 
 def get_dashboard_stats(db: Session, company_id: int) -> DashboardStats:
@@ -26,57 +41,15 @@ def get_dashboard_stats(db: Session, company_id: int) -> DashboardStats:
         if d is not None
     }
 
-    latest_run_subq = (
-        select(
-            MonitoredPromptRun.monitored_prompt_id,
-            func.max(MonitoredPromptRun.run_at).label("max_run_at"),
-        )
-        .group_by(col(MonitoredPromptRun.monitored_prompt_id))
-        .subquery()
-    )
-
-    statement = (
-        select(
-            MonitoredPromptRun.brand_mentioned,
-            MonitoredPromptRun.company_domain_rank,
-            MonitoredPromptRun.top_domain,
-            MonitoredPromptRun.mentioned_pages,
-            MonitoredPrompt.prompt_type,
-        )
-        .join(
-            latest_run_subq,
-            (latest_run_subq.c.monitored_prompt_id == MonitoredPromptRun.monitored_prompt_id)
-            & (latest_run_subq.c.max_run_at == MonitoredPromptRun.run_at),
-        )
-        .join(
-            MonitoredPrompt,
-            col(MonitoredPrompt.id) == col(MonitoredPromptRun.monitored_prompt_id),
-        )
-        .where(
-            MonitoredPrompt.company_id == company_id,
-            col(MonitoredPrompt.is_active).is_(True),
-        )
-    )
-
-    runs: Sequence[tuple[bool, int | None, str | None, str | None, str | None]] = db.exec(
-        statement
-    ).all()
-    total = len(runs)
-    product_brand_mentions = sum(1 for r in runs if r[0] and r[4] == "product")
-    product_total = sum(1 for r in runs if r[4] == "product")
-    citations = sum(1 for r in runs if r[1] is not None)
-    domain_counts = Counter()
-    for run in runs:
-        seen_in_run = set()
-        if run[3] is not None:  # mentioned_pages
-            for page in json.loads(run[3]):  # type: ignore
-                domain = normalize_domain(page)
-                if domain not in seen_in_run:
-                    domain_counts[domain] += 1
-                    seen_in_run.add(domain)
+    company_stats, domain_counts = get_company_stats(db, company_id)
+    total = company_stats.total_runs
+    product_total = company_stats.product_runs
+    product_brand_mentions = company_stats.product_brand_mentions
+    citations = company_stats.cited_runs
 
     share_of_voice: list[ShareOfVoiceItem] = []
-    for domain, count in domain_counts.most_common():
+    for domain_count in domain_counts:
+        domain, count = domain_count.domain, domain_count.runs
         if domain.endswith(company_domain):
             domain_type = "company"
         elif any(domain.endswith(d) for d in competitor_domains):
@@ -96,92 +69,65 @@ def get_dashboard_stats(db: Session, company_id: int) -> DashboardStats:
     )
 
 
-def get_prompts_citing_domain(
-    db: Session, company_id: int, domain: str, offset: int, limit: int
-) -> tuple[int, list[PromptMonitoringItem]]:
-    norm = normalize_domain(domain)
-    total = db.exec(
-        select(func.count(func.distinct(MonitoredPrompt.id)))
-        .join(
-            MonitoredPromptRun,
-            MonitoredPromptRun.monitored_prompt_id == MonitoredPrompt.id,
-        )
-        .where(
-            MonitoredPrompt.company_id == company_id,
-            col(MonitoredPromptRun.mentioned_pages).ilike(f"%{norm}%"),
-        )
-    ).one()
-    openai_latest = (
-        select(
-            MonitoredPromptRun.monitored_prompt_id,
-            func.max(MonitoredPromptRun.run_at).label("max_run_at"),
+def get_dashboard_trends(
+    db: Session,
+    company_id: int,
+    days: int,
+    llm_provider: str | None = None,
+    domains: int = 10,
+) -> DashboardTrends:
+    """Daily stats of the last days, from the rollups of crud.rollups"""
+    since = default_now().date() - datetime.timedelta(days=days - 1)
+    totals: dict[datetime.date, Counter[str]] = {}
+    for row in get_daily_stats(db, company_id, since, llm_provider):
+        counts = totals.setdefault(row.day, Counter())
+        counts["runs"] += row.runs
+        counts["cited_runs"] += row.cited_runs
+        if row.prompt_type == "product":
+            counts["product_runs"] += row.runs
+            counts["product_brand_mentions"] += row.brand_mentions
+    points = [
+        TrendPoint(
+            day=day,
+            total_runs=counts["runs"],
+            ai_visibility_score=(
+                counts["product_brand_mentions"] / counts["product_runs"]
+                if counts["product_runs"]
+                else 0.0
+            ),
+            website_citation_share=counts["cited_runs"] / counts["runs"] if counts["runs"] else 0.0,
+        )
+        for day, counts in sorted(totals.items())
+    ]
+    share_of_voice = [
+        ShareOfVoiceTrendPoint(day=day, domain=domain, count=count)
+        for day, domain, count in get_daily_domain_stats(
+            db, company_id, since, domains, llm_provider
         )
-        .where(MonitoredPromptRun.llm_provider == "openai")
-        .group_by(MonitoredPromptRun.monitored_prompt_id)
-        .subquery()
-    )
+    ]
+    return DashboardTrends(points=points, share_of_voice=share_of_voice)
 
-    openai_subq = (
-        select(
-            MonitoredPromptRun.monitored_prompt_id.label("monitored_prompt_id"),
-            case(
-                (col(MonitoredPromptRun.brand_mentioned).is_(True), True),
-                (
-                    col(MonitoredPromptRun.company_domain_rank).is_not(None),
-                    True,
-                ),
-                else_=False,
-            ).label("openai_last_result"),
-        )
-        .join(
-            openai_latest,
-            (MonitoredPromptRun.monitored_prompt_id == openai_latest.c.monitored_prompt_id)
-            & (MonitoredPromptRun.run_at == openai_latest.c.max_run_at),
-        )
-        .where(MonitoredPromptRun.llm_provider == "openai")
-        .subquery()
-    )
 
-    gemini_latest = (
-        select(
-            MonitoredPromptRun.monitored_prompt_id,
-            func.max(MonitoredPromptRun.run_at).label("max_run_at"),
-        )
-        .where(MonitoredPromptRun.llm_provider == "gemini")
-        .group_by(MonitoredPromptRun.monitored_prompt_id)
-        .subquery()
+def _is_citing_run(company_id: int, norm: str):
+    # With run_at, Postgres only probes the partitions of the citing runs
+    citing_runs = select(RunCitation.run_id, RunCitation.run_at).where(
+        RunCitation.company_id == company_id, RunCitation.domain == norm
     )
+    return tuple_(MonitoredPromptRun.id, MonitoredPromptRun.run_at).in_(citing_runs)
 
-    gemini_subq = (
-        select(
-            MonitoredPromptRun.monitored_prompt_id.label("monitored_prompt_id"),
-            case(
-                (col(MonitoredPromptRun.brand_mentioned).is_(True), True),
-                (
-                    col(MonitoredPromptRun.company_domain_rank).is_not(None),
-                    True,
-                ),
-                else_=False,
-            ).label("gemini_last_result"),
-        )
-        .join(
-            gemini_latest,
-            (MonitoredPromptRun.monitored_prompt_id == gemini_latest.c.monitored_prompt_id)
-            & (MonitoredPromptRun.run_at == gemini_latest.c.max_run_at),
-        )
-        .where(MonitoredPromptRun.llm_provider == "gemini")
-        .subquery()
-    )
 
-    statement = (
+def _select_prompts_citing_domain(company_id: int, norm: str):
+    openai_result = aliased(MonitoredPromptResult)
+    gemini_result = aliased(MonitoredPromptResult)
+    return (
         select(
             MonitoredPrompt.id,
             MonitoredPrompt.prompt,
             MonitoredPrompt.prompt_type,
             MonitoredPrompt.is_active,
             MonitoredPrompt.created_at,
-            openai_subq.c.openai_last_result,
-            gemini_subq.c.gemini_last_result,
+            get_last_result(openai_result).label("openai_last_result"),  # type: ignore
+            get_last_result(gemini_result).label("gemini_last_result"),  # type: ignore
             func.coalesce(
                 func.avg(
                     case(
@@ -197,28 +143,49 @@ def get_prompts_citing_domain(
             MonitoredPromptRun.monitored_prompt_id == MonitoredPrompt.id,
         )
         .join(
-            openai_subq,
-            openai_subq.c.monitored_prompt_id == MonitoredPrompt.id,
+            openai_result,
+            (openai_result.monitored_prompt_id == MonitoredPrompt.id)
+            & (openai_result.llm_provider == "openai"),
             isouter=True,
         )
         .join(
-            gemini_subq,
-            gemini_subq.c.monitored_prompt_id == MonitoredPrompt.id,
+            gemini_result,
+            (gemini_result.monitored_prompt_id == MonitoredPrompt.id)
+            & (gemini_result.llm_provider == "gemini"),
             isouter=True,
         )
         .where(
             MonitoredPrompt.company_id == company_id,
-            col(MonitoredPromptRun.mentioned_pages).ilike(f"%{norm}%"),
+            _is_citing_run(company_id, norm),
         )
+        # The results' keys, one row per prompt and provider. Postgres doesn't match
+        # the last result expressions repeated here, they get their own parameters.
         .group_by(
             MonitoredPrompt.id,
-            openai_subq.c.openai_last_result,
-            gemini_subq.c.gemini_last_result,
+            openai_result.monitored_prompt_id,
+            openai_result.llm_provider,
+            gemini_result.monitored_prompt_id,
+            gemini_result.llm_provider,
         )
         .order_by(col(MonitoredPrompt.created_at).desc(), col(MonitoredPrompt.id).desc())
-        .offset(offset)
-        .limit(limit)
     )
+
+
+def get_prompts_citing_domain(
+    db: Session, company_id: int, domain: str, offset: int, limit: int
+) -> tuple[int, list[PromptMonitoringItem]]:
+    norm = normalize_domain(domain)
+    # Through the runs and prompts like the items, citations of deleted ones are
+    # left behind where deletes don't cascade
+    total = db.exec(
+        select(func.count(func.distinct(MonitoredPrompt.id)))
+        .join(
+            MonitoredPromptRun,
+            MonitoredPromptRun.monitored_prompt_id == MonitoredPrompt.id,
+        )
+        .where(MonitoredPrompt.company_id == company_id, _is_citing_run(company_id, norm))
+    ).one()
+    statement = _select_prompts_citing_domain(company_id, norm).offset(offset).limit(limit)
     rows = db.exec(statement).all()
     items = [
         PromptMonitoringItem(
@@ -0,0 +1,143 @@
+import datetime
+import json
+from collections.abc import Sequence
+
+from sqlmodel import Session, col, delete, select, update
+
+from app.models.llm_batch import LLMBatchJob, LLMBatchJobStatus, LLMBatchRequest
+from app.models.monitored_prompt import MonitoredPrompt
+from app.models.types import default_now
+
+
+def queue_batch_requests(
+    db: Session,
+    prompt_id: int,
+    batch_providers: Sequence[str],
+    cycle_at: datetime.datetime,
+    providers: Sequence[str],
+    lease_id: int | None = None,
+):
+    for provider in batch_providers:
+        db.add(
+            LLMBatchRequest(
+                monitored_prompt_id=prompt_id,
+                provider=provider,
+                cycle_at=cycle_at,
+                providers=json.dumps(list(providers)),
+                lease_id=lease_id,
+            )
+        )
+    db.flush()
+
+
+def get_pending_batch_providers(db: Session) -> Sequence[str]:
+    statement = (
+        select(LLMBatchRequest.provider).where(col(LLMBatchRequest.job_id).is_(None)).distinct()
+    )
+    return db.exec(statement).all()
+
+
+def create_batch_job(db: Session, job: LLMBatchJob, limit: int) -> Sequence[LLMBatchRequest]:
+    """Saves the job and assigns it up to limit pending requests of its provider"""
+    db.add(job)
+    db.flush()
+    request_ids = (
+        select(LLMBatchRequest.id)
+        .where(
+            LLMBatchRequest.provider == job.provider,
+            col(LLMBatchRequest.job_id).is_(None),
+        )
+        .order_by(col(LLMBatchRequest.id).asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(LLMBatchRequest)
+        .where(col(LLMBatchRequest.id).in_(request_ids))
+        .values(job_id=job.id)
+    )
+    db.exec(statement)  # type: ignore
+    db.flush()
+    return get_batch_job_requests(db, job)
+
+
+def get_batch_job_requests(db: Session, job: LLMBatchJob) -> Sequence[LLMBatchRequest]:
+    statement = (
+        select(LLMBatchRequest)
+        .where(LLMBatchRequest.job_id == job.id)
+        .order_by(col(LLMBatchRequest.id).asc())
+    )
+    return db.exec(statement).all()
+
+
+def reset_unsubmitted_batch_jobs(db: Session, created_before: datetime.datetime) -> int:
+    """Fails the jobs created before created_before and never submitted, their requests
+    go back to pending for the next job. Returns the number of jobs."""
+    job_ids = db.exec(
+        select(LLMBatchJob.id).where(
+            LLMBatchJob.status == LLMBatchJobStatus.CREATED,
+            col(LLMBatchJob.created_at) < created_before,
+        )
+    ).all()
+    if not job_ids:
+        return 0
+    db.exec(
+        update(LLMBatchRequest)  # type: ignore
+        .where(col(LLMBatchRequest.job_id).in_(job_ids))
+        .values(job_id=None)
+    )
+    db.exec(
+        update(LLMBatchJob)  # type: ignore
+        .where(col(LLMBatchJob.id).in_(job_ids))
+        .values(status=LLMBatchJobStatus.FAILED, error="Not submitted", finished_at=default_now())
+    )
+    db.flush()
+    return len(job_ids)
+
+
+def get_submitted_batch_jobs(db: Session) -> Sequence[LLMBatchJob]:
+    statement = select(LLMBatchJob).where(LLMBatchJob.status == LLMBatchJobStatus.SUBMITTED)
+    return db.exec(statement).all()
+
+
+def save_batch_job(db: Session, job: LLMBatchJob):
+    job = db.merge(job)
+    db.flush()
+    return job
+
+
+def finish_batch_job(db: Session, job: LLMBatchJob, status: str, error: str | None = None):
+    job.status = status
+    job.error = error
+    job.finished_at = default_now()
+    return save_batch_job(db, job)
+
+
+def delete_batch_requests(db: Session, request_ids: Sequence[int]):
+    if not request_ids:
+        return
+    db.exec(delete(LLMBatchRequest).where(col(LLMBatchRequest.id).in_(request_ids)))  # type: ignore
+    db.flush()
+
+
+def renew_batch_prompt_leases(db: Session) -> int:
+    # Batches take hours, keep prompts waiting for one from being reclaimed. Only
+    # submitted ones: a job lost before submitting must not hold its prompts forever.
+    prompt_ids = (
+        select(LLMBatchRequest.monitored_prompt_id)
+        .join(LLMBatchJob, col(LLMBatchJob.id) == LLMBatchRequest.job_id)
+        .where(LLMBatchJob.status == LLMBatchJobStatus.SUBMITTED)
+        .scalar_subquery()
+    )
+    statement = (
+        update(MonitoredPrompt)
+        .where(
+            col(MonitoredPrompt.id).in_(prompt_ids),
+            col(MonitoredPrompt.task_scheduled_at).is_not(None),
+        )
+        .values(task_scheduled_at=default_now())
+    )
+    result = db.exec(statement)  # type: ignore
+    db.flush()
+    return result.rowcount
@@ -1,10 +1,28 @@
-from collections.abc import Sequence
-
-from sqlmodel import Session, case, col, delete, func, select, update
-
-from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun
+import datetime
+import json
+import math
+from collections.abc import Iterator, Sequence
+
+from sqlalchemy import Float, cast
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, case, col, delete, func, insert, select, update
+
+from app.crud.company_stats import updating_company_stats
+from app.crud.run_partitions import ensure_run_partition
+from app.llm.prompt_analyzers.helpers import normalize_domain
+from app.models.monitored_prompt import (
+    MonitoredPrompt,
+    MonitoredPromptResult,
+    MonitoredPromptRun,
+    MonitoredPromptRunItem,
+    MonitoredPromptRunPayload,
+    RunCitation,
+)
 from app.models.prompt_monitoring import PromptMonitoringItem
 from app.models.types import default_now
+from app.settings import settings
+from app.utils import calculate_hash, compress_text, decompress_text
 
 
 def get_company_prompts(db: Session, company_id: int):
@@ -21,7 +39,9 @@ def get_monitored_prompt_by_ids(db: Session, prompt_ids: list[int]) -> Sequence[
 
 def save_monitored_prompt(db: Session, monitored_prompt: MonitoredPrompt):
     if monitored_prompt.id is not None:
-        monitored_prompt = db.merge(monitored_prompt)
+        # is_active or prompt_type may change
+        with updating_company_stats(db, [monitored_prompt.id]):
+            monitored_prompt = db.merge(monitored_prompt)
     else:
         db.add(monitored_prompt)
     db.flush()
@@ -33,8 +53,9 @@ def delete_monitored_prompt(db: Session, prompt_id: int):
     prompt = db.get(MonitoredPrompt, prompt_id)
     if prompt is None:
         return
-    db.delete(prompt)
-    db.flush()
+    with updating_company_stats(db, [prompt_id]):
+        db.delete(prompt)
+        db.flush()
 
 
 def update_monitored_prompt(
@@ -61,20 +82,22 @@ def update_monitored_prompt(
 
 def get_monitored_prompt_runs(
     db: Session, prompt_id: int, offset: int, limit: int
-) -> tuple[int, Sequence[MonitoredPromptRun]]:
+) -> tuple[int, list[MonitoredPromptRunItem]]:
     total = db.exec(
         select(func.count(col(MonitoredPromptRun.id))).where(
             MonitoredPromptRun.monitored_prompt_id == prompt_id
         )
     ).one()
+    # Without raw_response, legacy runs still have it inline
+    columns = [getattr(MonitoredPromptRun, name) for name in MonitoredPromptRunItem.model_fields]
     statement = (
-        select(MonitoredPromptRun)
+        select(*columns)
         .where(MonitoredPromptRun.monitored_prompt_id == prompt_id)
         .order_by(col(MonitoredPromptRun.run_at).desc())
         .offset(offset)
         .limit(limit)
     )
-    runs = db.exec(statement).all()
+    runs = [MonitoredPromptRunItem.model_validate(row._mapping) for row in db.exec(statement)]
     return total, runs
 
 
@@ -82,109 +105,574 @@ def get_monitored_prompt_run(db: Session, run_id: int) -> MonitoredPromptRun | N
     return db.get(MonitoredPromptRun, run_id)
 
 
-def get_prompt_ids_to_refresh(db: Session, limit: int = 500) -> Sequence[int]:
+def get_run_raw_response(db: Session, run: MonitoredPromptRun) -> str | None:
+    payload = db.get(MonitoredPromptRunPayload, run.id)
+    if payload is None:
+        return run.raw_response
+    return decompress_text(payload.data, payload.encoding)
+
+
+def _due_prompt_conditions(now: datetime.datetime):
+    # Kept in sync with the ix_monitored_prompts_due partial index predicate,
+    # so the planner can serve due prompts in next_run_at order from the index.
+    return (
+        MonitoredPrompt.next_run_at <= now,
+        col(MonitoredPrompt.task_scheduled_at).is_(None),
+        col(MonitoredPrompt.is_active).is_(True),
+    )
+
+
+def count_prompts_to_refresh(db: Session) -> int:
+    statement = select(func.count(col(MonitoredPrompt.id))).where(
+        *_due_prompt_conditions(default_now())
+    )
+    return db.exec(statement).one()
+
+
+def claim_prompts_to_refresh(
+    db: Session, limit: int = 500, first_run: bool | None = None
+) -> Sequence[tuple[int, int]]:
+    # Selects due prompts and stamps task_scheduled_at in one statement.
+    # Postgres: rows locked by a concurrent trigger are skipped (FOR UPDATE SKIP LOCKED).
+    # SQLite: drops the locking clause, but serializes writers, so it's atomic too.
+    # Returns (prompt_id, lease_id), pass the lease id on to the prompt's tasks.
     now = default_now()
-    statement = (
+    conditions = list(_due_prompt_conditions(now))
+    if first_run is not None:
+        last_run_at = col(MonitoredPrompt.last_run_at)
+        conditions.append(last_run_at.is_(None) if first_run else last_run_at.is_not(None))
+    due_ids = (
         select(MonitoredPrompt.id)
+        .where(*conditions)
+        .order_by(col(MonitoredPrompt.next_run_at).asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(MonitoredPrompt)
         .where(
-            MonitoredPrompt.next_run_at <= now,
+            col(MonitoredPrompt.id).in_(due_ids),
             col(MonitoredPrompt.task_scheduled_at).is_(None),
-            col(MonitoredPrompt.is_active).is_(True),
         )
-        .order_by(col(MonitoredPrompt.next_run_at).asc())
-        .limit(limit)
+        .values(task_scheduled_at=now, task_lease_id=col(MonitoredPrompt.task_lease_id) + 1)
+        .returning(col(MonitoredPrompt.id), col(MonitoredPrompt.task_lease_id))
     )
-    return db.exec(statement).all()  # type: ignore
+    claimed = [tuple(row) for row in db.exec(statement).all()]  # type: ignore
+    db.flush()
+    return claimed  # type: ignore
+
+
+def holds_prompt_lease(prompt: MonitoredPrompt, lease_id: int | None) -> bool:
+    """Whether tasks of the claim lease_id still own the prompt's cycle.
+
+    False once the lease was reclaimed (a later claim has another id) or the cycle
+    closed. lease_id None is for tasks sent without one, they aren't fenced.
+    """
+    if lease_id is None:
+        return True
+    return prompt.task_scheduled_at is not None and prompt.task_lease_id == lease_id
 
 
-def mark_prompts_as_scheduled(db: Session, prompt_ids: Sequence[int]):
+def reclaim_expired_prompt_leases(db: Session) -> int:
+    lease_expired_at = default_now() - datetime.timedelta(
+        seconds=settings.prompt_task_lease_seconds
+    )
+    statement = (
+        update(MonitoredPrompt)
+        .where(col(MonitoredPrompt.task_scheduled_at) < lease_expired_at)
+        .values(task_scheduled_at=None)
+    )
+    result = db.exec(statement)  # type: ignore
+    db.flush()
+    return result.rowcount
+
+
+def release_prompt_leases(db: Session, prompt_ids: Sequence[int]) -> int:
+    if not prompt_ids:
+        return 0
     statement = (
         update(MonitoredPrompt)
         .where(col(MonitoredPrompt.id).in_(prompt_ids))
-        .values(task_scheduled_at=default_now())
+        .values(task_scheduled_at=None)
     )
-    db.exec(statement)  # type: ignore
+    result = db.exec(statement)  # type: ignore
     db.flush()
+    return result.rowcount
+
+
+def get_leveled_run_at(
+    prompt_id: int, refresh_interval_seconds: int, target: datetime.datetime
+) -> datetime.datetime:
+    # Every prompt gets a stable phase within its refresh interval, derived from its id.
+    # Snapping next_run_at to the next slot of that phase spreads prompts created in
+    # bulk over the whole interval, while keeping the per-prompt cadence. Never earlier
+    # than target, a prompt doesn't run ahead of its schedule.
+    interval = max(refresh_interval_seconds, 1)
+    phase = int(calculate_hash(str(prompt_id))[:12], 16) % interval
+    target_utc = target if target.tzinfo else target.replace(tzinfo=datetime.UTC)
+    target_ts = math.ceil(target_utc.timestamp())
+    slot_ts = phase + -((phase - target_ts) // interval) * interval
+    leveled = datetime.datetime.fromtimestamp(slot_ts, datetime.UTC)
+    return leveled if target.tzinfo else leveled.replace(tzinfo=None)
+
+
+def get_next_run_at(prompt: MonitoredPrompt) -> datetime.datetime:
+    next_run_at = prompt.next_run_at + datetime.timedelta(seconds=prompt.refresh_interval_seconds)
+    if not settings.prompt_schedule_leveling:
+        return next_run_at
+    assert prompt.id is not None
+    return get_leveled_run_at(prompt.id, prompt.refresh_interval_seconds, next_run_at)
+
+
+def rebalance_prompt_schedule(db: Session, batch_size: int = 1000) -> int:
+    # Moves already scheduled prompts to their leveled slot. Overdue prompts are left
+    # alone, they get leveled after their next run.
+    now = default_now()
+    last_id = 0
+    moved = 0
+    while True:
+        prompts = db.exec(
+            select(
+                MonitoredPrompt.id,
+                MonitoredPrompt.refresh_interval_seconds,
+                MonitoredPrompt.next_run_at,
+            )
+            .where(
+                col(MonitoredPrompt.id) > last_id,
+                col(MonitoredPrompt.is_active).is_(True),
+                MonitoredPrompt.next_run_at > now,
+            )
+            .order_by(col(MonitoredPrompt.id).asc())
+            .limit(batch_size)
+        ).all()
+        if not prompts:
+            break
+        changes = []
+        for prompt_id, refresh_interval_seconds, next_run_at in prompts:
+            assert prompt_id is not None
+            leveled = get_leveled_run_at(prompt_id, refresh_interval_seconds, next_run_at)
+            if leveled != next_run_at:
+                changes.append({"id": prompt_id, "next_run_at": leveled})
+        if changes:
+            db.exec(update(MonitoredPrompt), params=changes)  # type: ignore
+            db.flush()
+        moved += len(changes)
+        last_id = prompts[-1][0]
+    return moved
+
+
+def lock_monitored_prompt(db: Session, prompt_id: int) -> MonitoredPrompt | None:
+    # FOR NO KEY UPDATE doesn't conflict with the key share lock taken by
+    # inserting a run referencing the prompt in the same transaction.
+    statement = (
+        select(MonitoredPrompt)
+        .where(MonitoredPrompt.id == prompt_id)
+        .with_for_update(key_share=True)
+    )
+    return db.exec(statement).first()
+
+
+def complete_prompt_cycle(db: Session, prompt: MonitoredPrompt, run_at: datetime.datetime):
+    # All channels of the cycle are saved: release the lease and schedule the next cycle
+    prompt.task_scheduled_at = None
+    prompt.last_run_at = run_at
+    prompt.next_run_at = get_next_run_at(prompt)
+    return save_monitored_prompt(db, prompt)
+
+
+def skip_prompt_cycle(db: Session, prompt: MonitoredPrompt):
+    # The prompt won't run this cycle (no quota left, company gone...): release the
+    # lease and schedule the next cycle, just released it would be claimed again
+    now = default_now()
+    prompt.task_scheduled_at = None
+    if prompt.next_run_at.replace(tzinfo=datetime.UTC) < now:
+        prompt.next_run_at = now
+    prompt.next_run_at = get_next_run_at(prompt)
+    return save_monitored_prompt(db, prompt)
+
+
+def get_cycle_providers(db: Session, prompt_id: int, cycle_at: datetime.datetime) -> set[str]:
+    statement = (
+        select(MonitoredPromptRun.llm_provider)
+        .where(
+            MonitoredPromptRun.monitored_prompt_id == prompt_id,
+            MonitoredPromptRun.run_at == cycle_at,
+        )
+        .distinct()
+    )
+    return set(db.exec(statement).all())
 
 
 def save_monitored_prompt_run(db: Session, monitored_prompt_run: MonitoredPromptRun):
-    if monitored_prompt_run.id is not None:
-        monitored_prompt_run = db.merge(monitored_prompt_run)
-    else:
-        db.add(monitored_prompt_run)
-    db.flush()
+    # raw_response goes compressed to its own table, see get_run_raw_response
+    raw_response = monitored_prompt_run.raw_response
+    monitored_prompt_run.raw_response = None
+    is_new = monitored_prompt_run.id is None
+    with updating_company_stats(db, [monitored_prompt_run.monitored_prompt_id]):
+        if not is_new:
+            monitored_prompt_run = db.merge(monitored_prompt_run)
+        else:
+            ensure_run_partition(db, monitored_prompt_run.run_at)
+            db.add(monitored_prompt_run)
+        db.flush()
+        assert monitored_prompt_run.id is not None
+        if raw_response is not None:
+            db.merge(
+                MonitoredPromptRunPayload(
+                    run_id=monitored_prompt_run.id,
+                    run_at=monitored_prompt_run.run_at,
+                    data=compress_text(raw_response),
+                )
+            )
+            db.flush()
+        save_run_citations(db, [monitored_prompt_run.id])
+        if is_new:
+            _add_prompt_result(db, monitored_prompt_run)
+        else:
+            rebuild_prompt_results(db, [monitored_prompt_run.monitored_prompt_id])
     db.refresh(monitored_prompt_run)
     return monitored_prompt_run
 
 
-def get_company_prompt_stats(
-    db: Session, company_id: int, offset: int, limit: int
-) -> tuple[int, list[PromptMonitoringItem]]:
-    total = db.exec(
-        select(func.count(col(MonitoredPrompt.id))).where(MonitoredPrompt.company_id == company_id)
-    ).one()
-    openai_latest = (
+def _add_prompt_result(db: Session, run: MonitoredPromptRun):
+    dialect = db.bind.dialect.name  # type: ignore
+    if dialect != "postgresql" and dialect != "sqlite":
+        raise ValueError(f"Unsupported dialect: {dialect}")
+    statement = postgresql.insert(MonitoredPromptResult).values(
+        monitored_prompt_id=run.monitored_prompt_id,
+        llm_provider=run.llm_provider,
+        run_id=run.id,
+        run_at=run.run_at,
+        brand_mentioned=run.brand_mentioned,
+        company_domain_rank=run.company_domain_rank,
+        run_count=1,
+        brand_mentioned_count=1 if run.brand_mentioned else 0,
+    )
+    current = MonitoredPromptResult.__table__.c  # type: ignore
+    # Runs can be saved out of order, the latest one by run_at wins
+    is_latest = statement.excluded.run_at >= current.run_at
+    set_ = {
+        column: case((is_latest, statement.excluded[column]), else_=current[column])
+        for column in ("run_id", "run_at", "brand_mentioned", "company_domain_rank")
+    }
+    set_["run_count"] = current.run_count + 1
+    set_["brand_mentioned_count"] = (
+        current.brand_mentioned_count + statement.excluded.brand_mentioned_count
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["monitored_prompt_id", "llm_provider"], set_=set_
+    )
+    db.connection().execute(statement)
+
+
+def rebuild_prompt_results(db: Session, prompt_ids: Sequence[int]):
+    """Recomputes monitored_prompt_results of the prompts from their runs.
+
+    Call within updating_company_stats. The counters keep the archived runs'
+    contribution, as counted by archive_prompt_results.
+    """
+    if not prompt_ids:
+        return
+    dialect = db.bind.dialect.name  # type: ignore
+    if dialect != "postgresql" and dialect != "sqlite":
+        raise ValueError(f"Unsupported dialect: {dialect}")
+    # The latest run is never archived, results without stored runs are gone
+    stored_runs = select(MonitoredPromptRun.id).where(
+        MonitoredPromptRun.monitored_prompt_id == MonitoredPromptResult.monitored_prompt_id,
+        MonitoredPromptRun.llm_provider == MonitoredPromptResult.llm_provider,
+    )
+    db.exec(
+        delete(MonitoredPromptResult).where(  # type: ignore
+            col(MonitoredPromptResult.monitored_prompt_id).in_(prompt_ids),
+            ~stored_runs.exists(),
+        )
+    )
+    partition_by = (MonitoredPromptRun.monitored_prompt_id, MonitoredPromptRun.llm_provider)
+    ranked = (
         select(
             MonitoredPromptRun.monitored_prompt_id,
-            func.max(MonitoredPromptRun.run_at).label("max_run_at"),
+            MonitoredPromptRun.llm_provider,
+            col(MonitoredPromptRun.id).label("run_id"),
+            MonitoredPromptRun.run_at,
+            MonitoredPromptRun.brand_mentioned,
+            MonitoredPromptRun.company_domain_rank,
+            func.count().over(partition_by=partition_by).label("run_count"),
+            func.sum(case((col(MonitoredPromptRun.brand_mentioned).is_(True), 1), else_=0))
+            .over(partition_by=partition_by)
+            .label("brand_mentioned_count"),
+            func.row_number()
+            .over(
+                partition_by=partition_by,
+                order_by=(
+                    col(MonitoredPromptRun.run_at).desc(),
+                    col(MonitoredPromptRun.id).desc(),
+                ),
+            )
+            .label("row_number"),
         )
-        .where(MonitoredPromptRun.llm_provider == "openai")
-        .group_by(MonitoredPromptRun.monitored_prompt_id)
+        .where(col(MonitoredPromptRun.monitored_prompt_id).in_(prompt_ids))
         .subquery()
     )
+    columns = [
+        "monitored_prompt_id",
+        "llm_provider",
+        "run_id",
+        "run_at",
+        "brand_mentioned",
+        "company_domain_rank",
+        "run_count",
+        "brand_mentioned_count",
+    ]
+    statement = postgresql.insert(MonitoredPromptResult).from_select(
+        columns,
+        select(*(ranked.c[column] for column in columns)).where(ranked.c.row_number == 1),
+    )
+    current = MonitoredPromptResult.__table__.c  # type: ignore
+    set_ = {
+        column: statement.excluded[column]
+        for column in ("run_id", "run_at", "brand_mentioned", "company_domain_rank")
+    }
+    set_["run_count"] = statement.excluded.run_count + current.archived_run_count
+    set_["brand_mentioned_count"] = (
+        statement.excluded.brand_mentioned_count + current.archived_brand_mentioned_count
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["monitored_prompt_id", "llm_provider"], set_=set_
+    )
+    db.connection().execute(statement)
+    db.flush()
+
 
-    openai_subq = (
+def archive_prompt_results(db: Session, run_ids: Sequence[int]):
+    """Counts the runs as archived in their prompt results, call before deleting them"""
+    if not run_ids:
+        return
+    statement = (
         select(
-            MonitoredPromptRun.monitored_prompt_id.label("monitored_prompt_id"),
-            case(
-                (col(MonitoredPromptRun.brand_mentioned).is_(True), True),
-                (
-                    col(MonitoredPromptRun.company_domain_rank).is_not(None),
-                    True,
-                ),
-                else_=False,
-            ).label("openai_last_result"),
+            MonitoredPromptRun.monitored_prompt_id,
+            MonitoredPromptRun.llm_provider,
+            func.count().label("runs"),
+            func.sum(case((col(MonitoredPromptRun.brand_mentioned).is_(True), 1), else_=0)).label(
+                "brand_mentions"
+            ),
         )
-        .join(
-            openai_latest,
-            (MonitoredPromptRun.monitored_prompt_id == openai_latest.c.monitored_prompt_id)
-            & (MonitoredPromptRun.run_at == openai_latest.c.max_run_at),
+        .where(col(MonitoredPromptRun.id).in_(run_ids))
+        .group_by(MonitoredPromptRun.monitored_prompt_id, MonitoredPromptRun.llm_provider)
+    )
+    current = MonitoredPromptResult.__table__.c  # type: ignore
+    for prompt_id, llm_provider, runs, brand_mentions in db.exec(statement).all():
+        db.exec(
+            update(MonitoredPromptResult)  # type: ignore
+            .where(
+                MonitoredPromptResult.monitored_prompt_id == prompt_id,
+                MonitoredPromptResult.llm_provider == llm_provider,
+            )
+            .values(
+                archived_run_count=current.archived_run_count + runs,
+                archived_brand_mentioned_count=current.archived_brand_mentioned_count
+                + brand_mentions,
+            )
         )
-        .where(MonitoredPromptRun.llm_provider == "openai")
-        .subquery()
+
+
+def backfill_prompt_results(db: Session, after_id: int, batch_size: int) -> int | None:
+    """Rebuilds results of the prompts after after_id, returns the last prompt id or None if done"""
+    prompt_ids = db.exec(
+        select(MonitoredPrompt.id)
+        .where(col(MonitoredPrompt.id) > after_id)
+        .order_by(col(MonitoredPrompt.id).asc())
+        .limit(batch_size)
+    ).all()
+    if not prompt_ids:
+        return None
+    prompt_ids = [prompt_id for prompt_id in prompt_ids if prompt_id is not None]
+    with updating_company_stats(db, prompt_ids):
+        rebuild_prompt_results(db, prompt_ids)
+    return prompt_ids[-1]
+
+
+def get_last_result(result: type[MonitoredPromptResult]):
+    """Whether the company was mentioned or cited in the latest run, None without runs"""
+    return case(
+        (col(result.brand_mentioned).is_(True), True),
+        (col(result.company_domain_rank).is_not(None), True),
+        (col(result.run_id).is_not(None), False),
     )
 
-    gemini_latest = (
+
+def save_run_citations(db: Session, run_ids: Sequence[int]):
+    """(Re)builds the run_citations rows of the runs from their mentioned_pages.
+
+    Call within updating_company_stats.
+    """
+    if not run_ids:
+        return
+    db.exec(delete(RunCitation).where(col(RunCitation.run_id).in_(run_ids)))  # type: ignore
+    runs = db.exec(
         select(
+            MonitoredPromptRun.id,
+            MonitoredPromptRun.run_at,
             MonitoredPromptRun.monitored_prompt_id,
-            func.max(MonitoredPromptRun.run_at).label("max_run_at"),
+            MonitoredPrompt.company_id,
+            MonitoredPromptRun.llm_provider,
+            MonitoredPromptRun.mentioned_pages,
         )
-        .where(MonitoredPromptRun.llm_provider == "gemini")
-        .group_by(MonitoredPromptRun.monitored_prompt_id)
-        .subquery()
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .where(col(MonitoredPromptRun.id).in_(run_ids))
+    ).all()
+    citations = [
+        {
+            "run_id": run_id,
+            "position": position,
+            "url": url,
+            "domain": normalize_domain(url),
+            "run_at": run_at,
+            "monitored_prompt_id": prompt_id,
+            "company_id": company_id,
+            "llm_provider": provider,
+        }
+        for run_id, run_at, prompt_id, company_id, provider, mentioned_pages in runs
+        for position, url in enumerate(json.loads(mentioned_pages or "[]"), start=1)
+    ]
+    if citations:
+        db.exec(insert(RunCitation), params=citations)  # type: ignore
+    db.flush()
+
+
+def backfill_run_citations(db: Session, after_id: int, batch_size: int) -> int | None:
+    """Builds run_citations of the runs after after_id, returns the last run id or None if done"""
+    runs = db.exec(
+        select(MonitoredPromptRun.id, MonitoredPromptRun.monitored_prompt_id)
+        .where(col(MonitoredPromptRun.id) > after_id)
+        .order_by(col(MonitoredPromptRun.id).asc())
+        .limit(batch_size)
+    ).all()
+    if not runs:
+        return None
+    with updating_company_stats(db, list({prompt_id for _, prompt_id in runs})):
+        save_run_citations(db, [run_id for run_id, _ in runs if run_id is not None])
+    return runs[-1][0]
+
+
+def move_raw_responses_to_payloads(db: Session, after_id: int, batch_size: int) -> int | None:
+    """Compresses inline raw_response of legacy runs, returns the last run id or None if done"""
+    runs = db.exec(
+        select(MonitoredPromptRun.id, MonitoredPromptRun.run_at, MonitoredPromptRun.raw_response)
+        .where(
+            col(MonitoredPromptRun.id) > after_id,
+            col(MonitoredPromptRun.raw_response).is_not(None),
+        )
+        .order_by(col(MonitoredPromptRun.id).asc())
+        .limit(batch_size)
+    ).all()
+    if not runs:
+        return None
+    # Runs with an inline raw_response have no payload yet, see save_monitored_prompt_run
+    db.add_all(
+        MonitoredPromptRunPayload(run_id=run_id, run_at=run_at, data=compress_text(raw_response))
+        for run_id, run_at, raw_response in runs
+        if run_id is not None and raw_response is not None
+    )
+    db.exec(
+        update(MonitoredPromptRun)  # type: ignore
+        .where(col(MonitoredPromptRun.id).in_([run_id for run_id, _, _ in runs]))
+        .values(raw_response=None)
     )
+    db.flush()
+    return runs[-1][0]
+
 
-    gemini_subq = (
+def _select_runs_with_raw_response():
+    return (
         select(
-            MonitoredPromptRun.monitored_prompt_id.label("monitored_prompt_id"),
-            case(
-                (col(MonitoredPromptRun.brand_mentioned).is_(True), True),
-                (
-                    col(MonitoredPromptRun.company_domain_rank).is_not(None),
-                    True,
-                ),
-                else_=False,
-            ).label("gemini_last_result"),
+            MonitoredPromptRun,
+            MonitoredPrompt.company_id,
+            MonitoredPromptRunPayload.encoding,
+            MonitoredPromptRunPayload.data,
         )
-        .join(
-            gemini_latest,
-            (MonitoredPromptRun.monitored_prompt_id == gemini_latest.c.monitored_prompt_id)
-            & (MonitoredPromptRun.run_at == gemini_latest.c.max_run_at),
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .outerjoin(
+            MonitoredPromptRunPayload,
+            col(MonitoredPromptRunPayload.run_id) == MonitoredPromptRun.id,
         )
-        .where(MonitoredPromptRun.llm_provider == "gemini")
-        .subquery()
+        .order_by(col(MonitoredPromptRun.id).asc())
     )
 
+
+def _with_raw_response(rows) -> list[tuple[MonitoredPromptRun, int, str | None]]:
+    return [
+        (run, company_id, decompress_text(data, encoding) if data is not None else run.raw_response)
+        for run, company_id, encoding, data in rows
+    ]
+
+
+def get_runs_to_archive(
+    db: Session, before: datetime.datetime, after_id: int, batch_size: int
+) -> list[tuple[MonitoredPromptRun, int, str | None]]:
+    """(run, company_id, raw_response) of runs older than before, except the latest
+    run of each prompt and provider, see monitored_prompt_results"""
+    latest_run_ids = select(MonitoredPromptResult.run_id)
+    statement = (
+        _select_runs_with_raw_response()
+        .where(
+            col(MonitoredPromptRun.id) > after_id,
+            col(MonitoredPromptRun.run_at) < before,
+            col(MonitoredPromptRun.id).not_in(latest_run_ids),
+        )
+        .limit(batch_size)
+    )
+    return _with_raw_response(db.exec(statement).all())
+
+
+def iter_company_runs(
+    db: Session, company_id: int, batch_size: int = 1000
+) -> Iterator[tuple[MonitoredPromptRun, int, str | None]]:
+    last_id = 0
+    while True:
+        rows = db.exec(
+            _select_runs_with_raw_response()
+            .where(MonitoredPrompt.company_id == company_id, col(MonitoredPromptRun.id) > last_id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        for run, run_company_id, raw_response in _with_raw_response(rows):
+            # Keeps the session's memory flat over large exports
+            db.expunge(run)
+            yield run, run_company_id, raw_response
+        last_id = rows[-1][0].id
+
+
+def delete_runs(db: Session, run_ids: Sequence[int], before: datetime.datetime | None = None):
+    """Deletes runs with their payloads and citations, not their rollups or prompt results.
+
+    Runs are all from before before if given, it spares Postgres the later partitions.
+    """
+    if not run_ids:
+        return
+    for model, column in (
+        (MonitoredPromptRunPayload, MonitoredPromptRunPayload.run_id),
+        (RunCitation, RunCitation.run_id),
+    ):
+        db.exec(delete(model).where(col(column).in_(run_ids)))  # type: ignore
+    statement = delete(MonitoredPromptRun).where(col(MonitoredPromptRun.id).in_(run_ids))
+    if before is not None:
+        statement = statement.where(col(MonitoredPromptRun.run_at) < before)
+    db.exec(statement)  # type: ignore
+    db.flush()
+
+
+def get_company_prompt_stats(
+    db: Session, company_id: int, offset: int, limit: int
+) -> tuple[int, list[PromptMonitoringItem]]:
+    total = db.exec(
+        select(func.count(col(MonitoredPrompt.id))).where(MonitoredPrompt.company_id == company_id)
+    ).one()
+    openai_result = aliased(MonitoredPromptResult)
+    gemini_result = aliased(MonitoredPromptResult)
+    all_results = aliased(MonitoredPromptResult)
+
     statement = (
         select(
             MonitoredPrompt.id,
@@ -192,38 +680,34 @@ def get_company_prompt_stats(
             MonitoredPrompt.prompt_type,
             MonitoredPrompt.is_active,
             MonitoredPrompt.created_at,
-            openai_subq.c.openai_last_result,
-            gemini_subq.c.gemini_last_result,
+            get_last_result(openai_result).label("openai_last_result"),  # type: ignore
+            get_last_result(gemini_result).label("gemini_last_result"),  # type: ignore
             func.coalesce(
-                func.avg(
-                    case(
-                        (col(MonitoredPromptRun.brand_mentioned).is_(True), 1.0),
-                        else_=0.0,
-                    )
-                ),
+                cast(func.sum(all_results.brand_mentioned_count), Float)
+                / func.nullif(func.sum(all_results.run_count), 0),
                 0.0,
             ).label("visibility"),
         )
         .where(MonitoredPrompt.company_id == company_id)
         .join(
-            MonitoredPromptRun,
-            MonitoredPromptRun.monitored_prompt_id == MonitoredPrompt.id,
+            openai_result,
+            (openai_result.monitored_prompt_id == MonitoredPrompt.id)
+            & (openai_result.llm_provider == "openai"),
             isouter=True,
         )
         .join(
-            openai_subq,
-            openai_subq.c.monitored_prompt_id == MonitoredPrompt.id,
-            isouter=True,
-        )
-        .join(
-            gemini_subq,
-            gemini_subq.c.monitored_prompt_id == MonitoredPrompt.id,
+            gemini_result,
+            (gemini_result.monitored_prompt_id == MonitoredPrompt.id)
+            & (gemini_result.llm_provider == "gemini"),
             isouter=True,
         )
+        .join(all_results, all_results.monitored_prompt_id == MonitoredPrompt.id, isouter=True)
         .group_by(
             MonitoredPrompt.id,
-            openai_subq.c.openai_last_result,
-            gemini_subq.c.gemini_last_result,
+            openai_result.monitored_prompt_id,
+            openai_result.llm_provider,
+            gemini_result.monitored_prompt_id,
+            gemini_result.llm_provider,
         )
         .order_by(col(MonitoredPrompt.created_at).desc(), col(MonitoredPrompt.id).desc())
         .offset(offset)
@@ -259,17 +743,19 @@ def set_prompts_active(
         )
         .values(is_active=is_active)
     )
-    db.exec(statement)  # type: ignore
-    db.flush()
+    with updating_company_stats(db, prompt_ids):
+        db.exec(statement)  # type: ignore
+        db.flush()
 
 
 def delete_prompts(db: Session, prompt_ids: Sequence[int], company_id: int) -> None:
     if not prompt_ids:
         return
-    db.exec(
-        delete(MonitoredPrompt).where(
-            col(MonitoredPrompt.id).in_(prompt_ids),
-            col(MonitoredPrompt.company_id) == company_id,
-        )
-    )  # type: ignore
-    db.flush()
+    with updating_company_stats(db, prompt_ids):
+        db.exec(
+            delete(MonitoredPrompt).where(
+                col(MonitoredPrompt.id).in_(prompt_ids),
+                col(MonitoredPrompt.company_id) == company_id,
+            )
+        )  # type: ignore
+        db.flush()
@@ -0,0 +1,25 @@
+from sqlmodel import Session
+
+from app.models.reanalysis import ReanalysisCheckpoint
+from app.models.types import default_now
+
+
+def get_reanalysis_checkpoint(db: Session, name: str) -> ReanalysisCheckpoint:
+    checkpoint = db.get(ReanalysisCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = ReanalysisCheckpoint(name=name)
+    return checkpoint
+
+
+def save_reanalysis_checkpoint(db: Session, checkpoint: ReanalysisCheckpoint):
+    checkpoint.updated_at = default_now()
+    checkpoint = db.merge(checkpoint)
+    db.flush()
+    return checkpoint
+
+
+def delete_reanalysis_checkpoint(db: Session, name: str):
+    checkpoint = db.get(ReanalysisCheckpoint, name)
+    if checkpoint is not None:
+        db.delete(checkpoint)
+        db.flush()
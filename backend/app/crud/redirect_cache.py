@@ -0,0 +1,56 @@
+import datetime
+from collections.abc import Mapping, Sequence
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, col, delete, select
+
+from app.models.redirect_cache import RedirectCacheEntry
+from app.models.types import default_now
+from app.utils import calculate_hash
+
+
+def get_cached_redirects(db: Session, uris: Sequence[str]) -> dict[str, RedirectCacheEntry]:
+    hashes = {calculate_hash(uri): uri for uri in uris}
+    if not hashes:
+        return {}
+    statement = select(RedirectCacheEntry).where(
+        col(RedirectCacheEntry.uri_hash).in_(hashes),
+        RedirectCacheEntry.expires_at > default_now(),
+    )
+    return {hashes[entry.uri_hash]: entry for entry in db.exec(statement).all()}
+
+
+def save_cached_redirects(db: Session, entries: Mapping[str, tuple[str | None, datetime.datetime]]):
+    """entries: uri => (resolved uri or None if unresolved, expires at)"""
+    if not entries:
+        return
+    dialect = db.bind.dialect.name  # type: ignore
+    if dialect != "postgresql" and dialect != "sqlite":
+        raise ValueError(f"Unsupported dialect: {dialect}")
+    statement = postgresql.insert(RedirectCacheEntry).values(
+        [
+            {
+                "uri_hash": calculate_hash(uri),
+                "uri": uri,
+                "resolved_uri": resolved_uri,
+                "expires_at": expires_at,
+            }
+            for uri, (resolved_uri, expires_at) in entries.items()
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["uri_hash"],
+        set_={
+            "resolved_uri": statement.excluded.resolved_uri,
+            "expires_at": statement.excluded.expires_at,
+        },
+    )
+    db.connection().execute(statement)
+
+
+def delete_expired_redirects(db: Session) -> int:
+    statement = delete(RedirectCacheEntry).where(
+        col(RedirectCacheEntry.expires_at) <= default_now()
+    )
+    result = db.exec(statement)  # type: ignore
+    return result.rowcount
@@ -0,0 +1,179 @@
+import datetime
+from collections import Counter
+from collections.abc import Sequence
+
+from sqlmodel import Session, col, delete, func, insert, select
+
+from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun, RunCitation
+from app.models.rollups import DailyDomainStats, DailyRunStats, RollupWatermark
+from app.models.types import default_now
+
+# Its archived_before is the day before which runs were archived, see freeze_daily_stats
+ARCHIVED_RUNS = "archived_runs"
+
+
+def get_rollup_watermark(db: Session, name: str) -> RollupWatermark:
+    watermark = db.get(RollupWatermark, name)
+    if watermark is None:
+        watermark = RollupWatermark(name=name)
+    return watermark
+
+
+def save_rollup_watermark(db: Session, watermark: RollupWatermark):
+    watermark.updated_at = default_now()
+    watermark = db.merge(watermark)
+    db.flush()
+    return watermark
+
+
+def get_new_run_days(
+    db: Session, after_id: int, batch_size: int
+) -> tuple[int | None, set[tuple[int, datetime.date]]]:
+    """(company_id, day) of the runs after after_id, with the last run id or None if done"""
+    runs = db.exec(
+        select(MonitoredPromptRun.id, MonitoredPrompt.company_id, MonitoredPromptRun.run_at)
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .where(col(MonitoredPromptRun.id) > after_id)
+        .order_by(col(MonitoredPromptRun.id).asc())
+        .limit(batch_size)
+    ).all()
+    if not runs:
+        return None, set()
+    return runs[-1][0], {(company_id, run_at.date()) for _, company_id, run_at in runs}
+
+
+def get_run_days(db: Session, run_ids: Sequence[int]) -> set[tuple[int, datetime.date]]:
+    """(company_id, day) of the runs"""
+    runs = db.exec(
+        select(MonitoredPrompt.company_id, MonitoredPromptRun.run_at)
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .where(col(MonitoredPromptRun.id).in_(run_ids))
+    ).all()
+    return {(company_id, run_at.date()) for company_id, run_at in runs}
+
+
+def freeze_daily_stats(db: Session, before: datetime.datetime):
+    """Keeps the rollups of the days of runs before before from being recomputed, they
+    count runs about to be archived"""
+    watermark = get_rollup_watermark(db, ARCHIVED_RUNS)
+    # The day of before is partly archived
+    archived_before = before.date() + datetime.timedelta(days=1)
+    if watermark.archived_before is None or watermark.archived_before < archived_before:
+        watermark.archived_before = archived_before
+        save_rollup_watermark(db, watermark)
+
+
+def rebuild_daily_stats(db: Session, company_id: int, day: datetime.date) -> bool:
+    """Recomputes the rollups of the company's runs of the day, returns False for a day
+    with archived runs whose rollups are kept, see freeze_daily_stats"""
+    archived_before = get_rollup_watermark(db, ARCHIVED_RUNS).archived_before
+    if archived_before is not None and day < archived_before:
+        return False
+    start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.UTC)
+    runs = db.exec(
+        select(
+            MonitoredPromptRun.id,
+            MonitoredPromptRun.llm_provider,
+            MonitoredPrompt.prompt_type,
+            MonitoredPromptRun.brand_mentioned,
+            MonitoredPromptRun.company_domain_rank,
+        )
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .where(
+            MonitoredPrompt.company_id == company_id,
+            col(MonitoredPromptRun.run_at) >= start,
+            col(MonitoredPromptRun.run_at) < start + datetime.timedelta(days=1),
+        )
+    ).all()
+    stats: dict[tuple[str, str], Counter[str]] = {}
+    for _, provider, prompt_type, brand_mentioned, company_domain_rank in runs:
+        counts = stats.setdefault((provider, prompt_type), Counter())
+        counts["runs"] += 1
+        counts["brand_mentions"] += 1 if brand_mentioned else 0
+        counts["cited_runs"] += 1 if company_domain_rank is not None else 0
+    # A domain counts once per run
+    citations = (
+        db.exec(
+            select(RunCitation.run_id, RunCitation.llm_provider, RunCitation.domain)
+            .where(col(RunCitation.run_id).in_([run[0] for run in runs]))
+            .distinct()
+        ).all()
+        if runs
+        else []
+    )
+    domains = Counter((provider, domain) for _, provider, domain in citations)
+
+    for model in (DailyRunStats, DailyDomainStats):
+        db.exec(
+            delete(model).where(model.company_id == company_id, model.day == day)  # type: ignore
+        )
+    if stats:
+        db.exec(
+            insert(DailyRunStats),  # type: ignore
+            params=[
+                {
+                    "company_id": company_id,
+                    "day": day,
+                    "llm_provider": provider,
+                    "prompt_type": prompt_type,
+                    "runs": counts["runs"],
+                    "brand_mentions": counts["brand_mentions"],
+                    "cited_runs": counts["cited_runs"],
+                }
+                for (provider, prompt_type), counts in stats.items()
+            ],
+        )
+    if domains:
+        db.exec(
+            insert(DailyDomainStats),  # type: ignore
+            params=[
+                {
+                    "company_id": company_id,
+                    "day": day,
+                    "llm_provider": provider,
+                    "domain": domain,
+                    "runs": runs,
+                }
+                for (provider, domain), runs in domains.items()
+            ],
+        )
+    db.flush()
+    return True
+
+
+def get_daily_stats(
+    db: Session, company_id: int, since: datetime.date, llm_provider: str | None = None
+) -> Sequence[DailyRunStats]:
+    statement = select(DailyRunStats).where(
+        DailyRunStats.company_id == company_id, DailyRunStats.day >= since
+    )
+    if llm_provider is not None:
+        statement = statement.where(DailyRunStats.llm_provider == llm_provider)
+    return db.exec(statement.order_by(col(DailyRunStats.day).asc())).all()
+
+
+def get_daily_domain_stats(
+    db: Session,
+    company_id: int,
+    since: datetime.date,
+    limit: int,
+    llm_provider: str | None = None,
+) -> Sequence[tuple[datetime.date, str, int]]:
+    """(day, domain, runs) of the limit domains cited by most runs since the day"""
+    conditions = [DailyDomainStats.company_id == company_id, DailyDomainStats.day >= since]
+    if llm_provider is not None:
+        conditions.append(DailyDomainStats.llm_provider == llm_provider)
+    total = func.sum(DailyDomainStats.runs)
+    top_domains = (
+        select(DailyDomainStats.domain)
+        .where(*conditions)
+        .group_by(col(DailyDomainStats.domain))
+        .order_by(total.desc(), col(DailyDomainStats.domain).asc())
+        .limit(limit)
+    )
+    return db.exec(
+        select(DailyDomainStats.day, DailyDomainStats.domain, total)
+        .where(*conditions, col(DailyDomainStats.domain).in_(top_domains))
+        .group_by(col(DailyDomainStats.day), col(DailyDomainStats.domain))
+        .order_by(col(DailyDomainStats.day).asc(), col(DailyDomainStats.domain).asc())
+    ).all()
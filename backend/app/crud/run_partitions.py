@@ -0,0 +1,123 @@
+"""Monthly partitions of monitored_prompt_runs on Postgres, named
+monitored_prompt_runs_<YYYY>_<MM> and bounded by the UTC months of run_at.
+
+The run_partitions migration partitions the table on Postgres only, elsewhere
+these are no-ops. There is no default partition: a partition can't be created
+for a month the default one holds rows of, and moving them out would cascade
+to their payloads and citations. ensure_run_partition covers months
+scheduled.maintain_run_partitions didn't create in time.
+"""
+
+import datetime
+import logging
+import re
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^monitored_prompt_runs_(\d{4})_(\d{2})$")
+
+# Months known to have a partition (or that need none), per process
+_ensured_months: set[datetime.date] = set()
+
+
+def get_partition_name(month: datetime.date) -> str:
+    return f"monitored_prompt_runs_{month:%Y_%m}"
+
+
+def add_months(day: datetime.date, months: int) -> datetime.date:
+    """First day of the month months after the day's"""
+    month = day.year * 12 + day.month - 1 + months
+    return datetime.date(month // 12, month % 12 + 1, 1)
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.bind.dialect.name != "postgresql":  # type: ignore
+        return False
+    return (
+        db.connection()
+        .execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table"
+                " WHERE partrelid = to_regclass('monitored_prompt_runs'))"
+            )
+        )
+        .scalar_one()
+    )
+
+
+def get_run_partitions(db: Session) -> list[tuple[datetime.date, str]]:
+    """(month, name) of the partitions, by month"""
+    names = (
+        db.connection()
+        .execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+                " WHERE i.inhparent = to_regclass('monitored_prompt_runs')"
+            )
+        )
+        .scalars()
+    )
+    partitions = []
+    for name in names:
+        if match := PARTITION_NAME.match(name):
+            partitions.append((datetime.date(int(match[1]), int(match[2]), 1), name))
+    return sorted(partitions)
+
+
+def create_run_partitions(db: Session, since: datetime.date, until: datetime.date) -> list[str]:
+    """Creates the missing partitions of the months from since's to until's, returns their names"""
+    existing = {month for month, _ in get_run_partitions(db)}
+    created = []
+    month = add_months(since, 0)
+    while month <= until:
+        if month not in existing:
+            name = get_partition_name(month)
+            db.connection().execute(
+                # Another process may be creating it too, see ensure_run_partition
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF monitored_prompt_runs"
+                    f" FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                )
+            )
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_run_partition(db: Session, run_at: datetime.datetime):
+    """Creates the partition of run_at's month if it's missing, before inserting a run.
+
+    Inserting a run without a partition for it fails. maintain_run_partitions creates
+    them months ahead, this is the fallback when it stopped running.
+    """
+    month = add_months(run_at.date(), 0)
+    if month in _ensured_months:
+        return
+    if is_partitioned(db) and month not in {month for month, _ in get_run_partitions(db)}:
+        logger.error(
+            f"No partition of monitored_prompt_runs for {month:%Y-%m}, creating it."
+            " Is scheduled.maintain_run_partitions running?"
+        )
+        # Not remembered, the transaction creating it may still roll back
+        create_run_partitions(db, month, month)
+    else:
+        _ensured_months.add(month)
+
+
+def drop_empty_run_partitions(db: Session, before: datetime.date) -> list[str]:
+    """Drops the partitions of months ended before the day that have no runs left,
+    usually archived, see scheduled.archive_runs. Returns their names."""
+    dropped = []
+    for month, name in get_run_partitions(db):
+        if add_months(month, 1) > before:
+            break
+        if db.connection().execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar_one():
+            continue
+        # Detaching checks that no payload or citation references the partition
+        db.connection().execute(text(f"ALTER TABLE monitored_prompt_runs DETACH PARTITION {name}"))
+        db.connection().execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
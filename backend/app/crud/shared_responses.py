@@ -0,0 +1,41 @@
+import datetime
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, col, delete, select
+
+from app.models.shared_response import SharedResponse
+from app.models.types import default_now
+
+
+def get_shared_response(
+    db: Session, key: str, fetched_after: datetime.datetime
+) -> SharedResponse | None:
+    statement = select(SharedResponse).where(
+        SharedResponse.key == key,
+        SharedResponse.expires_at > default_now(),
+        SharedResponse.fetched_at > fetched_after,
+    )
+    return db.exec(statement).first()
+
+
+def save_shared_response(db: Session, shared_response: SharedResponse):
+    dialect = db.bind.dialect.name  # type: ignore
+    if dialect != "postgresql" and dialect != "sqlite":
+        raise ValueError(f"Unsupported dialect: {dialect}")
+    values = shared_response.model_dump()
+    statement = postgresql.insert(SharedResponse).values(values)
+    statement = statement.on_conflict_do_update(
+        index_elements=["key"],
+        set_={
+            "response": statement.excluded.response,
+            "fetched_at": statement.excluded.fetched_at,
+            "expires_at": statement.excluded.expires_at,
+        },
+    )
+    db.connection().execute(statement)
+
+
+def delete_expired_shared_responses(db: Session) -> int:
+    statement = delete(SharedResponse).where(col(SharedResponse.expires_at) <= default_now())
+    result = db.exec(statement)  # type: ignore
+    return result.rowcount
@@ -0,0 +1,76 @@
+"""Provider batch APIs for recurring runs that don't need an answer right away.
+
+Backends (settings.llm_batch_backend) are modules with:
+    PROVIDERS: providers whose requests they accept
+    submit(provider, model, requests) -> external id, requests: custom id => request body
+    get_status(external_id) -> "in_progress" | "completed" | "failed"
+    get_results(external_id) -> custom id => response body, failed requests are left out
+
+Requests and results use the OpenAI batch JSONL format.
+"""
+
+import json
+from importlib import import_module
+
+from app.models import Company, MonitoredPrompt, MonitoredPromptRun
+from app.settings import settings
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+def get_batch_backend():
+    return import_module(f"app.llm.batch.{settings.llm_batch_backend}")
+
+
+def get_batch_providers(prompt: MonitoredPrompt, channels: dict[str, str]) -> list[str]:
+    """Channels of the prompt's cycle to run through a batch job"""
+    if not settings.llm_batch_mode or prompt.last_run_at is None:
+        # First runs are awaited by the user
+        return []
+    if prompt.refresh_interval_seconds < settings.llm_batch_min_refresh_interval_seconds:
+        return []
+    providers = get_batch_backend().PROVIDERS
+    return [
+        provider
+        for provider, analyzer_type in channels.items()
+        if analyzer_type == "api" and provider in providers
+    ]
+
+
+def _get_provider_module(provider: str):
+    return import_module(f"app.llm.prompt_analyzers.{provider}_api")
+
+
+def get_batch_request(provider: str, prompt: MonitoredPrompt) -> dict:
+    return _get_provider_module(provider).get_batch_request(prompt)
+
+
+def build_batch_run(
+    provider: str, prompt: MonitoredPrompt, company: Company, response: dict
+) -> MonitoredPromptRun:
+    module = _get_provider_module(provider)
+    return module.build_prompt_run(prompt, company, module.get_batch_data(response))
+
+
+def format_requests(requests: dict[str, dict]) -> bytes:
+    lines = [
+        json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+        )
+        for custom_id, body in requests.items()
+    ]
+    return "\n".join(lines).encode()
+
+
+def parse_results(content: str) -> dict[str, dict]:
+    results = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response")
+        if response and response.get("status_code") == 200:
+            results[result["custom_id"]] = response["body"]
+    return results
@@ -0,0 +1,39 @@
+"""Local stand-in for a provider batch API, for tests and development.
+
+submit() writes <dir>/<id>.input.jsonl. The batch completes once something
+writes <dir>/<id>.output.jsonl (OpenAI batch output format), or fails on
+<dir>/<id>.error.
+"""
+
+import uuid
+from pathlib import Path
+
+from app.settings import settings
+
+from . import COMPLETED, FAILED, IN_PROGRESS, format_requests, parse_results
+
+PROVIDERS = {"openai"}
+
+
+def _path(external_id: str, suffix: str) -> Path:
+    return Path(settings.llm_batch_file_dir) / f"{external_id}.{suffix}"
+
+
+def submit(provider: str, model: str, requests: dict[str, dict]) -> str:
+    external_id = uuid.uuid4().hex
+    path = _path(external_id, "input.jsonl")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(format_requests(requests))
+    return external_id
+
+
+def get_status(external_id: str) -> str:
+    if _path(external_id, "output.jsonl").exists():
+        return COMPLETED
+    if _path(external_id, "error").exists():
+        return FAILED
+    return IN_PROGRESS
+
+
+def get_results(external_id: str) -> dict[str, dict]:
+    return parse_results(_path(external_id, "output.jsonl").read_text())
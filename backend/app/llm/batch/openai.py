@@ -0,0 +1,43 @@
+from app.llm.prompt_analyzers.clients import get_openai_client
+
+from . import COMPLETED, FAILED, IN_PROGRESS, format_requests, parse_results
+
+PROVIDERS = {"openai"}
+
+# expired batches still have results for the requests finished in time
+_STATUSES = {
+    "validating": IN_PROGRESS,
+    "in_progress": IN_PROGRESS,
+    "finalizing": IN_PROGRESS,
+    "completed": COMPLETED,
+    "expired": COMPLETED,
+    "failed": FAILED,
+    "cancelling": FAILED,
+    "cancelled": FAILED,
+}
+
+
+def submit(provider: str, model: str, requests: dict[str, dict]) -> str:
+    client = get_openai_client()
+    batch_file = client.files.create(
+        file=("requests.jsonl", format_requests(requests)), purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def get_status(external_id: str) -> str:
+    batch = get_openai_client().batches.retrieve(external_id)
+    return _STATUSES.get(batch.status, IN_PROGRESS)
+
+
+def get_results(external_id: str) -> dict[str, dict]:
+    client = get_openai_client()
+    batch = client.batches.retrieve(external_id)
+    if not batch.output_file_id:
+        return {}
+    return parse_results(client.files.content(batch.output_file_id).text)
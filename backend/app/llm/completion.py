@@ -7,6 +7,7 @@ import litellm
 from litellm.types.utils import ModelResponse
 from pydantic import BaseModel
 
+from app.llm.fake import get_random, get_structured_answer, simulate_call
 from app.models.llm_costs import LLMCost
 from app.settings import settings
 
@@ -48,21 +49,20 @@ def _get_completion_params_by_provider(provider: str):
     raise ValueError(f"Unknown provider: {provider}")
 
 
-def _get_litellm_params(prompt_type: PromptType):
+def _get_model_settings(prompt_type: PromptType) -> tuple[str, str, str | None]:
     if prompt_type == PromptType.COMPANY_CRAWL:
-        provider = settings.semi_smart_provider
-        model = settings.semi_smart_model
-        api_base = settings.semi_smart_api_base
-    elif prompt_type in (
+        return settings.semi_smart_provider, settings.semi_smart_model, settings.semi_smart_api_base
+    if prompt_type in (
         PromptType.PROMPT_SUGGESTIONS,
         PromptType.COMPETITOR_SUGGESTIONS,
         PromptType.RECOMMENDATION,
     ):
-        provider = settings.smart_provider
-        model = settings.smart_model
-        api_base = settings.smart_api_base
-    else:
-        raise ValueError(f"Unknown prompt type: {prompt_type}")
+        return settings.smart_provider, settings.smart_model, settings.smart_api_base
+    raise ValueError(f"Unknown prompt type: {prompt_type}")
+
+
+def _get_litellm_params(prompt_type: PromptType):
+    provider, model, api_base = _get_model_settings(prompt_type)
     params = {
         **_get_auth_by_provider(provider),
         **_get_completion_params_by_provider(provider),
@@ -106,6 +106,10 @@ def get_completion[T: BaseModel](
     response_schema: type[T],
     allow_search_tools: bool = False,
 ) -> tuple[T, LLMCost | None]:
+    if _get_model_settings(prompt_type)[0] == "fake":
+        rng = get_random("fake", prompt)
+        simulate_call(rng, "fake")
+        return get_structured_answer(rng, response_schema), None
     params = _get_litellm_params(prompt_type)
     params["response_format"] = response_schema
     if allow_search_tools:
@@ -0,0 +1,148 @@
+"""Simulated LLM provider for load and latency tests, no network calls.
+
+Select it with monitoring_channel_openai/gemini="fake" (prompt analyzers) or
+smart_provider/semi_smart_provider="fake" (get_completion). Latency follows a
+log-normal distribution around fake_llm_latency_median_seconds, calls fail with
+fake_llm_error_rate and answer 429 with fake_llm_rate_limit_rate or above
+fake_llm_rpm calls per minute (per process).
+
+With fake_llm_seed set, answers, latencies and failures are deterministic: they
+only depend on the seed, the prompt and how often it was asked before.
+"""
+
+import asyncio
+import enum
+import random
+import threading
+import time
+import types
+import typing
+from collections import Counter, deque
+
+from pydantic import BaseModel
+
+from app.models import Company
+from app.settings import settings
+
+DOMAINS = [
+    "g2.com",
+    "capterra.com",
+    "reddit.com",
+    "forbes.com",
+    "techradar.com",
+    "zapier.com",
+    "hubspot.com",
+    "medium.com",
+    "wikipedia.org",
+    "youtube.com",
+    "pcmag.com",
+    "gartner.com",
+]
+BRANDS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell"]
+
+
+class FakeLLMError(Exception):
+    status_code = 500
+
+
+class FakeRateLimitError(FakeLLMError):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_calls: Counter[str] = Counter()
+_recent_calls: deque[float] = deque()
+_lock = threading.Lock()
+
+
+def get_random(provider: str, prompt: str) -> random.Random:
+    if settings.fake_llm_seed is None:
+        return random.Random()
+    key = f"{provider}\n{prompt}"
+    with _lock:
+        _calls[key] += 1
+        attempt = _calls[key]
+    return random.Random(f"{settings.fake_llm_seed}\n{key}\n{attempt}")
+
+
+def _check_call(rng: random.Random, provider: str) -> float:
+    """Latency of the call in seconds, raises its simulated failure"""
+    latency = rng.lognormvariate(0, settings.fake_llm_latency_sigma)
+    latency *= settings.fake_llm_latency_median_seconds
+    if settings.fake_llm_rpm:
+        now = time.monotonic()
+        with _lock:
+            while _recent_calls and _recent_calls[0] <= now - 60:
+                _recent_calls.popleft()
+            retry_after = None
+            if len(_recent_calls) >= settings.fake_llm_rpm:
+                retry_after = 60 - (now - _recent_calls[0])
+            else:
+                _recent_calls.append(now)
+        if retry_after is not None:
+            raise FakeRateLimitError(f"{provider} (fake): rpm exceeded", retry_after)
+    roll = rng.random()
+    if roll < settings.fake_llm_rate_limit_rate:
+        raise FakeRateLimitError(f"{provider} (fake): rate limited", rng.uniform(1, 10))
+    if roll < settings.fake_llm_rate_limit_rate + settings.fake_llm_error_rate:
+        raise FakeLLMError(f"{provider} (fake): internal error")
+    return latency
+
+
+def simulate_call(rng: random.Random, provider: str):
+    time.sleep(_check_call(rng, provider))
+
+
+async def simulate_call_async(rng: random.Random, provider: str):
+    await asyncio.sleep(_check_call(rng, provider))
+
+
+def get_answer(rng: random.Random, prompt: str, company: Company) -> tuple[str, list[str]]:
+    """Answer text and cited URLs. The company is mentioned and cited with
+    fake_llm_mention_rate each."""
+    brands = rng.sample(BRANDS, rng.randint(2, 5))
+    if rng.random() < settings.fake_llm_mention_rate:
+        brands.insert(rng.randrange(len(brands) + 1), company.name)
+    lines = [f"Here are some options for {prompt.strip().rstrip('?')}:"]
+    for idx, name in enumerate(brands):
+        lines.append(f"{idx + 1}. **{name}**: {rng.choice(['popular', 'affordable', 'robust'])}.")
+    domains = rng.sample(DOMAINS, rng.randint(3, 8))
+    urls = [f"https://www.{domain}/{rng.getrandbits(32):x}" for domain in domains]
+    if rng.random() < settings.fake_llm_mention_rate:
+        website = company.website.rstrip("/")
+        urls.insert(rng.randrange(len(urls) + 1), f"{website}/{rng.getrandbits(32):x}")
+    return "\n".join(lines), urls
+
+
+def _fake_value(annotation, rng: random.Random):
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (typing.Union, types.UnionType):
+        return _fake_value(next(arg for arg in args if arg is not type(None)), rng)
+    if origin is typing.Literal:
+        return rng.choice(args)
+    if origin in (list, set, tuple):
+        return [_fake_value(args[0] if args else str, rng) for _ in range(rng.randint(1, 3))]
+    if origin is dict:
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            name: _fake_value(field.annotation, rng)
+            for name, field in annotation.model_fields.items()
+        }
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return rng.choice(list(annotation)).value
+    if annotation is bool:
+        return rng.random() < 0.5
+    if annotation is int:
+        return rng.randint(1, 10)
+    if annotation is float:
+        return round(rng.random(), 2)
+    return f"fake {rng.choice(BRANDS).lower()} {rng.getrandbits(16):x}"
+
+
+def get_structured_answer[T: BaseModel](rng: random.Random, response_schema: type[T]) -> T:
+    return response_schema.model_validate(_fake_value(response_schema, rng))
@@ -1,6 +1,19 @@
+import json
 from importlib import import_module
 
 from app.models import Company, MonitoredPrompt, MonitoredPromptRun
+from app.settings import settings
+
+
+def get_channels() -> dict[str, str]:
+    """Enabled monitoring channels, provider => analyzer type"""
+    channels = {
+        "gemini": settings.monitoring_channel_gemini,
+        "openai": settings.monitoring_channel_openai,
+    }
+    return {
+        provider: analyzer_type for provider, analyzer_type in channels.items() if analyzer_type
+    }
 
 
 def get_analyzer(*, analyzer_type: str, provider: str):
@@ -8,8 +21,33 @@ def get_analyzer(*, analyzer_type: str, provider: str):
     return module.analyze_prompt
 
 
+def rebuild_prompt_run(
+    prompt: MonitoredPrompt,
+    company: Company,
+    *,
+    provider: str,
+    raw_response: str,
+    mentioned_pages: str | None = None,
+) -> MonitoredPromptRun:
+    """Re-derives a run from its stored raw response, without calling the LLM or any
+    other network I/O. mentioned_pages are the run's, kept where they can't be re-derived."""
+    module = import_module(f"app.llm.prompt_analyzers.{provider}_api")
+    data = json.loads(raw_response)
+    if provider == "gemini":
+        # Older responses have no resolved_uris, resolving the redirects takes requests
+        return module.build_prompt_run(prompt, company, data, mentioned_pages=mentioned_pages)
+    return module.build_prompt_run(prompt, company, data)
+
+
 def analyze_prompt(
     prompt: MonitoredPrompt, company: Company, *, analyzer_type: str, provider: str
 ) -> MonitoredPromptRun:
     analyzer = get_analyzer(analyzer_type=analyzer_type, provider=provider)
     return analyzer(prompt, company)
+
+
+async def analyze_prompt_async(
+    prompt: MonitoredPrompt, company: Company, *, analyzer_type: str, provider: str
+) -> MonitoredPromptRun:
+    module = import_module(f"app.llm.prompt_analyzers.{provider}_{analyzer_type}")
+    return await module.analyze_prompt_async(prompt, company)
@@ -0,0 +1,67 @@
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.models import Company
+
+
+@dataclass(frozen=True)
+class BrandMatch:
+    text: str
+    start: int
+    end: int
+
+
+def _trie_pattern(words: set[str]) -> str:
+    # Names sharing a prefix share a branch, so matching at a position doesn't
+    # retry every alias: cost grows with the text, not the alias count.
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional continuation is greedy, the longest name wins
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class BrandMatcher:
+    """Company name and aliases compiled into one case-insensitive regex.
+
+    Names only match as whole words (Unicode aware), "Acme" doesn't match "Acmeware".
+    """
+
+    def __init__(self, names: list[str]):
+        words = {name.strip().lower() for name in names if name.strip()}
+        self._empty = not words
+        self._pattern = re.compile(rf"(?<!\w)(?:{_trie_pattern(words)})(?!\w)", re.IGNORECASE)
+
+    def find_all(self, text: str) -> list[BrandMatch]:
+        if self._empty:
+            return []
+        return [BrandMatch(m.group(), m.start(), m.end()) for m in self._pattern.finditer(text)]
+
+    def is_mentioned(self, text: str) -> bool:
+        return not self._empty and self._pattern.search(text) is not None
+
+
+@lru_cache(maxsize=1024)
+def _compile(name: str, name_aliases: str | None) -> BrandMatcher:
+    names = [name, name.replace(" ", "")]
+    if name_aliases:
+        names.extend(json.loads(name_aliases))
+    return BrandMatcher(names)
+
+
+def get_brand_matcher(company: Company) -> BrandMatcher:
+    # Keyed by the names themselves, so an updated company gets a new matcher
+    return _compile(company.name, company.name_aliases)
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import threading
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import requests
+from google import genai
+from google.genai.types import HttpOptions
+from google.oauth2 import service_account
+from openai import AsyncOpenAI, OpenAI
+from requests.adapters import HTTPAdapter
+
+from app.settings import settings
+
+# Provider clients keep their HTTP connection pools, reuse them across analyses.
+# Keys include whatever the client was built from, so changed settings or a
+# rotated credentials file get a fresh client.
+_clients: dict[tuple, Any] = {}
+# Async clients' pools are bound to the event loop they were first used on, they
+# are cached per loop. Keyed by the loop itself, an id could be reused by a new one.
+_loop_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, Any]] = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Sockets inherited from the parent (celery prefork) must not be shared
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+    _loop_clients.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_client(key: tuple, factory: Callable[[], Any]):
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def _get_loop_client(key: tuple, factory: Callable[[], Any]):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # A used client references its loop, the entries of closed loops would
+        # keep both alive
+        for closed in [other for other in _loop_clients if other.is_closed()]:
+            del _loop_clients[closed]
+        clients = _loop_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = factory()
+    return client
+
+
+def get_openai_client() -> OpenAI:
+    api_key = settings.openai_api_key
+    return _get_client(("openai", api_key), lambda: OpenAI(api_key=api_key))
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    api_key = settings.openai_api_key
+    return _get_loop_client(("openai", api_key), lambda: AsyncOpenAI(api_key=api_key))
+
+
+def _create_gemini_client(credentials_path: str, location: str) -> genai.Client:
+    info = json.loads(Path(credentials_path).read_text())
+    credentials = service_account.Credentials.from_service_account_info(
+        info,
+        scopes=[
+            "https://www.googleapis.com/auth/generative-language",
+            "https://www.googleapis.com/auth/cloud-platform",
+        ],
+    )
+    # Access tokens are refreshed by google-auth when they expire
+    return genai.Client(
+        http_options=HttpOptions(api_version="v1"),
+        vertexai=True,
+        project=info["project_id"],
+        location=location,
+        credentials=credentials,
+    )
+
+
+def _get_gemini_client(get_client: Callable[[tuple, Callable[[], Any]], Any]) -> genai.Client:
+    credentials_path = settings.vertex_credentials_path
+    location = settings.vertex_location
+    mtime = os.stat(credentials_path).st_mtime_ns
+    return get_client(
+        ("gemini", credentials_path, mtime, location),
+        lambda: _create_gemini_client(credentials_path, location),
+    )
+
+
+def get_gemini_client() -> genai.Client:
+    return _get_gemini_client(_get_client)
+
+
+def get_async_gemini_client() -> genai.Client:
+    """Client for the .aio API, whose pool is bound to the running loop like AsyncOpenAI's"""
+    return _get_gemini_client(_get_loop_client)
+
+
+def get_resolve_workers() -> int:
+    """Redirect resolution threads per process, see redirects. Enough for a full
+    inline batch of analyses to resolve at once."""
+    return settings.redirect_resolve_max_workers * settings.inline_max_workers
+
+
+def _create_http_session() -> requests.Session:
+    session = requests.Session()
+    # A connection per redirect resolution thread, more would be discarded
+    adapter = HTTPAdapter(pool_maxsize=get_resolve_workers())
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Keep-alive session for plain HTTP calls of analyzers, e.g. redirect resolution"""
+    return _get_client(("http",), _create_http_session)
@@ -1,101 +1,138 @@
+import asyncio
 import json
 import logging
-from pathlib import Path
 
-import requests
-from google import genai
 from google.genai.types import (
     Candidate,
     GenerateContentConfig,
     GoogleSearch,
-    HttpOptions,
     ThinkingConfig,
     Tool,
 )
-from google.oauth2 import service_account
 
+from app.llm.rate_limit import acquire, acquire_async, estimate_tokens, record_usage
 from app.models import Company, MonitoredPrompt, MonitoredPromptRun
 from app.settings import settings
 
+from .brand_matcher import get_brand_matcher
+from .clients import get_async_gemini_client, get_gemini_client
 from .helpers import normalize_domain
+from .redirects import resolve_redirect_uris
+from .shared import get_response, get_response_async
 
 logger = logging.getLogger(__name__)
 
 
-def _get_gemini_client():
-    credentials = service_account.Credentials.from_service_account_file(
-        settings.vertex_credentials_path,
-        scopes=[
-            "https://www.googleapis.com/auth/generative-language",
-            "https://www.googleapis.com/auth/cloud-platform",
-        ],
-    )
-    project = json.loads(Path(settings.vertex_credentials_path).read_text())["project_id"]
-    return genai.Client(
-        http_options=HttpOptions(api_version="v1"),
-        vertexai=True,
-        project=project,
-        location=settings.vertex_location,
-        credentials=credentials,
-    )
-
-
-def _gemini_grounded_completion(prompt: str) -> tuple[Candidate, str]:
-    config = GenerateContentConfig(
+def _get_generate_content_config() -> GenerateContentConfig:
+    return GenerateContentConfig(
         tools=[Tool(google_search=GoogleSearch())],
         thinking_config=ThinkingConfig(
             thinking_budget=2048,
             include_thoughts=True,
         ),
     )
-    response = _get_gemini_client().models.generate_content(
-        model=settings.api_monitoring_model_gemini,
+
+
+def _gemini_grounded_completion(prompt: str) -> tuple[Candidate, str]:
+    model = settings.api_monitoring_model_gemini
+    estimated_tokens = estimate_tokens(prompt)
+    acquire("gemini", model, estimated_tokens)
+    response = get_gemini_client().models.generate_content(
+        model=model,
+        contents=prompt,
+        config=_get_generate_content_config(),
+    )
+    usage = response.usage_metadata
+    record_usage("gemini", model, estimated_tokens, usage.total_token_count if usage else None)
+    return response.candidates[0], response.text  # type: ignore
+
+
+async def _gemini_grounded_completion_async(prompt: str) -> tuple[Candidate, str]:
+    model = settings.api_monitoring_model_gemini
+    estimated_tokens = estimate_tokens(prompt)
+    await acquire_async("gemini", model, estimated_tokens)
+    response = await get_async_gemini_client().aio.models.generate_content(
+        model=model,
         contents=prompt,
-        config=config,
+        config=_get_generate_content_config(),
     )
+    usage = response.usage_metadata
+    used_tokens = usage.total_token_count if usage else None
+    await asyncio.to_thread(record_usage, "gemini", model, estimated_tokens, used_tokens)
     return response.candidates[0], response.text  # type: ignore
 
 
-def _resolve_redirect_uri(uri: str):
-    logger.info(f"Resolving redirect URI: {uri}")
-    max_attempts = 3
-    for attempt in range(max_attempts):
-        try:
-            response = requests.head(uri, allow_redirects=True, timeout=10)
-            logger.info(f"Resolved redirect URI: {uri} => {response.url}")
-            return response.url
-        except requests.RequestException as e:
-            logger.warning(
-                f"Failed to resolve redirect URI: {uri} (attempt {attempt + 1}/{max_attempts}): {e}"
-            )
-    logger.warning(f"Failed to resolve redirect URI: {uri} after {max_attempts} attempts")
-    return uri
+def _resolve_citations(data: dict):
+    # Gemini returns redirect URI via vertexaisearch.cloud.google.com,
+    # not the actual page. Kept in the response for sharing and re-analysis.
+    chunks = data["grounding_metadata"]["grounding_chunks"]
+    data["resolved_uris"] = resolve_redirect_uris([chunk["web"]["uri"] for chunk in chunks])
 
 
-def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
-    result, text = _gemini_grounded_completion(prompt.prompt)
+def _fetch_response(prompt: str) -> dict:
+    result, text = _gemini_grounded_completion(prompt)
     data = result.model_dump()  # type: ignore
     data["text"] = text
-    brand_names = [company.name, company.name.replace(" ", "")]
-    if company.name_aliases:
-        brand_names.extend(json.loads(company.name_aliases))
-    brand_mentioned = any(name.lower() in text.lower() for name in brand_names)
+    _resolve_citations(data)
+    return data
+
+
+async def _fetch_response_async(prompt: str) -> dict:
+    result, text = await _gemini_grounded_completion_async(prompt)
+    data = result.model_dump()  # type: ignore
+    data["text"] = text
+    # Resolving citation redirects is blocking I/O
+    await asyncio.to_thread(_resolve_citations, data)
+    return data
+
+
+def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    data = get_response(
+        "gemini",
+        settings.api_monitoring_model_gemini,
+        prompt,
+        lambda: _fetch_response(prompt.prompt),
+    )
+    return build_prompt_run(prompt, company, data)
+
+
+async def analyze_prompt_async(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    data = await get_response_async(
+        "gemini",
+        settings.api_monitoring_model_gemini,
+        prompt,
+        lambda: _fetch_response_async(prompt.prompt),
+    )
+    return build_prompt_run(prompt, company, data)
+
+
+def build_prompt_run(
+    prompt: MonitoredPrompt,
+    company: Company,
+    data: dict,
+    *,
+    mentioned_pages: str | None = None,
+) -> MonitoredPromptRun:
+    """mentioned_pages: the run's stored pages, kept for responses saved before
+    resolved_uris, their redirects aren't resolved again"""
+    text = data["text"]
+    brand_mentioned = get_brand_matcher(company).is_mentioned(text)
     domain_normalized = normalize_domain(company.website)
     company_domain_rank = None
-    mentioned_pages = []
-    for idx, chunk in enumerate(data["grounding_metadata"]["grounding_chunks"]):
+    pages = []
+    chunks = data["grounding_metadata"]["grounding_chunks"]
+    resolved_uris = data.get("resolved_uris")
+    for idx, chunk in enumerate(chunks):
         # endswith to handle e.g. blog.example.com
         if normalize_domain(chunk["web"]["domain"]).endswith(domain_normalized):
             if not company_domain_rank:
                 company_domain_rank = idx + 1
-        redirect_uri = chunk["web"]["uri"]
-        logger.info(f"Resolving redirect URI: {redirect_uri}")
-        # Gemini returns redirect URI via vertexaisearch.cloud.google.com,
-        # not the actual page
-        resolved = _resolve_redirect_uri(redirect_uri)
-        if resolved != redirect_uri:
-            mentioned_pages.append(resolved)
-    domains = [x["web"]["domain"] for x in data["grounding_metadata"]["grounding_chunks"]]
+        if resolved_uris is not None:
+            redirect_uri = chunk["web"]["uri"]
+            resolved = resolved_uris.get(redirect_uri, redirect_uri)
+            if resolved != redirect_uri:
+                pages.append(resolved)
+    domains = [x["web"]["domain"] for x in chunks]
     assert prompt.id is not None
     return MonitoredPromptRun(
         monitored_prompt_id=prompt.id,
@@ -105,5 +142,7 @@ def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPrompt
         top_domain=domains[0] if domains else None,
         brand_mentioned=brand_mentioned,
         company_domain_rank=company_domain_rank,
-        mentioned_pages=json.dumps(mentioned_pages) if mentioned_pages else None,
+        mentioned_pages=(
+            mentioned_pages if resolved_uris is None else json.dumps(pages) if pages else None
+        ),
     )
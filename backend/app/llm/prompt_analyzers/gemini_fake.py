@@ -0,0 +1,47 @@
+import random
+
+from app.llm.fake import get_answer, get_random, simulate_call, simulate_call_async
+from app.llm.rate_limit import acquire, acquire_async, estimate_tokens
+from app.models import Company, MonitoredPrompt, MonitoredPromptRun
+
+from .gemini_api import build_prompt_run
+from .helpers import normalize_domain
+
+REDIRECT_URI = "https://vertexaisearch.cloud.google.com/grounding-api-redirect/"
+
+
+def _get_data(rng: random.Random, prompt: MonitoredPrompt, company: Company) -> dict:
+    text, urls = get_answer(rng, prompt.prompt, company)
+    # Redirects come pre-resolved, build_prompt_run doesn't resolve them
+    resolved_uris = {f"{REDIRECT_URI}{rng.getrandbits(128):x}": url for url in urls}
+    chunks = [
+        {"web": {"uri": uri, "domain": normalize_domain(url), "title": normalize_domain(url)}}
+        for uri, url in resolved_uris.items()
+    ]
+    return {
+        "content": {"parts": [{"text": text}], "role": "model"},
+        "finish_reason": "STOP",
+        "grounding_metadata": {"grounding_chunks": chunks, "web_search_queries": [prompt.prompt]},
+        "text": text,
+        "resolved_uris": resolved_uris,
+    }
+
+
+def _build_run(rng: random.Random, prompt: MonitoredPrompt, company: Company):
+    run = build_prompt_run(prompt, company, _get_data(rng, prompt, company))
+    run.llm_model = "fake"
+    return run
+
+
+def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    rng = get_random("gemini", prompt.prompt)
+    acquire("gemini", "fake", estimate_tokens(prompt.prompt))
+    simulate_call(rng, "gemini")
+    return _build_run(rng, prompt, company)
+
+
+async def analyze_prompt_async(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    rng = get_random("gemini", prompt.prompt)
+    await acquire_async("gemini", "fake", estimate_tokens(prompt.prompt))
+    await simulate_call_async(rng, "gemini")
+    return _build_run(rng, prompt, company)
@@ -1,42 +1,94 @@
+import asyncio
 import json
 
-from openai import OpenAI
-
+from app.llm.prompt_analyzers.brand_matcher import get_brand_matcher
+from app.llm.prompt_analyzers.clients import get_async_openai_client, get_openai_client
 from app.llm.prompt_analyzers.helpers import normalize_domain
+from app.llm.prompt_analyzers.shared import get_response, get_response_async
+from app.llm.rate_limit import acquire, acquire_async, estimate_tokens, record_usage
 from app.models import Company, MonitoredPrompt, MonitoredPromptRun
 from app.settings import settings
 
 
-def _get_openai_completion(prompt: str):
-    client = OpenAI(api_key=settings.openai_api_key)
-    completion = client.chat.completions.create(
-        model=settings.api_monitoring_model_openai,
-        web_search_options={
+def _get_completion_params(model: str, prompt: str, country: str) -> dict:
+    return {
+        "model": model,
+        "web_search_options": {
             "user_location": {
                 "type": "approximate",
                 "approximate": {
-                    "country": "US",
+                    "country": country,
                 },
             },
         },
-        messages=[
+        "messages": [
             {
                 "role": "user",
                 "content": prompt,
             }
         ],
+    }
+
+
+def _get_openai_completion(prompt: str, country: str):
+    model = settings.api_monitoring_model_openai
+    estimated_tokens = estimate_tokens(prompt)
+    acquire("openai", model, estimated_tokens)
+    completion = get_openai_client().chat.completions.create(
+        **_get_completion_params(model, prompt, country)
     )
+    used_tokens = completion.usage.total_tokens if completion.usage else None
+    record_usage("openai", model, estimated_tokens, used_tokens)
+    return completion.choices[0]
+
+
+async def _get_openai_completion_async(prompt: str, country: str):
+    model = settings.api_monitoring_model_openai
+    estimated_tokens = estimate_tokens(prompt)
+    await acquire_async("openai", model, estimated_tokens)
+    completion = await get_async_openai_client().chat.completions.create(
+        **_get_completion_params(model, prompt, country)
+    )
+    used_tokens = completion.usage.total_tokens if completion.usage else None
+    await asyncio.to_thread(record_usage, "openai", model, estimated_tokens, used_tokens)
     return completion.choices[0]
 
 
 def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
-    result = _get_openai_completion(prompt.prompt)
-    data = result.model_dump()  # type: ignore
+    country = prompt.target_country or "US"
+    data = get_response(
+        "openai",
+        settings.api_monitoring_model_openai,
+        prompt,
+        lambda: _get_openai_completion(prompt.prompt, country).model_dump(),
+    )
+    return build_prompt_run(prompt, company, data)
+
+
+async def analyze_prompt_async(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    country = prompt.target_country or "US"
+
+    async def fetch() -> dict:
+        result = await _get_openai_completion_async(prompt.prompt, country)
+        return result.model_dump()
+
+    data = await get_response_async("openai", settings.api_monitoring_model_openai, prompt, fetch)
+    return build_prompt_run(prompt, company, data)
+
+
+def get_batch_request(prompt: MonitoredPrompt) -> dict:
+    model = settings.api_monitoring_model_openai
+    return _get_completion_params(model, prompt.prompt, prompt.target_country or "US")
+
+
+def get_batch_data(response: dict) -> dict:
+    # Same shape as the choice analyze_prompt passes on
+    return response["choices"][0]
+
+
+def build_prompt_run(prompt: MonitoredPrompt, company: Company, data: dict) -> MonitoredPromptRun:
     text = data["message"]["content"]
-    brand_names = [company.name, company.name.replace(" ", "")]
-    if company.name_aliases:
-        brand_names.extend(json.loads(company.name_aliases))
-    brand_mentioned = any(name.lower() in text.lower() for name in brand_names)
+    brand_mentioned = get_brand_matcher(company).is_mentioned(text)
     domain_normalized = normalize_domain(company.website)
     company_domain_rank = None
     mentioned_pages = []
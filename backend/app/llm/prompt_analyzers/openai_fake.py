@@ -0,0 +1,43 @@
+import random
+
+from app.llm.fake import get_answer, get_random, simulate_call, simulate_call_async
+from app.llm.rate_limit import acquire, acquire_async, estimate_tokens
+from app.models import Company, MonitoredPrompt, MonitoredPromptRun
+
+from .openai_api import build_prompt_run
+
+
+def _get_choice(rng: random.Random, prompt: MonitoredPrompt, company: Company) -> dict:
+    text, urls = get_answer(rng, prompt.prompt, company)
+    annotations = [
+        {
+            "type": "url_citation",
+            "url_citation": {"url": url, "title": url, "start_index": 0, "end_index": 0},
+        }
+        for url in urls
+    ]
+    return {
+        "finish_reason": "stop",
+        "index": 0,
+        "message": {"role": "assistant", "content": text, "annotations": annotations},
+    }
+
+
+def _build_run(rng: random.Random, prompt: MonitoredPrompt, company: Company):
+    run = build_prompt_run(prompt, company, _get_choice(rng, prompt, company))
+    run.llm_model = "fake"
+    return run
+
+
+def analyze_prompt(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    rng = get_random("openai", prompt.prompt)
+    acquire("openai", "fake", estimate_tokens(prompt.prompt))
+    simulate_call(rng, "openai")
+    return _build_run(rng, prompt, company)
+
+
+async def analyze_prompt_async(prompt: MonitoredPrompt, company: Company) -> MonitoredPromptRun:
+    rng = get_random("openai", prompt.prompt)
+    await acquire_async("openai", "fake", estimate_tokens(prompt.prompt))
+    await simulate_call_async(rng, "openai")
+    return _build_run(rng, prompt, company)
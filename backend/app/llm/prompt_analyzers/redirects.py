@@ -0,0 +1,180 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from app.crud.redirect_cache import get_cached_redirects, save_cached_redirects
+from app.db import get_celery_db
+from app.models.types import default_now
+from app.settings import settings
+
+from .clients import get_http_session, get_resolve_workers
+
+logger = logging.getLogger(__name__)
+
+# Per process, negative_hits are part of the hits, see get_cache_stats
+_stats: Counter[str] = Counter(memory_hits=0, shared_hits=0, misses=0, negative_hits=0)
+
+
+class _MemoryCache:
+    """In-process LRU in front of the shared redirect_cache table"""
+
+    def __init__(self):
+        self._entries: OrderedDict[str, tuple[str | None, datetime.datetime]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uri: str) -> tuple[bool, str | None]:
+        with self._lock:
+            entry = self._entries.get(uri)
+            if entry is None:
+                return False, None
+            if entry[1] <= default_now():
+                del self._entries[uri]
+                return False, None
+            self._entries.move_to_end(uri)
+            return True, entry[0]
+
+    def put(self, uri: str, resolved_uri: str | None, expires_at: datetime.datetime):
+        with self._lock:
+            self._entries[uri] = (resolved_uri, expires_at)
+            self._entries.move_to_end(uri)
+            while len(self._entries) > settings.redirect_cache_memory_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_memory_cache = _MemoryCache()
+
+# Shared by concurrent analyses (inline batches, async engine), see get_resolve_workers
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # The parent's worker threads don't exist in the child
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    get_resolve_workers(), thread_name_prefix="resolve-redirect"
+                )
+    return _executor
+
+
+def get_cache_stats() -> dict[str, float]:
+    hits = _stats["memory_hits"] + _stats["shared_hits"]
+    lookups = hits + _stats["misses"]
+    return {**_stats, "hit_rate": hits / lookups if lookups else 0.0}
+
+
+def _resolve_redirect_uri(uri: str, deadline: float) -> str | None:
+    max_attempts = 3
+    for attempt in range(max_attempts):
+        timeout = min(settings.redirect_resolve_timeout_seconds, deadline - time.monotonic())
+        if timeout <= 0:
+            break
+        try:
+            response = get_http_session().head(uri, allow_redirects=True, timeout=timeout)
+            logger.info(f"Resolved redirect URI: {uri} => {response.url}")
+            return response.url
+        except requests.RequestException as e:
+            logger.warning(
+                f"Failed to resolve redirect URI: {uri} (attempt {attempt + 1}/{max_attempts}): {e}"
+            )
+    logger.warning(f"Failed to resolve redirect URI: {uri}")
+    return None
+
+
+def _resolve_concurrently(uris: Sequence[str]) -> dict[str, str | None]:
+    """Resolved URI or None if failed, URIs not finished before the deadline are left out"""
+    deadline = time.monotonic() + settings.redirect_resolve_deadline_seconds
+    executor = _get_executor()
+    futures = {executor.submit(_resolve_redirect_uri, uri, deadline): uri for uri in uris}
+    done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    # Running resolutions stop on their own, at the latest on their request timeout
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        logger.warning(f"{len(not_done)} redirect URIs not resolved before the deadline.")
+    return {futures[future]: future.result() for future in done if future.exception() is None}
+
+
+def _get_shared(uris: Sequence[str]) -> dict[str, tuple[str | None, datetime.datetime]]:
+    try:
+        with get_celery_db() as db:
+            entries = get_cached_redirects(db, uris)
+            return {uri: (entry.resolved_uri, entry.expires_at) for uri, entry in entries.items()}
+    except Exception:
+        logger.exception("Failed to read the redirect cache.")
+        return {}
+
+
+def _save_shared(entries: dict[str, tuple[str | None, datetime.datetime]]):
+    try:
+        with get_celery_db() as db:
+            save_cached_redirects(db, entries)
+    except Exception:
+        logger.exception("Failed to save the redirect cache.")
+
+
+def resolve_redirect_uris(uris: Sequence[str]) -> dict[str, str]:
+    """Resolves redirects concurrently, within redirect_resolve_deadline_seconds overall.
+
+    URIs that can't be resolved (or not in time) map to themselves. The deadline
+    only bounds the resolution, not the analysis calling it: the LLM call has its
+    own timeouts, inline tasks inline_task_timeout_seconds.
+    """
+    unique_uris = list(dict.fromkeys(uris))
+    resolved: dict[str, str | None] = {}
+    if settings.redirect_cache:
+        for uri in unique_uris:
+            hit, resolved_uri = _memory_cache.get(uri)
+            if hit:
+                resolved[uri] = resolved_uri
+                _stats["memory_hits"] += 1
+        missing = [uri for uri in unique_uris if uri not in resolved]
+        shared = _get_shared(missing) if missing else {}
+        for uri, (resolved_uri, expires_at) in shared.items():
+            _memory_cache.put(uri, resolved_uri, expires_at.replace(tzinfo=datetime.UTC))
+            resolved[uri] = resolved_uri
+            _stats["shared_hits"] += 1
+        _stats["negative_hits"] += sum(1 for value in resolved.values() if value is None)
+    missing = [uri for uri in unique_uris if uri not in resolved]
+    if missing:
+        _stats["misses"] += len(missing)
+        fresh = _resolve_concurrently(missing)
+        resolved.update(fresh)
+        if settings.redirect_cache and fresh:
+            now = default_now()
+            entries = {}
+            for uri, resolved_uri in fresh.items():
+                ttl = (
+                    settings.redirect_cache_ttl_seconds
+                    if resolved_uri is not None
+                    else settings.redirect_cache_negative_ttl_seconds
+                )
+                entries[uri] = (resolved_uri, now + datetime.timedelta(seconds=ttl))
+                _memory_cache.put(uri, *entries[uri])
+            _save_shared(entries)
+    if unique_uris:
+        logger.info(f"Redirect cache: {get_cache_stats()}")
+    return {uri: resolved.get(uri) or uri for uri in unique_uris}
@@ -0,0 +1,138 @@
+"""Sharing LLM responses across companies.
+
+The answer to a prompt doesn't depend on the company monitoring it, only its
+analysis does. Responses are stored in the shared_responses table, keyed by
+provider, model, target country and normalized prompt text, and reused within
+shared_response_ttl_seconds, capped at half the refresh interval of the prompt
+asking. Concurrent fetches of the same key in one process wait for the first one.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+
+from app.crud.shared_responses import get_shared_response, save_shared_response
+from app.db import get_celery_db
+from app.models import MonitoredPrompt
+from app.models.shared_response import SharedResponse
+from app.models.types import default_now
+from app.settings import settings
+from app.utils import calculate_hash
+
+logger = logging.getLogger(__name__)
+
+_in_flight: dict[str, Future] = {}
+_in_flight_async: dict[str, asyncio.Future] = {}
+_lock = threading.Lock()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+
+def _get_key(provider: str, model: str, prompt: MonitoredPrompt) -> str:
+    country = prompt.target_country or ""
+    return calculate_hash(f"{provider}\n{model}\n{country}\n{normalize_prompt(prompt.prompt)}")
+
+
+def _get_fetched_after(prompt: MonitoredPrompt) -> datetime.datetime:
+    # Under the prompt's interval, so its next cycle never gets back the response of the
+    # previous one and records it as a new run. Half, as that response can have been
+    # fetched well after its cycle started.
+    max_age = min(settings.shared_response_ttl_seconds, prompt.refresh_interval_seconds / 2)
+    return default_now() - datetime.timedelta(seconds=max_age)
+
+
+def _load(key: str, prompt: MonitoredPrompt) -> dict | None:
+    try:
+        with get_celery_db() as db:
+            shared_response = get_shared_response(db, key, _get_fetched_after(prompt))
+            return json.loads(shared_response.response) if shared_response else None
+    except Exception:
+        logger.exception("Failed to read the shared responses.")
+        return None
+
+
+def _save(key: str, provider: str, model: str, prompt: MonitoredPrompt, data: dict):
+    now = default_now()
+    shared_response = SharedResponse(
+        key=key,
+        provider=provider,
+        model=model,
+        target_country=prompt.target_country,
+        prompt=normalize_prompt(prompt.prompt),
+        response=json.dumps(data),
+        fetched_at=now,
+        expires_at=now + datetime.timedelta(seconds=settings.shared_response_ttl_seconds),
+    )
+    try:
+        with get_celery_db() as db:
+            save_shared_response(db, shared_response)
+    except Exception:
+        logger.exception("Failed to save the shared response.")
+
+
+def get_response(
+    provider: str, model: str, prompt: MonitoredPrompt, fetch: Callable[[], dict]
+) -> dict:
+    """Shared response for the prompt, fetch() is only called if there is none"""
+    if not settings.shared_responses:
+        return fetch()
+    key = _get_key(provider, model, prompt)
+    data = _load(key, prompt)
+    if data is not None:
+        logger.info(f"Shared {provider} response reused for prompt {prompt.id}.")
+        return data
+    with _lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    assert future is not None
+    if not owner:
+        return future.result()
+    try:
+        data = fetch()
+        future.set_result(data)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            del _in_flight[key]
+    _save(key, provider, model, prompt, data)
+    return data
+
+
+async def get_response_async(
+    provider: str, model: str, prompt: MonitoredPrompt, fetch: Callable[[], Awaitable[dict]]
+) -> dict:
+    if not settings.shared_responses:
+        return await fetch()
+    key = _get_key(provider, model, prompt)
+    data = await asyncio.to_thread(_load, key, prompt)
+    if data is not None:
+        logger.info(f"Shared {provider} response reused for prompt {prompt.id}.")
+        return data
+    future = _in_flight_async.get(key)
+    if future is not None:
+        # shield: a cancelled waiter must not cancel the fetch of the others
+        return await asyncio.shield(future)
+    future = _in_flight_async[key] = asyncio.get_running_loop().create_future()
+    try:
+        data = await fetch()
+        future.set_result(data)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        del _in_flight_async[key]
+        # Retrieved, so waiter-less failures aren't reported as never retrieved
+        if future.done() and not future.cancelled():
+            future.exception()
+    await asyncio.to_thread(_save, key, provider, model, prompt, data)
+    return data
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from importlib import import_module
+
+from app.settings import settings
+
+from .bucket import RateLimit
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeoutError(Exception):
+    pass
+
+
+def get_rate_limit(provider: str, model: str) -> RateLimit | None:
+    limits = settings.rate_limits.get(f"{provider}/{model}") or settings.rate_limits.get(provider)
+    if not limits:
+        return None
+    return RateLimit(rpm=limits.get("rpm", 0), tpm=limits.get("tpm", 0))
+
+
+def get_rate_limiter():
+    name = settings.rate_limiter
+    if not name:
+        name = "memory" if settings.task_mode == "inline" else "db"
+    return import_module(f"app.llm.rate_limit.{name}")
+
+
+def estimate_tokens(prompt: str) -> int:
+    # ~4 characters per token, plus the answer
+    return len(prompt) // 4 + settings.rate_limit_completion_tokens_estimate
+
+
+def _next_wait(limiter, key: str, limit: RateLimit, tokens: int, deadline: float) -> float:
+    wait = limiter.take(key, limit, tokens)
+    if wait and time.monotonic() + wait > deadline:
+        raise RateLimitTimeoutError(f"Rate limit budget for {key} is exhausted")
+    if wait:
+        logger.info(f"Rate limit for {key} reached, waiting {wait:.1f}s...")
+    return wait
+
+
+def acquire(provider: str, model: str, tokens: int):
+    """Blocks until the provider/model budget allows one more call of `tokens`."""
+    limit = get_rate_limit(provider, model)
+    if limit is None:
+        return
+    limiter = get_rate_limiter()
+    key = f"{provider}/{model}"
+    deadline = time.monotonic() + settings.rate_limit_max_wait_seconds
+    while wait := _next_wait(limiter, key, limit, tokens, deadline):
+        time.sleep(wait)
+
+
+async def acquire_async(provider: str, model: str, tokens: int):
+    """acquire() for the event loop, the limiter backend call runs in a thread."""
+    limit = get_rate_limit(provider, model)
+    if limit is None:
+        return
+    limiter = get_rate_limiter()
+    key = f"{provider}/{model}"
+    deadline = time.monotonic() + settings.rate_limit_max_wait_seconds
+    while wait := await asyncio.to_thread(_next_wait, limiter, key, limit, tokens, deadline):
+        await asyncio.sleep(wait)
+
+
+def record_usage(provider: str, model: str, estimated_tokens: int, used_tokens: int | None):
+    limit = get_rate_limit(provider, model)
+    if limit is None or not limit.tpm or used_tokens is None:
+        return
+    if used_tokens != estimated_tokens:
+        get_rate_limiter().debit(f"{provider}/{model}", limit, used_tokens - estimated_tokens)
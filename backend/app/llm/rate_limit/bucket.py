@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class RateLimit:
+    # 0 means unlimited
+    rpm: int = 0
+    tpm: int = 0
+
+
+@dataclass
+class BucketState:
+    requests: float
+    tokens: float
+    # unix timestamp of the last refill
+    updated_at: float
+
+
+def new_bucket(limit: RateLimit, now: float) -> BucketState:
+    return BucketState(requests=limit.rpm, tokens=limit.tpm, updated_at=now)
+
+
+def _refill(state: BucketState, limit: RateLimit, now: float):
+    elapsed = max(now - state.updated_at, 0.0)
+    if limit.rpm:
+        state.requests = min(limit.rpm, state.requests + elapsed * limit.rpm / 60)
+    if limit.tpm:
+        state.tokens = min(limit.tpm, state.tokens + elapsed * limit.tpm / 60)
+    state.updated_at = max(now, state.updated_at)
+
+
+def take(state: BucketState, limit: RateLimit, tokens: int, now: float) -> float:
+    """Takes one request and `tokens` from the bucket.
+
+    Returns 0 if taken, otherwise how many seconds to wait before trying again.
+    """
+    _refill(state, limit, now)
+    wait = 0.0
+    if limit.rpm and state.requests < 1:
+        wait = max(wait, (1 - state.requests) * 60 / limit.rpm)
+    if limit.tpm:
+        # a call bigger than the whole budget waits for a full bucket
+        needed = min(tokens, limit.tpm)
+        if state.tokens < needed:
+            wait = max(wait, (needed - state.tokens) * 60 / limit.tpm)
+    if wait:
+        return wait
+    state.requests -= 1
+    state.tokens -= tokens
+    return 0.0
+
+
+def debit(state: BucketState, limit: RateLimit, tokens: int, now: float):
+    # Corrects the estimate once the real usage is known, can go negative
+    _refill(state, limit, now)
+    state.tokens -= tokens
@@ -0,0 +1,48 @@
+import time
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, select
+
+from app.db import get_celery_db
+from app.models.rate_limit import RateLimitBucket
+
+from .bucket import BucketState, RateLimit
+from .bucket import debit as bucket_debit
+from .bucket import take as bucket_take
+
+
+def _get_bucket(db: Session, key: str, limit: RateLimit, now: float) -> RateLimitBucket:
+    # Row lock serializes concurrent workers on the same provider/model
+    statement = select(RateLimitBucket).where(RateLimitBucket.key == key).with_for_update()
+    bucket = db.exec(statement).first()
+    if bucket is not None:
+        return bucket
+    db.connection().execute(
+        postgresql.insert(RateLimitBucket)
+        .values(key=key, requests=limit.rpm, tokens=limit.tpm, updated_at=now)
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+    return db.exec(statement).one()
+
+
+def _update(key: str, limit: RateLimit, tokens: int, operation) -> float:
+    now = time.time()
+    with get_celery_db() as db:
+        bucket = _get_bucket(db, key, limit, now)
+        state = BucketState(
+            requests=bucket.requests, tokens=bucket.tokens, updated_at=bucket.updated_at
+        )
+        wait = operation(state, limit, tokens, now)
+        bucket.requests = state.requests
+        bucket.tokens = state.tokens
+        bucket.updated_at = state.updated_at
+        db.add(bucket)
+    return wait or 0.0
+
+
+def take(key: str, limit: RateLimit, tokens: int) -> float:
+    return _update(key, limit, tokens, bucket_take)
+
+
+def debit(key: str, limit: RateLimit, tokens: int):
+    _update(key, limit, tokens, bucket_debit)
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from .bucket import BucketState, RateLimit, new_bucket
+from .bucket import debit as bucket_debit
+from .bucket import take as bucket_take
+
+# In-process buckets, used for task_mode=inline where there is no shared worker pool
+_buckets: dict[str, BucketState] = {}
+_lock = threading.Lock()
+
+
+def _get_bucket(key: str, limit: RateLimit, now: float) -> BucketState:
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = new_bucket(limit, now)
+    return bucket
+
+
+def take(key: str, limit: RateLimit, tokens: int) -> float:
+    now = time.time()
+    with _lock:
+        return bucket_take(_get_bucket(key, limit, now), limit, tokens, now)
+
+
+def debit(key: str, limit: RateLimit, tokens: int):
+    now = time.time()
+    with _lock:
+        bucket_debit(_get_bucket(key, limit, now), limit, tokens, now)
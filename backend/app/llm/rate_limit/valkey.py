@@ -0,0 +1,62 @@
+from functools import cache
+
+import valkey
+
+from app.settings import settings
+
+from .bucket import RateLimit
+
+# Same algorithm as bucket.take/bucket.debit, executed atomically on the server.
+# Server time is used, so worker clock skew doesn't matter.
+_SCRIPT = """
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local tokens = tonumber(ARGV[3])
+local operation = ARGV[4]
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'updated_at')
+local requests = tonumber(state[1]) or rpm
+local available = tonumber(state[2]) or tpm
+local updated_at = tonumber(state[3]) or now
+local elapsed = math.max(now - updated_at, 0)
+if rpm > 0 then requests = math.min(rpm, requests + elapsed * rpm / 60) end
+if tpm > 0 then available = math.min(tpm, available + elapsed * tpm / 60) end
+local wait = 0
+if operation == 'take' then
+    if rpm > 0 and requests < 1 then wait = math.max(wait, (1 - requests) * 60 / rpm) end
+    if tpm > 0 then
+        local needed = math.min(tokens, tpm)
+        if available < needed then wait = math.max(wait, (needed - available) * 60 / tpm) end
+    end
+    if wait == 0 then
+        requests = requests - 1
+        available = available - tokens
+    end
+else
+    available = available - tokens
+end
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', available, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+
+@cache
+def _get_script():
+    url = settings.rate_limiter_url or str(settings.celery_backend)
+    client = valkey.Valkey.from_url(url.replace("valkey://", "redis://"))
+    return client.register_script(_SCRIPT)
+
+
+def _call(key: str, limit: RateLimit, tokens: int, operation: str) -> float:
+    res = _get_script()(keys=[f"rate_limit:{key}"], args=[limit.rpm, limit.tpm, tokens, operation])
+    return float(res)
+
+
+def take(key: str, limit: RateLimit, tokens: int) -> float:
+    return _call(key, limit, tokens, "take")
+
+
+def debit(key: str, limit: RateLimit, tokens: int):
+    _call(key, limit, tokens, "debit")
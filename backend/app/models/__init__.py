@@ -4,13 +4,23 @@ from typing import TYPE_CHECKING
 from app.settings import settings
 
 from .company_crawl import CompanyCrawl
+from .company_stats import CompanyDomainCount, CompanyStats
 from .competitor import Competitor
+from .llm_batch import LLMBatchJob, LLMBatchRequest
 from .llm_costs import LLMCost
 from .monitored_prompt import (
     MonitoredPrompt,
+    MonitoredPromptResult,
     MonitoredPromptRun,
+    MonitoredPromptRunPayload,
+    RunCitation,
 )
+from .rate_limit import RateLimitBucket
+from .reanalysis import ReanalysisCheckpoint
 from .recommendation import Recommendation, SQLModel
+from .redirect_cache import RedirectCacheEntry
+from .rollups import DailyDomainStats, DailyRunStats, RollupWatermark
+from .shared_response import SharedResponse
 
 if TYPE_CHECKING:
     from .company import Company
@@ -28,11 +38,25 @@ else:
 
 __all__ = [
     "MonitoredPrompt",
+    "MonitoredPromptResult",
     "MonitoredPromptRun",
+    "MonitoredPromptRunPayload",
     "Company",
     "Competitor",
     "CompanyCrawl",
+    "DailyDomainStats",
+    "DailyRunStats",
+    "CompanyDomainCount",
+    "CompanyStats",
+    "LLMBatchJob",
+    "LLMBatchRequest",
     "LLMCost",
+    "RateLimitBucket",
+    "ReanalysisCheckpoint",
     "Recommendation",
+    "RedirectCacheEntry",
+    "RollupWatermark",
+    "RunCitation",
+    "SharedResponse",
     "SQLModel",
 ]
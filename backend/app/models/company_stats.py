@@ -0,0 +1,48 @@
+import datetime
+
+from sqlmodel import Field, ForeignKey, SQLModel
+
+from app.models.types import default_now
+
+
+class CompanyStats(SQLModel, table=True):
+    """Dashboard counters over the latest runs of the company's active prompts.
+
+    Updated incrementally as runs and prompts change, see crud.company_stats.
+    """
+
+    __tablename__ = "company_stats"  # type: ignore
+    company_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "companies.id",
+                name="company_stats_company_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        primary_key=True,
+    )
+    total_runs: int = Field(default=0)
+    product_runs: int = Field(default=0)
+    product_brand_mentions: int = Field(default=0)
+    # Runs citing the company's domain
+    cited_runs: int = Field(default=0)
+    updated_at: datetime.datetime = Field(default_factory=default_now)
+
+
+class CompanyDomainCount(SQLModel, table=True):
+    """Latest runs citing a domain, for share of voice"""
+
+    __tablename__ = "company_domain_counts"  # type: ignore
+    company_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "companies.id",
+                name="company_domain_counts_company_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        primary_key=True,
+    )
+    domain: str = Field(primary_key=True)
+    runs: int = Field(default=0)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import datetime
 from typing import Literal
 
 from pydantic import BaseModel
@@ -16,3 +17,21 @@ class DashboardStats(BaseModel):
     website_citation_share: float
     total_runs: int
     share_of_voice: list[ShareOfVoiceItem]
+
+
+class TrendPoint(BaseModel):
+    day: datetime.date
+    total_runs: int
+    ai_visibility_score: float
+    website_citation_share: float
+
+
+class ShareOfVoiceTrendPoint(BaseModel):
+    day: datetime.date
+    domain: str
+    count: int
+
+
+class DashboardTrends(BaseModel):
+    points: list[TrendPoint]
+    share_of_voice: list[ShareOfVoiceTrendPoint]
@@ -0,0 +1,67 @@
+import datetime
+from enum import StrEnum
+
+from sqlmodel import Field, ForeignKey, SQLModel
+
+from app.models.types import default_now
+
+
+class LLMBatchJobStatus(StrEnum):
+    CREATED = "created"
+    SUBMITTED = "submitted"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class LLMBatchJob(SQLModel, table=True):
+    """Provider batch job, see app.llm.batch"""
+
+    __tablename__ = "llm_batch_jobs"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    provider: str
+    model: str
+    backend: str
+    # Batch id at the provider, set once submitted
+    external_id: str | None = Field(default=None, nullable=True)
+    status: str = Field(default=LLMBatchJobStatus.CREATED, index=True)
+    error: str | None = Field(default=None, nullable=True)
+    created_at: datetime.datetime = Field(default_factory=default_now)
+    finished_at: datetime.datetime | None = Field(default=None, nullable=True)
+
+
+class LLMBatchRequest(SQLModel, table=True):
+    """Channel of a monitoring cycle waiting for a batch job, deleted once ingested"""
+
+    __tablename__ = "llm_batch_requests"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    monitored_prompt_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "monitored_prompts.id",
+                name="llm_batch_requests_monitored_prompt_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        index=True,
+        nullable=False,
+    )
+    provider: str
+    # Cycle the run belongs to and all its providers, see analyze_prompt_channel
+    cycle_at: datetime.datetime
+    providers: str  # JSON list
+    # Lease of the claim that queued it, see MonitoredPrompt.task_lease_id
+    lease_id: int | None = Field(default=None, nullable=True)
+    # None until grouped into a job
+    job_id: int | None = Field(
+        default=None,
+        sa_column_args=(
+            ForeignKey(
+                "llm_batch_jobs.id",
+                name="llm_batch_requests_job_id_fkey",
+                ondelete="SET NULL",
+            ),
+        ),
+        index=True,
+        nullable=True,
+    )
+    created_at: datetime.datetime = Field(default_factory=default_now)
@@ -1,6 +1,7 @@
 import datetime
 from enum import StrEnum
 
+from sqlalchemy import ForeignKeyConstraint, Index, LargeBinary, UniqueConstraint, text
 from sqlmodel import Field, ForeignKey, SQLModel
 
 from app.models.types import default_now
@@ -13,6 +14,23 @@ class MonitoredPromptType(StrEnum):
 
 class MonitoredPrompt(SQLModel, table=True):
     __tablename__ = "monitored_prompts"  # type: ignore
+    __table_args__ = (
+        # Scheduler hot path: due prompts ordered by next_run_at, see crud.prompts.
+        # Predicates must match _due_prompt_conditions as rendered by each dialect.
+        Index(
+            "ix_monitored_prompts_due",
+            "next_run_at",
+            postgresql_where=text("task_scheduled_at IS NULL AND is_active IS true"),
+            sqlite_where=text("task_scheduled_at IS NULL AND is_active IS 1"),
+        ),
+        # Expired lease reclaim only looks at prompts with a task in flight
+        Index(
+            "ix_monitored_prompts_task_scheduled_at",
+            "task_scheduled_at",
+            postgresql_where=text("task_scheduled_at IS NOT NULL"),
+            sqlite_where=text("task_scheduled_at IS NOT NULL"),
+        ),
+    )
     id: int | None = Field(default=None, primary_key=True)
     company_id: int = Field(
         sa_column_args=(
@@ -39,11 +57,24 @@ class MonitoredPrompt(SQLModel, table=True):
     # When was the celery task created.
     # Used to prevent scheduling multiple tasks for the same prompt
     task_scheduled_at: datetime.datetime | None = Field(default=None, nullable=True)
+    # Incremented by every claim, its tasks carry it as a fencing token: tasks of a
+    # reclaimed lease find another one and drop out, see crud.prompts.holds_prompt_lease
+    task_lease_id: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     created_at: datetime.datetime = Field(default_factory=default_now)
 
 
 class MonitoredPromptRun(SQLModel, table=True):
+    """On Postgres, partitioned by month of run_at with (id, run_at) as primary key,
+    see crud.run_partitions. Filter on run_at where possible to skip partitions."""
+
     __tablename__ = "monitored_prompt_runs"  # type: ignore
+    __table_args__ = (
+        # Runs of a prompt in a time range: cycles, daily rollups
+        Index("ix_monitored_prompt_runs_prompt_id_run_at", "monitored_prompt_id", "run_at"),
+        # Referenced by payloads and citations. The primary key on Postgres, where
+        # migrations don't create it, see RUN_KEY in alembic/env.py.
+        UniqueConstraint("id", "run_at", name="monitored_prompt_runs_id_run_at_key"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     monitored_prompt_id: int = Field(
         sa_column_args=(
@@ -59,7 +90,9 @@ class MonitoredPromptRun(SQLModel, table=True):
     llm_provider: str = Field(nullable=False)
     llm_model: str = Field(nullable=False)
     run_at: datetime.datetime = Field(default_factory=default_now)
-    raw_response: str = Field(nullable=False)  # to be able to reprocess if we need more info
+    # To be able to reprocess if we need more info. Saved compressed to
+    # monitored_prompt_run_payloads, only runs from before that have it inline.
+    raw_response: str | None = Field(default=None, nullable=True)
     top_domain: str | None = Field(nullable=True)
     brand_mentioned: bool = Field(nullable=False)
     # If the company's domain is cited in the response,
@@ -68,3 +101,96 @@ class MonitoredPromptRun(SQLModel, table=True):
     mentioned_pages: str | None = Field(
         default=None, nullable=True
     )  # serialized json array of strings (urls)
+
+
+class MonitoredPromptResult(SQLModel, table=True):
+    """Latest run of a prompt per provider, with run counters.
+
+    Kept up to date by save_monitored_prompt_run, so the prompt listings don't
+    aggregate the run history.
+    """
+
+    __tablename__ = "monitored_prompt_results"  # type: ignore
+    monitored_prompt_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "monitored_prompts.id",
+                name="monitored_prompt_results_monitored_prompt_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        primary_key=True,
+    )
+    llm_provider: str = Field(primary_key=True)
+    run_id: int = Field(nullable=False)
+    run_at: datetime.datetime = Field(nullable=False)
+    brand_mentioned: bool = Field(nullable=False)
+    company_domain_rank: int | None = Field(default=None, nullable=True)
+    # All runs of the prompt and provider
+    run_count: int = Field(default=0, nullable=False)
+    brand_mentioned_count: int = Field(default=0, nullable=False)
+    # Of the counters, the archived runs', see scheduled.archive_runs
+    archived_run_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    archived_brand_mentioned_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+
+class MonitoredPromptRunItem(SQLModel):
+    """Run without its raw response, for listings"""
+
+    id: int
+    monitored_prompt_id: int
+    llm_provider: str
+    llm_model: str
+    run_at: datetime.datetime
+    top_domain: str | None
+    brand_mentioned: bool
+    company_domain_rank: int | None
+    mentioned_pages: str | None
+
+
+class MonitoredPromptRunPayload(SQLModel, table=True):
+    """Compressed raw_response of a run, kept out of the runs table"""
+
+    __tablename__ = "monitored_prompt_run_payloads"  # type: ignore
+    __table_args__ = (
+        # The key of the runs table on Postgres, see MonitoredPromptRun
+        ForeignKeyConstraint(
+            ["run_id", "run_at"],
+            ["monitored_prompt_runs.id", "monitored_prompt_runs.run_at"],
+            name="monitored_prompt_run_payloads_run_id_fkey",
+            ondelete="CASCADE",
+            onupdate="CASCADE",
+        ),
+    )
+    run_id: int = Field(primary_key=True)
+    run_at: datetime.datetime = Field(nullable=False)
+    encoding: str = Field(default="gzip")
+    data: bytes = Field(sa_type=LargeBinary)
+
+
+class RunCitation(SQLModel, table=True):
+    """A page cited by a run, one row per entry of its mentioned_pages"""
+
+    __tablename__ = "run_citations"  # type: ignore
+    __table_args__ = (
+        # Share of voice and domain drill-downs, see crud.dashboard
+        Index("ix_run_citations_company_id_domain", "company_id", "domain"),
+        # The key of the runs table on Postgres, see MonitoredPromptRun
+        ForeignKeyConstraint(
+            ["run_id", "run_at"],
+            ["monitored_prompt_runs.id", "monitored_prompt_runs.run_at"],
+            name="run_citations_run_id_fkey",
+            ondelete="CASCADE",
+            onupdate="CASCADE",
+        ),
+    )
+    run_id: int = Field(primary_key=True)
+    # 1-based, like company_domain_rank
+    position: int = Field(primary_key=True)
+    url: str = Field(nullable=False)
+    domain: str = Field(nullable=False)  # see normalize_domain
+    # Denormalized from the run and its prompt
+    run_at: datetime.datetime = Field(nullable=False)
+    monitored_prompt_id: int = Field(nullable=False)
+    company_id: int = Field(nullable=False)
+    llm_provider: str = Field(nullable=False)
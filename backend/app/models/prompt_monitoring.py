@@ -12,3 +12,15 @@ class PromptMonitoringItem(BaseModel):
     openai_last_result: bool | None
     gemini_last_result: bool | None
     visibility: float
+
+
+class PromptMonitoringTriggerStats(BaseModel):
+    due: int
+    dispatched: int
+    remaining: int
+    reclaimed: int = 0
+    # Inline task mode only, see task_dispatcher.dispatch_tasks
+    succeeded: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    cancelled: int = 0
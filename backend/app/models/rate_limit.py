@@ -0,0 +1,11 @@
+from sqlmodel import Field, SQLModel
+
+
+class RateLimitBucket(SQLModel, table=True):
+    __tablename__ = "rate_limit_buckets"  # type: ignore
+    # "{provider}/{model}"
+    key: str = Field(primary_key=True)
+    requests: float
+    tokens: float
+    # unix timestamp of the last refill
+    updated_at: float
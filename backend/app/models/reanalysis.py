@@ -0,0 +1,17 @@
+import datetime
+
+from sqlmodel import Field, SQLModel
+
+from app.models.types import default_now
+
+
+class ReanalysisCheckpoint(SQLModel, table=True):
+    __tablename__ = "reanalysis_checkpoints"  # type: ignore
+    # Job name, e.g. "company-1" or "all"
+    name: str = Field(primary_key=True)
+    # Runs are processed in id order, everything up to this one is done
+    last_run_id: int = Field(default=0)
+    processed: int = Field(default=0)
+    changed: int = Field(default=0)
+    finished_at: datetime.datetime | None = Field(default=None, nullable=True)
+    updated_at: datetime.datetime = Field(default_factory=default_now)
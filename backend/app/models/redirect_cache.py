@@ -0,0 +1,13 @@
+import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class RedirectCacheEntry(SQLModel, table=True):
+    __tablename__ = "redirect_cache"  # type: ignore
+    # sha256 of uri, redirect URIs can be too long for an index key
+    uri_hash: str = Field(primary_key=True)
+    uri: str
+    # None if the redirect couldn't be resolved (negative entry)
+    resolved_uri: str | None = Field(default=None, nullable=True)
+    expires_at: datetime.datetime = Field(index=True)
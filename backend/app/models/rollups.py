@@ -0,0 +1,58 @@
+import datetime
+
+from sqlmodel import Field, ForeignKey, SQLModel
+
+from app.models.types import default_now
+
+
+class DailyRunStats(SQLModel, table=True):
+    """Runs of a company per UTC day, provider and prompt type, for trends"""
+
+    __tablename__ = "daily_run_stats"  # type: ignore
+    company_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "companies.id",
+                name="daily_run_stats_company_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        primary_key=True,
+    )
+    day: datetime.date = Field(primary_key=True)
+    llm_provider: str = Field(primary_key=True)
+    prompt_type: str = Field(primary_key=True)
+    runs: int = Field(default=0)
+    brand_mentions: int = Field(default=0)
+    # Runs citing the company's domain
+    cited_runs: int = Field(default=0)
+
+
+class DailyDomainStats(SQLModel, table=True):
+    """Runs of a company citing a domain per UTC day and provider"""
+
+    __tablename__ = "daily_domain_stats"  # type: ignore
+    company_id: int = Field(
+        sa_column_args=(
+            ForeignKey(
+                "companies.id",
+                name="daily_domain_stats_company_id_fkey",
+                ondelete="CASCADE",
+            ),
+        ),
+        primary_key=True,
+    )
+    day: datetime.date = Field(primary_key=True)
+    llm_provider: str = Field(primary_key=True)
+    domain: str = Field(primary_key=True)
+    runs: int = Field(default=0)
+
+
+class RollupWatermark(SQLModel, table=True):
+    __tablename__ = "rollup_watermarks"  # type: ignore
+    name: str = Field(primary_key=True)
+    # Runs are rolled up in id order, everything up to this one is done
+    last_run_id: int = Field(default=0)
+    # Days before this one had runs archived, their rollups are kept as they are
+    archived_before: datetime.date | None = None
+    updated_at: datetime.datetime = Field(default_factory=default_now)
@@ -0,0 +1,21 @@
+import datetime
+
+from sqlmodel import Field, SQLModel
+
+from app.models.types import default_now
+
+
+class SharedResponse(SQLModel, table=True):
+    """LLM response shared by all companies monitoring the same prompt"""
+
+    __tablename__ = "shared_responses"  # type: ignore
+    # sha256 of provider, model, country and normalized prompt, see prompt_analyzers.shared
+    key: str = Field(primary_key=True)
+    provider: str
+    model: str
+    target_country: str | None = Field(default=None, nullable=True)
+    prompt: str
+    # Provider response as passed to build_prompt_run, JSON
+    response: str
+    fetched_at: datetime.datetime = Field(default_factory=default_now)
+    expires_at: datetime.datetime = Field(index=True)
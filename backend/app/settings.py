@@ -16,6 +16,23 @@ class Settings(BaseSettings):
     monitoring_channel_openai: str = "api"
     api_monitoring_model_gemini: str = "gemini-2.5-flash"
     api_monitoring_model_openai: str = "gpt-4o-search-preview"
+    # Request (rpm) and token (tpm) budgets per minute for prompt analyzers, by
+    # "provider/model" or "provider", e.g. {"openai": {"rpm": 500, "tpm": 200000}}.
+    # Workers wait for the budget instead of failing on provider rate limits.
+    rate_limits: dict[str, dict[str, int]] = Field(default_factory=dict)
+    rate_limiter: str = ""  # db|valkey|memory, defaults to memory for inline task mode
+    rate_limiter_url: str = ""  # valkey url, defaults to celery backend
+    rate_limit_max_wait_seconds: int = 300
+    rate_limit_completion_tokens_estimate: int = 2000
+
+    # Simulated provider for load tests, see app.llm.fake
+    fake_llm_seed: int | None = None
+    fake_llm_latency_median_seconds: float = 2
+    fake_llm_latency_sigma: float = 0.5
+    fake_llm_error_rate: float = 0
+    fake_llm_rate_limit_rate: float = 0
+    fake_llm_rpm: int = 0
+    fake_llm_mention_rate: float = 0.3
 
     # Connections
     db_dsn: AnyUrl = "sqlite:///.data/main.db?timeout=20"  # type: ignore
@@ -52,6 +69,61 @@ class Settings(BaseSettings):
     litellm_completion_timeout: int = 600
     litellm_max_retries: int = 3
 
+    # Resolving citation redirects of Gemini grounding chunks, concurrently. Per
+    # analysis, a process has a pool of inline_max_workers times as many threads.
+    redirect_resolve_max_workers: int = 10
+    redirect_resolve_timeout_seconds: float = 10
+    # Overall for an analysis's redirects, not the analysis. Unresolved URIs are kept as is.
+    redirect_resolve_deadline_seconds: float = 20
+    # Resolved redirects are cached in the redirect_cache table, with an in-process LRU
+    # in front. Failed resolutions are cached too, for a shorter time.
+    redirect_cache: bool = True
+    redirect_cache_ttl_seconds: int = 30 * 24 * 3600
+    redirect_cache_negative_ttl_seconds: int = 3600
+    redirect_cache_memory_size: int = 10_000
+    schedule_purge_redirect_cache: str = "45 3 * * *"
+
+    # LLM responses don't depend on the company, prompts with the same normalized text,
+    # provider, model and target country share one response within the TTL
+    shared_responses: bool = True
+    shared_response_ttl_seconds: int = 24 * 3600
+    schedule_purge_shared_responses: str = "50 3 * * *"
+
+    # Dashboard stats are updated as runs are saved, the rebuild recovers from drift
+    schedule_rebuild_company_stats: str = "15 4 * * *"
+    # Daily trend rollups, see scheduled.rollup_daily_stats
+    schedule_rollup_daily_stats: str = "*/15 * * * *"
+
+    # Runs older than this move to gzipped JSON lines files in run_archive_dir, see
+    # app.archive. The latest run of each prompt and provider stays. None keeps all runs.
+    run_archive_after_days: int | None = None
+    run_archive_dir: str = "/data/run_archive"
+    schedule_archive_runs: str = "0 5 * * *"
+
+    # Postgres: monthly partitions of monitored_prompt_runs are created this many months
+    # ahead, and dropped once archiving emptied them, see scheduled.maintain_run_partitions
+    run_partition_months_ahead: int = 3
+    schedule_maintain_run_partitions: str = "0 6 * * *"
+
+    # Batch mode: recurring runs of prompts refreshed at most every
+    # llm_batch_min_refresh_interval_seconds go through provider batch APIs, cheaper
+    # but answered within 24h. openai|file, file is a local stand-in, see app.llm.batch
+    llm_batch_mode: bool = False
+    llm_batch_backend: str = "openai"
+    llm_batch_min_refresh_interval_seconds: int = 7 * 24 * 3600
+    llm_batch_max_requests: int = 10_000
+    llm_batch_file_dir: str = "/tmp/llm_batches"
+    # Jobs still unsubmitted after this (worker crashed while submitting) give their
+    # requests back to the next job. Under prompt_task_lease_seconds, leases only
+    # get renewed for submitted jobs.
+    llm_batch_submit_timeout_seconds: int = 3600
+    schedule_submit_llm_batches: str = "*/10 * * * *"
+    schedule_poll_llm_batches: str = "*/5 * * * *"
+
+    # Re-analysis of stored runs, see app.worker.analyzers.reanalyze_runs
+    reanalysis_batch_size: int = 1000
+    reanalysis_processes: int = 4
+
     # Used to fetch webpages
     fetcher: str = "direct"
     fetcher_settings: dict[str, Any] = Field(default_factory=dict)
@@ -59,10 +131,35 @@ class Settings(BaseSettings):
     # Celery
     celery_result_expires: int = 86400
     celery_max_retries: int = 5
-    task_mode: str = "celery"  # celery|inline
+    # celery|inline|async. With async, prompt monitoring is run by the
+    # app.worker.async_engine process instead of the trigger, other tasks use celery.
+    task_mode: str = "celery"
+    # Inline mode runs batches (e.g. the cron trigger) on a thread pool.
+    # A task past the timeout is abandoned, its prompt lease expires later.
+    inline_max_workers: int = 8
+    inline_task_timeout_seconds: int = 120
+    # Prompts analyzed concurrently by one async engine process
+    async_engine_max_in_flight: int = 200
+    async_engine_poll_seconds: float = 5
+    # Finished prompts are written in batches, at least every flush interval
+    async_engine_write_batch_size: int = 50
+    async_engine_flush_seconds: float = 2
     cron_secret: str = ""
 
     schedule_trigger_prompt_monitoring: str = "* * * * *"
+    # Prompts claimed per page. With drain enabled, the trigger keeps claiming pages
+    # until nothing is due or the time budget (keep it below the schedule period) runs out.
+    # In inline task mode the budget also bounds the analyses, keep it below the cron timeout.
+    trigger_prompt_monitoring_batch_size: int = 500
+    trigger_prompt_monitoring_drain: bool = True
+    trigger_prompt_monitoring_max_seconds: float = 50
+    # task_scheduled_at acts as a lease. If the task is lost (broker flush, worker OOM,
+    # early return) the prompt is reclaimed after this many seconds. Keep it above
+    # the longest analysis including celery retries.
+    prompt_task_lease_seconds: int = 3 * 3600
+    # Spread next_run_at of prompts over their refresh interval to avoid bursts
+    prompt_schedule_leveling: bool = True
+    schedule_rebalance_prompt_schedule: str = "30 3 * * *"
 
     license_type: str = "ce"
 
@@ -1,3 +1,4 @@
+import threading
 from contextlib import contextmanager
 
 import pytest
@@ -36,6 +37,37 @@ def db_session(db_engine):
         session.close()
 
 
+@pytest.fixture()
+def celery_db(db_session, db_engine, monkeypatch):
+    """Patches the get_celery_db of the modules, returns it.
+
+    It yields db_session and flushes, with commit=True a session of its own that
+    commits, for code reading in separate sessions or threads.
+    """
+    # The test engine has one connection
+    lock = threading.Lock()
+
+    @contextmanager
+    def get_db():
+        yield db_session
+        db_session.flush()
+
+    @contextmanager
+    def get_committed_db():
+        with lock, Session(db_engine) as session:
+            session.info["skip_tenant"] = True
+            yield session
+            session.commit()
+
+    def patch(*modules, commit: bool = False):
+        get_celery_db = get_committed_db if commit else get_db
+        for module in modules:
+            monkeypatch.setattr(module, "get_celery_db", get_celery_db)
+        return get_celery_db
+
+    return patch
+
+
 def create_company(
     db_session,
     name="c",
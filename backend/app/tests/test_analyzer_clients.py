@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+from app.llm.prompt_analyzers import clients
+from app.settings import settings
+
+
+def test_openai_client_is_cached(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openai_api_key", "k1")
+    client = clients.get_openai_client()
+    assert clients.get_openai_client() is client
+    monkeypatch.setattr(settings, "openai_api_key", "k2")
+    assert clients.get_openai_client() is not client
+
+
+def test_clients_reset_after_fork(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openai_api_key", "k1")
+    client = clients.get_openai_client()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if clients.get_openai_client() is not client else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert clients.get_openai_client() is client
+
+
+def test_gemini_client_rebuilt_on_new_credentials(mocker, monkeypatch, tmp_path) -> None:
+    credentials_path = tmp_path / "credentials.json"
+    credentials_path.write_text("{}")
+    monkeypatch.setattr(settings, "vertex_credentials_path", str(credentials_path))
+    create = mocker.patch.object(clients, "_create_gemini_client", side_effect=lambda *_: object())
+
+    client = clients.get_gemini_client()
+    assert clients.get_gemini_client() is client
+    os.utime(credentials_path, ns=(0, 0))
+    assert clients.get_gemini_client() is not client
+    assert create.call_count == 2
+
+
+def test_async_clients_cached_per_loop(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "openai_api_key", "k1")
+
+    async def get_clients():
+        return clients.get_async_openai_client(), clients.get_async_openai_client()
+
+    first, same = asyncio.run(get_clients())
+    assert first is same
+    # a new loop, even one reusing the id of the closed one, gets its own client
+    second, _ = asyncio.run(get_clients())
+    assert second is not first
@@ -0,0 +1,103 @@
+import gzip
+import json
+from datetime import timedelta
+from importlib import import_module
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.archive import iter_archived_runs, list_archive_files
+from app.crud.prompts import (
+    rebuild_prompt_results,
+    save_monitored_prompt,
+    save_monitored_prompt_run,
+)
+from app.crud.rollups import get_daily_stats
+from app.models import MonitoredPrompt, MonitoredPromptResult, MonitoredPromptRun, RunCitation
+from app.models.types import default_now
+from app.settings import settings
+
+# the packages re-export the tasks under the modules' names
+archive_module = import_module("app.worker.scheduled.archive_runs")
+reanalyze_module = import_module("app.worker.analyzers.reanalyze_runs")
+rollup_module = import_module("app.worker.scheduled.rollup_daily_stats")
+
+
+def test_archive_runs(monkeypatch, tmp_path, celery_db, db_session, app_company, api_app) -> None:
+    monkeypatch.setattr(settings, "run_archive_dir", str(tmp_path))
+    celery_db(archive_module, reanalyze_module, rollup_module, commit=True)
+
+    prompt = save_monitored_prompt(
+        db_session,
+        MonitoredPrompt(company_id=app_company.id, prompt="p", prompt_type="product"),
+    )
+    now = default_now()
+    run_ids = []
+    for days, provider in [(430, "openai"), (390, "openai"), (380, "gemini"), (10, "openai")]:
+        run = save_monitored_prompt_run(
+            db_session,
+            MonitoredPromptRun(
+                monitored_prompt_id=prompt.id,
+                llm_provider=provider,
+                llm_model="m",
+                raw_response=json.dumps(
+                    {"message": {"content": f"{app_company.name} {days}", "annotations": []}}
+                ),
+                brand_mentioned=False,
+                mentioned_pages='["https://other.com/a"]',
+                run_at=now - timedelta(days=days),
+            ),
+        )
+        run_ids.append(run.id)
+    db_session.commit()
+
+    assert archive_module.archive_runs(days=365) == 2
+    assert archive_module.archive_runs(days=365) == 0
+    db_session.expire_all()
+    # the latest run of each provider is kept
+    kept = db_session.exec(select(MonitoredPromptRun.id).order_by(MonitoredPromptRun.id)).all()
+    assert kept == run_ids[2:]
+    citing = db_session.exec(select(RunCitation.run_id).order_by(RunCitation.run_id)).all()
+    assert citing == run_ids[2:]
+
+    # rollups of the archived days are kept, not recomputed without their runs
+    since = (now - timedelta(days=430)).date()
+    assert [stats.runs for stats in get_daily_stats(db_session, app_company.id, since)] == [1] * 4
+    assert rollup_module.rollup_since(since, app_company.id) == 365
+    db_session.expire_all()
+    assert [stats.runs for stats in get_daily_stats(db_session, app_company.id, since)] == [1] * 4
+
+    # rebuilt results still count the archived runs
+    rebuild_prompt_results(db_session, [prompt.id])
+    results = {
+        result.llm_provider: result
+        for result in db_session.exec(
+            select(MonitoredPromptResult).where(
+                MonitoredPromptResult.monitored_prompt_id == prompt.id
+            )
+        ).all()
+    }
+    assert results["openai"].run_count == 3
+    assert results["openai"].archived_run_count == 2
+    assert results["openai"].run_id == run_ids[3]
+    assert results["gemini"].run_count == 1
+    assert results["gemini"].archived_run_count == 0
+
+    # one file per month
+    assert len(list_archive_files(app_company.id)) == 2
+    archived = list(iter_archived_runs(app_company.id))
+    assert [record["id"] for record in archived] == run_ids[:2]
+    assert archived[0]["company_id"] == app_company.id
+    assert f"{app_company.name} 430" in archived[0]["raw_response"]
+
+    client = TestClient(api_app)
+    response = client.get(f"/api/v1/prompts/{app_company.id}/runs/export")
+    assert response.status_code == 200
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert sorted(json.loads(line)["id"] for line in lines) == run_ids
+    assert client.get("/api/v1/prompts/999/runs/export").status_code == 404
+
+    processed, changed = reanalyze_module.run_archive_reanalysis(processes=0)
+    assert (processed, changed) == (2, 2)
+    assert all(record["brand_mentioned"] for record in iter_archived_runs(app_company.id))
+    assert reanalyze_module.run_archive_reanalysis(processes=0) == (2, 0)
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.models import LLMBatchRequest, MonitoredPrompt, MonitoredPromptRun
+from app.models.types import default_now
+from app.settings import settings
+from app.worker import async_engine
+
+
+@pytest.fixture
+def engine_db(celery_db):
+    # _claim and _write run in threads
+    return celery_db(async_engine, commit=True)
+
+
+def test_async_engine(engine_db, db_session, app_company, mocker, monkeypatch) -> None:
+    for _ in range(4):
+        db_session.add(
+            MonitoredPrompt(
+                company_id=app_company.id,
+                prompt="p",
+                prompt_type="product",
+                is_active=True,
+                next_run_at=default_now() - timedelta(minutes=1),
+            )
+        )
+    db_session.commit()
+    monkeypatch.setattr(settings, "async_engine_poll_seconds", 0.05)
+    monkeypatch.setattr(settings, "async_engine_flush_seconds", 0.05)
+    monkeypatch.setattr(settings, "monitoring_channel_gemini", "api")
+    monkeypatch.setattr(settings, "monitoring_channel_openai", "api")
+    in_flight = 0
+    max_in_flight = 0
+
+    async def analyze(prompt, company, *, provider, analyzer_type):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.1)
+        in_flight -= 1
+        return MonitoredPromptRun(
+            monitored_prompt_id=prompt.id,
+            llm_provider=provider,
+            llm_model="m",
+            raw_response="{}",
+            brand_mentioned=False,
+        )
+
+    mocker.patch.object(async_engine, "analyze_prompt_async", side_effect=analyze)
+
+    async def run():
+        engine = async_engine.AsyncEngine()
+        asyncio.get_running_loop().call_later(0.3, engine.stop)
+        await engine.run()
+
+    asyncio.run(run())
+
+    # all prompts and channels ran concurrently
+    assert max_in_flight == 8
+    with engine_db() as db:
+        prompts = db.exec(select(MonitoredPrompt)).all()
+        assert all(p.task_scheduled_at is None and p.last_run_at for p in prompts)
+        assert all(
+            p.next_run_at.replace(tzinfo=None) > default_now().replace(tzinfo=None) for p in prompts
+        )
+        assert len(db.exec(select(MonitoredPromptRun)).all()) == 8
+
+
+def _run_engine(seconds: float):
+    async def run():
+        engine = async_engine.AsyncEngine()
+        asyncio.get_running_loop().call_later(seconds, engine.stop)
+        await engine.run()
+
+    asyncio.run(run())
+
+
+def test_async_engine_skips_and_batches(
+    engine_db, db_session, app_company, mocker, monkeypatch, tmp_path
+) -> None:
+    batched = MonitoredPrompt(
+        company_id=app_company.id,
+        prompt="p",
+        prompt_type="product",
+        is_active=True,
+        refresh_interval_seconds=7 * 24 * 3600,
+        last_run_at=default_now() - timedelta(days=7),
+        next_run_at=default_now() - timedelta(minutes=1),
+    )
+    db_session.add(batched)
+    db_session.commit()
+    monkeypatch.setattr(settings, "async_engine_poll_seconds", 0.05)
+    monkeypatch.setattr(settings, "async_engine_flush_seconds", 0.05)
+    monkeypatch.setattr(settings, "monitoring_channel_gemini", "api")
+    monkeypatch.setattr(settings, "monitoring_channel_openai", "api")
+    monkeypatch.setattr(settings, "llm_batch_mode", True)
+    monkeypatch.setattr(settings, "llm_batch_backend", "file")
+    monkeypatch.setattr(settings, "llm_batch_file_dir", str(tmp_path))
+
+    async def analyze(prompt, company, *, provider, analyzer_type):
+        return MonitoredPromptRun(
+            monitored_prompt_id=prompt.id,
+            llm_provider=provider,
+            llm_model="m",
+            raw_response="{}",
+            brand_mentioned=False,
+        )
+
+    analyzer = mocker.patch.object(async_engine, "analyze_prompt_async", side_effect=analyze)
+    _run_engine(0.2)
+
+    # openai goes to a batch job, the cycle stays open until it's in
+    assert [c.kwargs["provider"] for c in analyzer.call_args_list] == ["gemini"]
+    with engine_db() as db:
+        (request,) = db.exec(select(LLMBatchRequest)).all()
+        assert request.provider == "openai"
+        assert request.lease_id == 1
+        prompt = db.get_one(MonitoredPrompt, batched.id)
+        assert prompt.task_scheduled_at is not None
+        assert prompt.next_run_at.replace(tzinfo=None) < default_now().replace(tzinfo=None)
+        prompt.task_scheduled_at = None
+        db.add(prompt)
+
+    # without quota, the cycle is skipped instead of leaving the prompt leased
+    mocker.patch.object(async_engine, "ensure_quota_available", return_value=False)
+    _run_engine(0.2)
+
+    assert analyzer.call_count == 1
+    with engine_db() as db:
+        prompt = db.get_one(MonitoredPrompt, batched.id)
+        assert prompt.task_scheduled_at is None
+        assert prompt.next_run_at.replace(tzinfo=None) > default_now().replace(tzinfo=None)
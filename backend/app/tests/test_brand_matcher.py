@@ -0,0 +1,27 @@
+import json
+
+from app.llm.prompt_analyzers.brand_matcher import BrandMatch, BrandMatcher, get_brand_matcher
+
+
+def test_brand_matcher() -> None:
+    matcher = BrandMatcher(["Acme Cloud", "Acme", "Zürich AG", " "])
+
+    assert matcher.find_all("Try ACME cloud or acme. Zürich ag, not acmeware, xAcme") == [
+        BrandMatch("ACME cloud", 4, 14),
+        BrandMatch("acme", 18, 22),
+        BrandMatch("Zürich ag", 24, 33),
+    ]
+    assert matcher.is_mentioned("(acme)")
+    assert not matcher.is_mentioned("Acmeware")
+    assert not BrandMatcher([]).is_mentioned("anything")
+
+
+def test_get_brand_matcher(app_company) -> None:
+    app_company.name_aliases = json.dumps(["Widgets Inc"])
+    matcher = get_brand_matcher(app_company)
+    assert get_brand_matcher(app_company) is matcher
+    assert matcher.is_mentioned(f"{app_company.name.replace(' ', '')} and widgets inc")
+
+    app_company.name_aliases = json.dumps(["Gadgets"])
+    assert get_brand_matcher(app_company) is not matcher
+    assert get_brand_matcher(app_company).is_mentioned("gadgets")
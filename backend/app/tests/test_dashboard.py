@@ -1,18 +1,34 @@
 from __future__ import annotations
 
+import json
+from datetime import timedelta
+from importlib import import_module
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, col, delete, select
 
 from app.crud.company import add_competitor
-from app.crud.dashboard import get_dashboard_stats, get_prompts_citing_domain
+from app.crud.company_stats import get_company_stats, rebuild_company_stats
+from app.crud.dashboard import (
+    _select_prompts_citing_domain,
+    get_dashboard_stats,
+    get_prompts_citing_domain,
+)
 from app.crud.prompts import (
+    backfill_run_citations,
+    delete_monitored_prompt,
     save_monitored_prompt,
     save_monitored_prompt_run,
+    set_prompts_active,
 )
-from app.models import MonitoredPrompt, MonitoredPromptRun
+from app.models import MonitoredPrompt, MonitoredPromptRun, RunCitation
 from app.models.types import default_now
 
+# the package re-exports the task under the module's name
+rollup_module = import_module("app.worker.scheduled.rollup_daily_stats")
+
 
 @pytest.fixture
 def _setup_data(db_session: Session, app_company) -> int:
@@ -126,6 +142,135 @@ def test_get_prompts_citing_domain(db_session, _setup_data) -> None:
     total, items = get_prompts_citing_domain(db_session, company_id, "rival.com", 0, 10)
     assert total == 1
     assert items[0].prompt == "p2"
+    # citations of a deleted prompt aren't counted, SQLite doesn't cascade deletes
+    delete_monitored_prompt(db_session, items[0].id)
+    assert db_session.exec(select(RunCitation).where(RunCitation.domain == "rival.com")).all()
+    assert get_prompts_citing_domain(db_session, company_id, "rival.com", 0, 10) == (0, [])
+
+
+def test_get_prompts_citing_domain_exact_match(db_session, _setup_data) -> None:
+    company_id = _setup_data
+    total, items = get_prompts_citing_domain(db_session, company_id, "val.com", 0, 10)
+    assert total == 0
+    assert items == []
+    total, items = get_prompts_citing_domain(db_session, company_id, "https://www.Rival.com", 0, 10)
+    assert total == 1
+
+
+def test_prompts_citing_domain_postgres_group_by() -> None:
+    # Postgres rejects selected expressions not in the GROUP BY or functionally
+    # dependent on it, the last results have to come from grouped key columns
+    statement = _select_prompts_citing_domain(1, "rival.com")
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    group_by = sql.split("GROUP BY", 1)[1].split("ORDER BY", 1)[0]
+    assert "CASE" not in group_by
+    assert group_by.count("llm_provider") == 2
+
+
+def test_run_citations(db_session, _setup_data) -> None:
+    company_id = _setup_data
+    run = save_monitored_prompt_run(
+        db_session,
+        MonitoredPromptRun(
+            monitored_prompt_id=db_session.exec(
+                select(MonitoredPrompt.id).where(MonitoredPrompt.prompt == "p3")
+            ).one(),
+            llm_provider="gemini",
+            llm_model="m",
+            run_at=default_now(),
+            raw_response="r",
+            mentioned_pages='["https://www.rival.com/a", "https://rival.com/b"]',
+            top_domain="rival.com",
+            brand_mentioned=False,
+            company_domain_rank=None,
+        ),
+    )
+    citations = db_session.exec(
+        select(RunCitation).where(RunCitation.run_id == run.id).order_by(col(RunCitation.position))
+    ).all()
+    assert [(c.position, c.url, c.domain) for c in citations] == [
+        (1, "https://www.rival.com/a", "rival.com"),
+        (2, "https://rival.com/b", "rival.com"),
+    ]
+    assert {(c.company_id, c.llm_provider) for c in citations} == {(company_id, "gemini")}
+    # Latest runs of p2 and p3, counted once per run
+    stats = get_dashboard_stats(db_session, company_id)
+    counts = {item.domain: item.count for item in stats.share_of_voice}
+    assert counts["rival.com"] == 2
+    assert stats.share_of_voice[0].domain == "rival.com"
+
+    # Runs saved before the table existed
+    db_session.exec(delete(RunCitation))
+    rebuild_company_stats(db_session, company_id)
+    assert get_dashboard_stats(db_session, company_id).share_of_voice == []
+    last_id = 0
+    while (next_id := backfill_run_citations(db_session, last_id, 2)) is not None:
+        last_id = next_id
+    assert last_id == run.id
+    assert len(db_session.exec(select(RunCitation)).all()) == 5
+    counts = {
+        item.domain: item.count
+        for item in get_dashboard_stats(db_session, company_id).share_of_voice
+    }
+    assert counts == {"rival.com": 2, "example.com": 1}
+
+
+def test_company_stats(db_session, _setup_data) -> None:
+    company_id = _setup_data
+
+    def get_stats():
+        company_stats, domain_counts = get_company_stats(db_session, company_id)
+        return (
+            company_stats.model_dump(exclude={"updated_at"}),
+            [(d.domain, d.runs) for d in domain_counts],
+        )
+
+    def check():
+        # Incremental updates match a rebuild
+        stats = get_stats()
+        rebuild_company_stats(db_session, company_id)
+        assert get_stats() == stats
+        return stats
+
+    stats, domains = check()
+    assert (stats["total_runs"], stats["product_brand_mentions"], stats["cited_runs"]) == (3, 2, 1)
+    assert sorted(domains) == [("example.com", 1), ("other.com", 1), ("rival.com", 1)]
+
+    prompts = {
+        p.prompt: p.id
+        for p in db_session.exec(
+            select(MonitoredPrompt).where(MonitoredPrompt.company_id == company_id)
+        ).all()
+    }
+    # A new cycle replaces the latest run of p1, both channels count
+    run_at = default_now() + timedelta(hours=1)
+    for provider, pages in (("openai", ["https://rival.com/x"]), ("gemini", [])):
+        save_monitored_prompt_run(
+            db_session,
+            MonitoredPromptRun(
+                monitored_prompt_id=prompts["p1"],
+                llm_provider=provider,
+                llm_model="m",
+                run_at=run_at,
+                raw_response="r",
+                mentioned_pages=json.dumps(pages),
+                brand_mentioned=False,
+                company_domain_rank=None,
+            ),
+        )
+    stats, domains = check()
+    assert (stats["total_runs"], stats["product_brand_mentions"], stats["cited_runs"]) == (4, 1, 0)
+    assert domains == [("rival.com", 2), ("other.com", 1)]
+
+    set_prompts_active(db_session, [prompts["p2"]], False, company_id)
+    stats, domains = check()
+    assert stats["total_runs"] == 3
+    assert domains == [("other.com", 1), ("rival.com", 1)]
+
+    delete_monitored_prompt(db_session, prompts["p1"])
+    stats, domains = check()
+    assert (stats["total_runs"], stats["product_runs"]) == (1, 1)
+    assert domains == [("other.com", 1)]
 
 
 def test_share_of_voice_endpoint(_setup_data, api_app) -> None:
@@ -136,3 +281,61 @@ def test_share_of_voice_endpoint(_setup_data, api_app) -> None:
     data = res.json()
     assert data["total"] == 1
     assert data["items"][0]["prompt"] == "p2"
+
+
+def test_dashboard_trends(db_session, _setup_data, api_app, celery_db) -> None:
+    company_id = _setup_data
+    celery_db(rollup_module)
+    prompt_id = db_session.exec(
+        select(MonitoredPrompt.id).where(MonitoredPrompt.prompt == "p1")
+    ).one()
+
+    def add_run(provider, run_at, pages):
+        save_monitored_prompt_run(
+            db_session,
+            MonitoredPromptRun(
+                monitored_prompt_id=prompt_id,
+                llm_provider=provider,
+                llm_model="m",
+                run_at=run_at,
+                raw_response="r",
+                mentioned_pages=json.dumps(pages),
+                brand_mentioned=False,
+                company_domain_rank=None,
+            ),
+        )
+
+    now = default_now()
+    add_run("gemini", now - timedelta(days=1), ["https://rival.com/a", "https://rival.com/b"])
+    assert rollup_module.rollup_new_runs() == 2
+    # Nothing new
+    assert rollup_module.rollup_new_runs() == 0
+
+    client = TestClient(api_app)
+    res = client.get(f"/api/v1/dashboard/{company_id}/trends", params={"days": 7})
+    assert res.status_code == 200
+    data = res.json()
+    yesterday, today = (now - timedelta(days=1)).date(), now.date()
+    assert [p["day"] for p in data["points"]] == [yesterday.isoformat(), today.isoformat()]
+    assert data["points"][0]["total_runs"] == 1
+    assert data["points"][0]["ai_visibility_score"] == 0.0
+    assert data["points"][1]["total_runs"] == 3
+    assert data["points"][1]["ai_visibility_score"] == pytest.approx(2 / 3)
+    assert data["points"][1]["website_citation_share"] == pytest.approx(1 / 3)
+    sov = {(p["day"], p["domain"]): p["count"] for p in data["share_of_voice"]}
+    assert sov[yesterday.isoformat(), "rival.com"] == 1
+    assert sov[today.isoformat(), "rival.com"] == 1
+
+    # Only the days of new runs are recomputed
+    add_run("openai", now, ["https://rival.com/c"])
+    assert rollup_module.rollup_new_runs() == 1
+    data = client.get(f"/api/v1/dashboard/{company_id}/trends", params={"domains": 1}).json()
+    assert data["points"][1]["total_runs"] == 4
+    assert {p["domain"] for p in data["share_of_voice"]} == {"rival.com"}
+    assert [p["count"] for p in data["share_of_voice"]] == [1, 2]
+
+    data = client.get(
+        f"/api/v1/dashboard/{company_id}/trends", params={"provider": "gemini"}
+    ).json()
+    assert [p["total_runs"] for p in data["points"]] == [1]
+    assert client.get(f"/api/v1/dashboard/{company_id}/trends?days=0").status_code == 400
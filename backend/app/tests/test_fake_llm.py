@@ -0,0 +1,71 @@
+import pytest
+
+from app.llm import fake
+from app.llm.company_crawl import SiteSummary
+from app.llm.completion import PromptType, get_completion
+from app.llm.fake import FakeLLMError, FakeRateLimitError
+from app.llm.prompt_analyzers import analyze_prompt
+from app.models import MonitoredPrompt
+from app.settings import settings
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(settings, "fake_llm_seed", 1)
+    monkeypatch.setattr(settings, "fake_llm_latency_median_seconds", 0.001)
+    monkeypatch.setattr(settings, "fake_llm_mention_rate", 0.5)
+    fake._calls.clear()
+    fake._recent_calls.clear()
+    yield
+    fake._calls.clear()
+    fake._recent_calls.clear()
+
+
+@pytest.mark.parametrize("provider", ["openai", "gemini"])
+def test_fake_analyzer(fake_llm, app_company, provider) -> None:
+    prompt = MonitoredPrompt(id=1, company_id=app_company.id, prompt="best crm")
+
+    runs = [
+        analyze_prompt(prompt, app_company, analyzer_type="fake", provider=provider)
+        for _ in range(20)
+    ]
+    fake._calls.clear()
+    again = analyze_prompt(prompt, app_company, analyzer_type="fake", provider=provider)
+
+    # seeded: same answers in the same order
+    assert again.raw_response == runs[0].raw_response
+    assert all(run.llm_provider == provider and run.llm_model == "fake" for run in runs)
+    assert {run.brand_mentioned for run in runs} == {True, False}
+    assert any(run.company_domain_rank for run in runs)
+    assert all(run.top_domain and run.mentioned_pages for run in runs)
+
+
+def test_fake_failures(fake_llm, app_company, monkeypatch) -> None:
+    prompt = MonitoredPrompt(id=1, company_id=app_company.id, prompt="best crm")
+    monkeypatch.setattr(settings, "fake_llm_error_rate", 1)
+    with pytest.raises(FakeLLMError):
+        analyze_prompt(prompt, app_company, analyzer_type="fake", provider="openai")
+
+    monkeypatch.setattr(settings, "fake_llm_rate_limit_rate", 1)
+    with pytest.raises(FakeRateLimitError) as e:
+        analyze_prompt(prompt, app_company, analyzer_type="fake", provider="openai")
+    assert e.value.status_code == 429
+
+    monkeypatch.setattr(settings, "fake_llm_error_rate", 0)
+    monkeypatch.setattr(settings, "fake_llm_rate_limit_rate", 0)
+    monkeypatch.setattr(settings, "fake_llm_rpm", 2)
+    analyze_prompt(prompt, app_company, analyzer_type="fake", provider="openai")
+    analyze_prompt(prompt, app_company, analyzer_type="fake", provider="gemini")
+    with pytest.raises(FakeRateLimitError) as e:
+        analyze_prompt(prompt, app_company, analyzer_type="fake", provider="openai")
+    assert 0 < e.value.retry_after <= 60
+
+
+def test_fake_completion(fake_llm, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "semi_smart_provider", "fake")
+
+    summary, cost = get_completion(PromptType.COMPANY_CRAWL, "summarize", SiteSummary)
+
+    assert isinstance(summary, SiteSummary)
+    assert summary.main_products
+    assert cost is None
@@ -0,0 +1,134 @@
+import json
+from datetime import timedelta
+from importlib import import_module
+
+import pytest
+from sqlmodel import select
+
+from app.crud.prompts import save_monitored_prompt
+from app.models import LLMBatchJob, LLMBatchRequest, MonitoredPrompt, MonitoredPromptRun
+from app.models.llm_batch import LLMBatchJobStatus
+from app.models.types import default_now
+from app.settings import settings
+from app.worker.task_dispatcher import TaskBatchResult
+
+# the packages re-export the tasks under the same name as their modules
+analyze_module = import_module("app.worker.analyzers.analyze_prompt")
+channel_module = import_module("app.worker.analyzers.analyze_prompt_channel")
+submit_module = import_module("app.worker.scheduled.submit_llm_batches")
+poll_module = import_module("app.worker.scheduled.poll_llm_batches")
+
+
+@pytest.fixture
+def batch_db(db_session, celery_db, monkeypatch, tmp_path):
+    celery_db(analyze_module, channel_module, submit_module, poll_module)
+    monkeypatch.setattr(settings, "llm_batch_mode", True)
+    monkeypatch.setattr(settings, "llm_batch_backend", "file")
+    monkeypatch.setattr(settings, "llm_batch_file_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "monitoring_channel_openai", "api")
+    monkeypatch.setattr(settings, "monitoring_channel_gemini", "")
+    return db_session
+
+
+def _create_recurring_prompt(db_session, company_id) -> MonitoredPrompt:
+    prompt = MonitoredPrompt(
+        company_id=company_id,
+        prompt="best crm",
+        prompt_type="product",
+        is_active=True,
+        refresh_interval_seconds=7 * 24 * 3600,
+        last_run_at=default_now() - timedelta(days=7),
+        next_run_at=default_now() - timedelta(minutes=1),
+        task_scheduled_at=default_now(),
+    )
+    return save_monitored_prompt(db_session, prompt)
+
+
+def test_llm_batch_mode(batch_db, app_company, mocker, tmp_path) -> None:
+    prompts = [_create_recurring_prompt(batch_db, app_company.id) for _ in range(2)]
+    prompt_ids = [prompt.id for prompt in prompts]
+    analyzer = mocker.patch.object(channel_module, "analyze_prompt_llm")
+    for prompt_id in prompt_ids:
+        analyze_module.analyze_prompt(prompt_id)
+    assert len(batch_db.exec(select(LLMBatchRequest)).all()) == 2
+
+    assert submit_module.submit_llm_batches() == 2
+    (input_file,) = tmp_path.glob("*.input.jsonl")
+    lines = [json.loads(line) for line in input_file.read_text().splitlines()]
+    assert [line["body"]["messages"][0]["content"] for line in lines] == ["best crm"] * 2
+
+    # still running at the provider
+    assert poll_module.poll_llm_batches() == 1
+    assert batch_db.exec(select(MonitoredPromptRun)).all() == []
+
+    message = {"content": f"{app_company.name} is the best", "annotations": []}
+    output = {
+        "custom_id": lines[0]["custom_id"],
+        "response": {"status_code": 200, "body": {"choices": [{"message": message}]}},
+    }
+    output_file = tmp_path / input_file.name.replace("input", "output")
+    output_file.write_text(json.dumps(output))
+    dispatch = mocker.patch.object(poll_module, "dispatch_tasks", return_value=TaskBatchResult())
+    poll_module.poll_llm_batches()
+
+    (run,) = batch_db.exec(select(MonitoredPromptRun)).all()
+    assert run.monitored_prompt_id == prompt_ids[0]
+    assert run.brand_mentioned is True
+    prompt = batch_db.get_one(MonitoredPrompt, prompt_ids[0], populate_existing=True)
+    assert prompt.task_scheduled_at is None
+    assert prompt.last_run_at is not None
+    assert prompt.last_run_at.replace(tzinfo=None) == run.run_at.replace(tzinfo=None)
+    # the failed request runs without batch, in the same cycle
+    ((task_name, args_list), _) = dispatch.call_args
+    assert task_name == "analyzers.analyze_prompt_channel"
+    assert [args[:3] for args in args_list] == [(prompt_ids[1], "openai", "api")]
+    assert batch_db.exec(select(LLMBatchRequest)).all() == []
+    (job,) = batch_db.exec(select(LLMBatchJob)).all()
+    assert job.status == LLMBatchJobStatus.COMPLETED
+    assert analyzer.call_count == 0
+
+
+class WorkerLost(BaseException):
+    pass
+
+
+def test_llm_batch_lost_before_submit(batch_db, app_company, mocker) -> None:
+    prompt_id = _create_recurring_prompt(batch_db, app_company.id).id
+    mocker.patch.object(channel_module, "analyze_prompt_llm")
+    analyze_module.analyze_prompt(prompt_id)
+    backend = mocker.patch.object(submit_module, "get_batch_backend")
+    backend.return_value.submit.side_effect = WorkerLost
+
+    # the worker dies between saving the job and submitting it
+    with pytest.raises(WorkerLost):
+        submit_module.submit_llm_batches()
+    mocker.stop(backend)
+    (job,) = batch_db.exec(select(LLMBatchJob)).all()
+    assert job.status == LLMBatchJobStatus.CREATED
+    job_id = job.id
+
+    # its prompt's lease isn't renewed
+    leased_at = default_now() - timedelta(hours=2)
+    batch_db.get_one(MonitoredPrompt, prompt_id).task_scheduled_at = leased_at
+    batch_db.flush()
+    poll_module.poll_llm_batches()
+    prompt = batch_db.get_one(MonitoredPrompt, prompt_id, populate_existing=True)
+    assert prompt.task_scheduled_at.replace(tzinfo=None) == leased_at.replace(tzinfo=None)
+
+    # too recent to be reset
+    assert submit_module.submit_llm_batches() == 0
+    job = batch_db.get_one(LLMBatchJob, job_id)
+    job.created_at = default_now() - timedelta(seconds=settings.llm_batch_submit_timeout_seconds)
+    batch_db.flush()
+    # its requests go to a new job
+    assert submit_module.submit_llm_batches() == 1
+    job = batch_db.get_one(LLMBatchJob, job_id, populate_existing=True)
+    assert job.status == LLMBatchJobStatus.FAILED
+    submitted = batch_db.exec(
+        select(LLMBatchJob).where(LLMBatchJob.status == LLMBatchJobStatus.SUBMITTED)
+    ).one()
+    (request,) = batch_db.exec(select(LLMBatchRequest)).all()
+    assert request.job_id == submitted.id
+    poll_module.poll_llm_batches()
+    prompt = batch_db.get_one(MonitoredPrompt, prompt_id, populate_existing=True)
+    assert prompt.task_scheduled_at.replace(tzinfo=None) > leased_at.replace(tzinfo=None)
@@ -1,13 +1,15 @@
 from datetime import timedelta
 
 from fastapi.testclient import TestClient
+from sqlmodel import delete, select
 
 from app.crud.prompts import (
+    backfill_prompt_results,
     get_company_prompt_stats,
     save_monitored_prompt,
     save_monitored_prompt_run,
 )
-from app.models import MonitoredPrompt, MonitoredPromptRun
+from app.models import MonitoredPrompt, MonitoredPromptResult, MonitoredPromptRun
 from app.models.types import default_now
 
 
@@ -99,6 +101,66 @@ def test_get_company_prompt_stats(db_session, app_company) -> None:
     assert items[2].visibility == 0.0
 
 
+def test_prompt_results(db_session, app_company) -> None:
+    now = default_now()
+    prompt = save_monitored_prompt(
+        db_session,
+        MonitoredPrompt(
+            company_id=app_company.id,
+            prompt="p",
+            prompt_type="product",
+            created_at=now,
+            next_run_at=now,
+        ),
+    )
+    assert prompt.id is not None
+    runs = []
+    # Saved out of order, the latest one by run_at is the one shown
+    for minutes, brand_mentioned in ((0, True), (-10, False), (-5, False)):
+        runs.append(
+            save_monitored_prompt_run(
+                db_session,
+                MonitoredPromptRun(
+                    monitored_prompt_id=prompt.id,
+                    llm_provider="openai",
+                    llm_model="m",
+                    run_at=now + timedelta(minutes=minutes),
+                    raw_response="r",
+                    top_domain=None,
+                    company_domain_rank=None,
+                    brand_mentioned=brand_mentioned,
+                ),
+            )
+        )
+
+    def get_result():
+        db_session.expire_all()
+        result = db_session.get(MonitoredPromptResult, (prompt.id, "openai"))
+        assert result is not None
+        return (
+            result.run_id,
+            result.brand_mentioned,
+            result.run_count,
+            result.brand_mentioned_count,
+        )
+
+    assert get_result() == (runs[0].id, True, 3, 1)
+    _, items = get_company_prompt_stats(db_session, app_company.id, 0, 10)
+    assert items[0].openai_last_result is True
+    assert items[0].visibility == 1 / 3
+
+    # Updated runs are recounted
+    runs[0].brand_mentioned = False
+    save_monitored_prompt_run(db_session, runs[0])
+    assert get_result() == (runs[0].id, False, 3, 0)
+
+    db_session.exec(delete(MonitoredPromptResult))
+    assert db_session.exec(select(MonitoredPromptResult)).all() == []
+    assert backfill_prompt_results(db_session, 0, 10) == prompt.id
+    assert backfill_prompt_results(db_session, prompt.id, 10) is None
+    assert get_result() == (runs[0].id, False, 3, 0)
+
+
 def test_prompt_monitoring_api(db_session, app_company, api_app) -> None:
     prompt = save_monitored_prompt(
         db_session,
@@ -1,15 +1,32 @@
-from datetime import timedelta
+from datetime import date, timedelta
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
 
 from app.crud.prompts import (
     get_monitored_prompt_runs,
+    get_run_raw_response,
+    move_raw_responses_to_payloads,
     save_monitored_prompt,
     save_monitored_prompt_run,
     update_monitored_prompt,
 )
-from app.models import MonitoredPrompt, MonitoredPromptRun
+from app.crud.run_partitions import (
+    add_months,
+    ensure_run_partition,
+    get_partition_name,
+    is_partitioned,
+)
+from app.models import (
+    Company,
+    MonitoredPrompt,
+    MonitoredPromptRun,
+    MonitoredPromptRunPayload,
+    RunCitation,
+)
 from app.models.types import default_now
 from app.settings import settings
 
@@ -77,6 +94,119 @@ def test_crud_update_and_runs(db_session, app_company) -> None:
 
 
 @pytest.mark.skipif(settings.license_type != "ce", reason="CE only")
+def test_run_payloads(db_session, app_company) -> None:
+    prompt = save_monitored_prompt(
+        db_session,
+        MonitoredPrompt(company_id=app_company.id, prompt="p", prompt_type="product"),
+    )
+    raw_response = '{"text": "' + "a" * 10_000 + '"}'
+    run = MonitoredPromptRun(
+        monitored_prompt_id=prompt.id,
+        llm_provider="p",
+        llm_model="m",
+        raw_response=raw_response,
+        brand_mentioned=False,
+    )
+    saved = save_monitored_prompt_run(db_session, run)
+    legacy = MonitoredPromptRun(
+        monitored_prompt_id=prompt.id,
+        llm_provider="p",
+        llm_model="m",
+        raw_response="r2",
+        brand_mentioned=False,
+    )
+    db_session.add(legacy)
+    db_session.flush()
+
+    assert saved.raw_response is None
+    payload = db_session.get_one(MonitoredPromptRunPayload, saved.id)
+    assert len(payload.data) < 200
+    assert payload.run_at == saved.run_at
+    assert get_run_raw_response(db_session, saved) == raw_response
+    assert get_run_raw_response(db_session, legacy) == "r2"
+
+    assert move_raw_responses_to_payloads(db_session, 0, 10) == legacy.id
+    assert move_raw_responses_to_payloads(db_session, 0, 10) is None
+    db_session.refresh(legacy)
+    assert legacy.raw_response is None
+    assert get_run_raw_response(db_session, legacy) == "r2"
+
+
+def test_run_foreign_keys() -> None:
+    # payloads and citations reference (id, run_at), which must be a key of the runs
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.info["skip_tenant"] = True
+        company = Company(name="c", description="", website="c.example", llm_understanding="")
+        db.add(company)
+        db.flush()
+        prompt = save_monitored_prompt(
+            db, MonitoredPrompt(company_id=company.id, prompt="p", prompt_type="product")
+        )
+        run = save_monitored_prompt_run(
+            db,
+            MonitoredPromptRun(
+                monitored_prompt_id=prompt.id,
+                llm_provider="p",
+                llm_model="m",
+                raw_response="r",
+                brand_mentioned=False,
+                mentioned_pages='["https://c.example/a"]',
+            ),
+        )
+        assert db.get(MonitoredPromptRunPayload, run.id) is not None
+        db.add(
+            RunCitation(
+                run_id=run.id,  # type: ignore
+                run_at=run.run_at + timedelta(seconds=1),
+                position=2,
+                url="https://c.example/b",
+                domain="c.example",
+                monitored_prompt_id=prompt.id,  # type: ignore
+                company_id=company.id,  # type: ignore
+                llm_provider="p",
+            )
+        )
+        with pytest.raises(IntegrityError):
+            db.flush()
+
+
+def test_run_partitions(db_session) -> None:
+    assert add_months(date(2026, 10, 18), 0) == date(2026, 10, 1)
+    assert add_months(date(2026, 11, 30), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert get_partition_name(date(2026, 3, 1)) == "monitored_prompt_runs_2026_03"
+    # Postgres only
+    assert not is_partitioned(db_session)
+
+
+def test_ensure_run_partition(monkeypatch, db_session) -> None:
+    partitions: list[tuple[date, str]] = []
+    created = []
+    monkeypatch.setattr("app.crud.run_partitions._ensured_months", set())
+    monkeypatch.setattr("app.crud.run_partitions.is_partitioned", lambda _: True)
+    monkeypatch.setattr("app.crud.run_partitions.get_run_partitions", lambda _: partitions)
+    monkeypatch.setattr(
+        "app.crud.run_partitions.create_run_partitions",
+        lambda _, since, until: created.append((since, until)),
+    )
+    run_at = default_now()
+    month = add_months(run_at.date(), 0)
+    # Missing, e.g. maintain_run_partitions stopped
+    ensure_run_partition(db_session, run_at)
+    assert created == [(month, month)]
+    partitions.append((month, get_partition_name(month)))
+    ensure_run_partition(db_session, run_at)
+    assert created == [(month, month)]
+    # Remembered once it exists
+    monkeypatch.setattr("app.crud.run_partitions.get_run_partitions", lambda _: [])
+    ensure_run_partition(db_session, run_at + timedelta(seconds=1))
+    assert created == [(month, month)]
+
+
 def test_prompts_api(db_session, app_company, api_app) -> None:
     prompt = save_monitored_prompt(
         db_session,
@@ -121,6 +251,7 @@ def test_prompts_api(db_session, app_company, api_app) -> None:
     )
     assert res.status_code == 200
     assert res.json()["total"] == 1
+    assert "raw_response" not in res.json()["items"][0]
     res = client.get(f"/api/v1/prompts/{app_company.id}/{prompt_id}/runs/{run_id}")
     assert res.status_code == 200
     assert res.json()["raw_response"] == "r1"
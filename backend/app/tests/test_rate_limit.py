@@ -0,0 +1,51 @@
+import pytest
+
+from app.llm.rate_limit import RateLimitTimeoutError, acquire, record_usage
+from app.llm.rate_limit import db as db_limiter
+from app.llm.rate_limit.bucket import RateLimit, debit, new_bucket, take
+from app.settings import settings
+
+
+def test_bucket() -> None:
+    limit = RateLimit(rpm=60, tpm=1000)
+    bucket = new_bucket(limit, now=0)
+    assert take(bucket, limit, tokens=600, now=0) == 0
+    # 600 tokens left after refill is needed, tpm refills at 1000/60 per second
+    assert take(bucket, limit, tokens=600, now=0) == pytest.approx(12.0)
+    assert take(bucket, limit, tokens=600, now=12) == 0
+    debit(bucket, limit, tokens=100, now=12)
+    assert bucket.tokens == pytest.approx(-100)
+
+
+def test_bucket_rpm() -> None:
+    limit = RateLimit(rpm=2)
+    bucket = new_bucket(limit, now=0)
+    assert take(bucket, limit, tokens=10**6, now=0) == 0
+    assert take(bucket, limit, tokens=10**6, now=0) == 0
+    assert take(bucket, limit, tokens=10**6, now=0) == pytest.approx(30.0)
+
+
+def test_acquire_waits_for_budget(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limits", {"openai": {"rpm": 1}})
+    monkeypatch.setattr(settings, "rate_limiter", "memory")
+    sleep = mocker.patch("app.llm.rate_limit.time.sleep")
+    take = mocker.patch("app.llm.rate_limit.memory.take", side_effect=[5.0, 0.0])
+
+    acquire("openai", "m", tokens=10)
+
+    sleep.assert_called_once_with(5.0)
+    assert take.call_count == 2
+    monkeypatch.setattr(settings, "rate_limit_max_wait_seconds", 1)
+    take.side_effect = [5.0]
+    with pytest.raises(RateLimitTimeoutError):
+        acquire("openai", "m", tokens=10)
+
+
+def test_db_rate_limiter(celery_db, monkeypatch) -> None:
+    celery_db(db_limiter)
+    monkeypatch.setattr(settings, "rate_limits", {"gemini/m": {"rpm": 1, "tpm": 100}})
+    monkeypatch.setattr(settings, "rate_limiter", "db")
+
+    acquire("gemini", "m", tokens=50)
+    record_usage("gemini", "m", estimated_tokens=50, used_tokens=80)
+    assert db_limiter.take("gemini/m", RateLimit(rpm=1, tpm=100), tokens=10) > 0
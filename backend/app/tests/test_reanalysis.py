@@ -0,0 +1,122 @@
+import json
+from importlib import import_module
+
+import pytest
+from sqlmodel import select
+
+from app.crud.prompts import save_monitored_prompt_run
+from app.crud.rollups import get_daily_stats
+from app.models import MonitoredPrompt, MonitoredPromptRun
+from app.models.reanalysis import ReanalysisCheckpoint
+
+# the package re-exports the task under the module's name
+reanalyze_module = import_module("app.worker.analyzers.reanalyze_runs")
+
+
+@pytest.fixture
+def reanalysis_db(db_engine, celery_db, monkeypatch):
+    monkeypatch.setattr(reanalyze_module, "engine", db_engine)
+    monkeypatch.setattr(reanalyze_module, "is_sqlite", True)
+    return celery_db(reanalyze_module, commit=True)
+
+
+def _openai_response(text: str, urls: list[str]) -> str:
+    annotations = [{"url_citation": {"url": url}} for url in urls]
+    return json.dumps({"message": {"content": text, "annotations": annotations}})
+
+
+def test_run_reanalysis(reanalysis_db, db_session, app_company) -> None:
+    prompt = MonitoredPrompt(company_id=app_company.id, prompt="p", prompt_type="product")
+    db_session.add(prompt)
+    db_session.commit()
+    for i in range(5):
+        # computed columns as an older analyzer saved them
+        run = MonitoredPromptRun(
+            monitored_prompt_id=prompt.id,
+            llm_provider="openai",
+            llm_model="m",
+            raw_response=_openai_response(
+                f"{app_company.name} is great" if i % 2 else "nothing",
+                [f"{app_company.website}/page", "https://other.com"],
+            ),
+            brand_mentioned=False,
+            top_domain="other.com",
+        )
+        if i < 3:
+            # raw_response compressed in its own table
+            save_monitored_prompt_run(db_session, run)
+        else:
+            # legacy run with raw_response inline
+            db_session.add(run)
+    db_session.commit()
+
+    checkpoint = reanalyze_module.run_reanalysis(processes=0, batch_size=2)
+
+    assert (checkpoint.processed, checkpoint.changed) == (5, 5)
+    assert checkpoint.finished_at is not None
+    with reanalysis_db() as db:
+        runs = db.exec(select(MonitoredPromptRun).order_by(MonitoredPromptRun.id)).all()
+        run_ids = [run.id for run in runs]
+        assert [run.brand_mentioned for run in runs] == [False, True, False, True, False]
+        assert all(run.company_domain_rank == 1 for run in runs)
+        assert all(run.top_domain != "other.com" for run in runs)
+        saved = db.get_one(ReanalysisCheckpoint, "all")
+        assert saved.last_run_id == runs[-1].id
+        # the rollups of the runs' days are refreshed
+        (stats,) = get_daily_stats(db, app_company.id, runs[0].run_at.date())
+        assert (stats.runs, stats.brand_mentions, stats.cited_runs) == (5, 2, 5)
+
+    # a finished job starts a new pass over all runs
+    checkpoint = reanalyze_module.run_reanalysis(processes=0, batch_size=2)
+    assert (checkpoint.processed, checkpoint.changed) == (5, 0)
+
+    # an interrupted one resumes after the last processed run
+    with reanalysis_db() as db:
+        saved = db.get_one(ReanalysisCheckpoint, "all")
+        saved.last_run_id = run_ids[2]
+        saved.processed = 100
+        saved.finished_at = None
+    checkpoint = reanalyze_module.run_reanalysis(processes=0, batch_size=2)
+    assert (checkpoint.processed, checkpoint.changed) == (102, 0)
+    assert checkpoint.finished_at is not None
+
+    checkpoint = reanalyze_module.run_reanalysis(processes=0, batch_size=2, restart=True)
+    assert (checkpoint.processed, checkpoint.changed) == (5, 0)
+
+
+def test_run_reanalysis_gemini_without_resolved_uris(
+    reanalysis_db, db_session, app_company, mocker
+) -> None:
+    gemini_api = import_module("app.llm.prompt_analyzers.gemini_api")
+    resolve = mocker.patch.object(gemini_api, "resolve_redirect_uris", side_effect=AssertionError)
+    prompt = MonitoredPrompt(company_id=app_company.id, prompt="p", prompt_type="product")
+    db_session.add(prompt)
+    db_session.commit()
+    # saved before responses kept their resolved redirects
+    raw_response = {
+        "text": f"{app_company.name} is great",
+        "grounding_metadata": {
+            "grounding_chunks": [{"web": {"uri": "https://redirect/1", "domain": "other.com"}}]
+        },
+    }
+    save_monitored_prompt_run(
+        db_session,
+        MonitoredPromptRun(
+            monitored_prompt_id=prompt.id,
+            llm_provider="gemini",
+            llm_model="m",
+            raw_response=json.dumps(raw_response),
+            brand_mentioned=False,
+            mentioned_pages='["https://other.com/a"]',
+        ),
+    )
+    db_session.commit()
+
+    checkpoint = reanalyze_module.run_reanalysis(processes=0)
+
+    assert (checkpoint.processed, checkpoint.changed) == (1, 1)
+    resolve.assert_not_called()
+    with reanalysis_db() as db:
+        run = db.exec(select(MonitoredPromptRun)).one()
+        assert run.brand_mentioned
+        assert run.mentioned_pages == '["https://other.com/a"]'
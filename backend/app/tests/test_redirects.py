@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from app.llm.prompt_analyzers import clients, redirects
+from app.llm.prompt_analyzers.redirects import resolve_redirect_uris
+from app.settings import settings
+
+
+def _head(uri, allow_redirects, timeout):
+    if uri == "slow":
+        time.sleep(timeout)
+        raise requests.Timeout()
+    if uri == "error":
+        raise requests.ConnectionError()
+    time.sleep(0.1)
+    return SimpleNamespace(url=f"{uri}-resolved")
+
+
+def test_resolve_redirect_uris(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "redirect_cache", False)
+    monkeypatch.setattr(settings, "redirect_resolve_timeout_seconds", 0.2)
+    monkeypatch.setattr(settings, "redirect_resolve_deadline_seconds", 0.3)
+    session = mocker.Mock(head=mocker.Mock(side_effect=_head))
+    mocker.patch.object(redirects, "get_http_session", return_value=session)
+    uris = [f"u{i}" for i in range(10)] + ["u0", "slow", "error"]
+
+    started_at = time.monotonic()
+    resolved = resolve_redirect_uris(uris)
+
+    # bounded by the deadline, not the sum of the requests
+    assert time.monotonic() - started_at < 0.5
+    assert resolved == {
+        **{f"u{i}": f"u{i}-resolved" for i in range(10)},
+        "slow": "slow",
+        "error": "error",
+    }
+    assert [c.args[0] for c in session.head.call_args_list].count("u0") == 1
+
+
+def test_resolve_redirect_uris_shared_pool(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "redirect_cache", False)
+    monkeypatch.setattr(settings, "redirect_resolve_max_workers", 2)
+    monkeypatch.setattr(settings, "inline_max_workers", 3)
+    monkeypatch.setattr(redirects, "_executor", None)
+    lock = threading.Lock()
+    running = max_running = 0
+
+    def head(uri, allow_redirects, timeout):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return SimpleNamespace(url=f"{uri}-resolved")
+
+    mocker.patch.object(
+        redirects, "get_http_session", return_value=mocker.Mock(head=mocker.Mock(side_effect=head))
+    )
+
+    # an inline batch of analyses resolving at once, one pool for all of them
+    with ThreadPoolExecutor(3) as analyses:
+        results = list(
+            analyses.map(resolve_redirect_uris, [[f"{i}-{j}" for j in range(4)] for i in range(3)])
+        )
+
+    assert all(len(resolved) == 4 for resolved in results)
+    assert max_running <= 6
+    # a connection per resolution thread
+    session = clients._create_http_session()
+    assert session.get_adapter("https://example.com")._pool_maxsize == 6  # type: ignore
+
+
+@pytest.fixture
+def cache_db(db_session, celery_db):
+    celery_db(redirects)
+    redirects._memory_cache.clear()
+    yield db_session
+    redirects._memory_cache.clear()
+
+
+def test_resolve_redirect_uris_cached(cache_db, mocker) -> None:
+    session = mocker.Mock(head=mocker.Mock(side_effect=_head))
+    mocker.patch.object(redirects, "get_http_session", return_value=session)
+    stats = redirects.get_cache_stats()
+
+    assert resolve_redirect_uris(["u1", "error"]) == {"u1": "u1-resolved", "error": "error"}
+    assert session.head.call_count == 4
+    # another worker: empty memory cache, shared table
+    redirects._memory_cache.clear()
+    assert resolve_redirect_uris(["u1", "error"]) == {"u1": "u1-resolved", "error": "error"}
+    assert resolve_redirect_uris(["u1", "u2"]) == {"u1": "u1-resolved", "u2": "u2-resolved"}
+    assert session.head.call_count == 5
+
+    new_stats = redirects.get_cache_stats()
+    assert new_stats["misses"] - stats["misses"] == 3
+    assert new_stats["shared_hits"] - stats["shared_hits"] == 2
+    assert new_stats["memory_hits"] - stats["memory_hits"] == 1
+    assert new_stats["negative_hits"] - stats["negative_hits"] == 1
@@ -0,0 +1,278 @@
+import time
+from datetime import timedelta
+from importlib import import_module
+
+import pytest
+
+from app.crud.prompts import (
+    claim_prompts_to_refresh,
+    get_leveled_run_at,
+    rebalance_prompt_schedule,
+    reclaim_expired_prompt_leases,
+    save_monitored_prompt,
+)
+from app.models import MonitoredPrompt, MonitoredPromptRun
+from app.models.types import default_now
+from app.settings import settings
+from app.worker import task_dispatcher
+from app.worker.celery_app import Q_PROMPT_WATCH_PRIORITY
+from app.worker.scheduled.trigger_prompt_monitoring import trigger_prompt_monitoring
+from app.worker.task_dispatcher import TaskBatchResult
+
+# the package re-exports the task under the same name as the module
+trigger_module = import_module("app.worker.scheduled.trigger_prompt_monitoring")
+channel_module = import_module("app.worker.analyzers.analyze_prompt_channel")
+analyze_module = import_module("app.worker.analyzers.analyze_prompt")
+
+
+def _create_prompt(db_session, company_id, **kwargs) -> MonitoredPrompt:
+    params = {
+        "company_id": company_id,
+        "prompt": "p",
+        "prompt_type": "product",
+        "is_active": True,
+        "next_run_at": default_now() - timedelta(minutes=1),
+        "created_at": default_now(),
+    }
+    params.update(kwargs)
+    prompt = save_monitored_prompt(db_session, MonitoredPrompt(**params))
+    assert prompt.id is not None
+    return prompt
+
+
+def test_claim_prompts_to_refresh(db_session, app_company) -> None:
+    due_1 = _create_prompt(db_session, app_company.id)
+    due_2 = _create_prompt(
+        db_session, app_company.id, next_run_at=default_now() - timedelta(minutes=2)
+    )
+    _create_prompt(db_session, app_company.id, is_active=False)
+    _create_prompt(db_session, app_company.id, next_run_at=default_now() + timedelta(hours=1))
+
+    assert list(claim_prompts_to_refresh(db_session, limit=1)) == [(due_2.id, 1)]
+    assert list(claim_prompts_to_refresh(db_session, limit=10)) == [(due_1.id, 1)]
+    assert list(claim_prompts_to_refresh(db_session, limit=10)) == []
+    db_session.refresh(due_1)
+    assert due_1.task_scheduled_at is not None
+
+
+def test_reclaim_expired_prompt_leases(db_session, app_company) -> None:
+    lease = timedelta(seconds=settings.prompt_task_lease_seconds)
+    expired = _create_prompt(
+        db_session, app_company.id, task_scheduled_at=default_now() - lease - timedelta(minutes=1)
+    )
+    _create_prompt(db_session, app_company.id, task_scheduled_at=default_now())
+
+    assert reclaim_expired_prompt_leases(db_session) == 1
+    # a new lease id, tasks of the expired lease drop out
+    assert list(claim_prompts_to_refresh(db_session)) == [(expired.id, 1)]
+    assert reclaim_expired_prompt_leases(db_session) == 0
+
+
+def test_get_leveled_run_at() -> None:
+    interval = 3600
+    target = default_now().replace(microsecond=0)
+    leveled = get_leveled_run_at(1, interval, target)
+    assert timedelta(0) <= leveled - target < timedelta(seconds=interval)
+    assert get_leveled_run_at(1, interval, target) == leveled
+    # never ahead of the target, even by a fraction of a second
+    late = leveled + timedelta(microseconds=1)
+    assert get_leveled_run_at(1, interval, late) == leveled + timedelta(seconds=interval)
+    # cadence is kept after the first snap
+    next_leveled = get_leveled_run_at(1, interval, leveled + timedelta(seconds=interval))
+    assert next_leveled - leveled == timedelta(seconds=interval)
+    # prompts due at the same moment are spread over the interval
+    slots = {get_leveled_run_at(prompt_id, interval, target) for prompt_id in range(100)}
+    assert len(slots) > 90
+
+
+def test_rebalance_prompt_schedule(db_session, app_company) -> None:
+    next_run_at = (default_now() + timedelta(days=1)).replace(microsecond=0)
+    prompts = [
+        _create_prompt(db_session, app_company.id, next_run_at=next_run_at) for _ in range(10)
+    ]
+
+    assert rebalance_prompt_schedule(db_session, batch_size=3) > 0
+    assert rebalance_prompt_schedule(db_session) == 0
+    for prompt in prompts:
+        db_session.refresh(prompt)
+        assert prompt.id is not None
+        leveled = get_leveled_run_at(prompt.id, prompt.refresh_interval_seconds, next_run_at)
+        assert prompt.next_run_at.replace(tzinfo=None) == leveled.replace(tzinfo=None)
+
+
+@pytest.fixture
+def scheduler_db(db_session, celery_db):
+    celery_db(trigger_module, channel_module, analyze_module)
+    return db_session
+
+
+@pytest.mark.parametrize(("drain", "dispatched", "remaining"), [(True, 5, 0), (False, 2, 3)])
+def test_trigger_prompt_monitoring_drain(
+    scheduler_db, app_company, mocker, monkeypatch, drain, dispatched, remaining
+) -> None:
+    for _ in range(5):
+        _create_prompt(scheduler_db, app_company.id)
+    monkeypatch.setattr(settings, "trigger_prompt_monitoring_batch_size", 2)
+    dispatch = mocker.patch.object(trigger_module, "dispatch_tasks", return_value=TaskBatchResult())
+
+    stats = trigger_prompt_monitoring(drain=drain)
+
+    assert stats["due"] == 5
+    assert stats["dispatched"] == dispatched
+    assert stats["remaining"] == remaining
+    assert sum(len(c.args[1]) for c in dispatch.call_args_list) == dispatched
+
+
+def test_trigger_prompt_monitoring_first_runs_first(scheduler_db, app_company, mocker) -> None:
+    recurring = _create_prompt(
+        scheduler_db,
+        app_company.id,
+        next_run_at=default_now() - timedelta(hours=1),
+        last_run_at=default_now() - timedelta(days=1),
+    )
+    new = _create_prompt(scheduler_db, app_company.id)
+    dispatch = mocker.patch.object(trigger_module, "dispatch_tasks", return_value=TaskBatchResult())
+
+    trigger_prompt_monitoring(drain=True)
+
+    assert [(c.args[1], c.kwargs["queue"]) for c in dispatch.call_args_list] == [
+        ([(new.id, 1)], Q_PROMPT_WATCH_PRIORITY),
+        ([(recurring.id, 1)], None),
+    ]
+
+
+def test_trigger_prompt_monitoring_inline_out_of_time(
+    scheduler_db, app_company, mocker, monkeypatch
+) -> None:
+    prompts = [_create_prompt(scheduler_db, app_company.id) for _ in range(3)]
+    monkeypatch.setattr(settings, "task_mode", "inline")
+    monkeypatch.setattr(settings, "inline_max_workers", 1)
+    monkeypatch.setattr(settings, "trigger_prompt_monitoring_max_seconds", 0.2)
+    analyze = mocker.patch.object(
+        task_dispatcher, "analyze_prompt", side_effect=lambda *_: time.sleep(0.5)
+    )
+
+    stats = trigger_prompt_monitoring(drain=True)
+
+    assert analyze.call_count == 1
+    assert stats["dispatched"] == 1
+    assert stats["timed_out"] == 1
+    assert stats["cancelled"] == 2
+    # cancelled prompts are released for the next trigger
+    assert stats["remaining"] == 2
+    for prompt in prompts[1:]:
+        scheduler_db.refresh(prompt)
+        assert prompt.task_scheduled_at is None
+
+
+def test_trigger_prompt_monitoring_no_claim_after_deadline(
+    scheduler_db, app_company, mocker, monkeypatch
+) -> None:
+    recurring = _create_prompt(
+        scheduler_db, app_company.id, last_run_at=default_now() - timedelta(days=1)
+    )
+    _create_prompt(scheduler_db, app_company.id)
+    monkeypatch.setattr(settings, "trigger_prompt_monitoring_max_seconds", 0.1)
+
+    def dispatch_tasks(*args, **kwargs):
+        # the first-run pass uses up the time budget
+        time.sleep(0.2)
+        return TaskBatchResult()
+
+    dispatch = mocker.patch.object(trigger_module, "dispatch_tasks", side_effect=dispatch_tasks)
+
+    stats = trigger_prompt_monitoring(drain=True)
+
+    assert dispatch.call_count == 1
+    assert stats["dispatched"] == 1
+    assert stats["remaining"] == 1
+    scheduler_db.refresh(recurring)
+    assert recurring.task_scheduled_at is None
+
+
+def test_analyze_prompt_channels_close_cycle_once(scheduler_db, app_company, mocker) -> None:
+    prompt = _create_prompt(scheduler_db, app_company.id, task_scheduled_at=default_now())
+    next_run_at = prompt.next_run_at
+    cycle_at = default_now()
+
+    def analyze(prompt, company, *, provider, analyzer_type):
+        return MonitoredPromptRun(
+            monitored_prompt_id=prompt.id,
+            llm_provider=provider,
+            llm_model="m",
+            raw_response="{}",
+            brand_mentioned=False,
+        )
+
+    analyzer = mocker.patch.object(channel_module, "analyze_prompt_llm", side_effect=analyze)
+    providers = ["gemini", "openai"]
+    args = (prompt.id, "gemini", "api", cycle_at.isoformat(), providers)
+
+    channel_module.analyze_prompt_channel(*args)
+    prompt = scheduler_db.get_one(MonitoredPrompt, prompt.id, populate_existing=True)
+    assert prompt.task_scheduled_at is not None
+    assert prompt.next_run_at == next_run_at
+    # redelivered channel doesn't call the LLM again
+    channel_module.analyze_prompt_channel(*args)
+    assert analyzer.call_count == 1
+
+    channel_module.analyze_prompt_channel(
+        prompt.id, "openai", "api", cycle_at.isoformat(), providers
+    )
+    prompt = scheduler_db.get_one(MonitoredPrompt, prompt.id, populate_existing=True)
+    assert analyzer.call_count == 2
+    assert prompt.task_scheduled_at is None
+    assert prompt.last_run_at is not None
+    assert prompt.last_run_at.replace(tzinfo=None) == cycle_at.replace(tzinfo=None)
+    assert prompt.next_run_at > next_run_at
+
+
+def test_analyze_prompt_fenced_by_lease(scheduler_db, app_company, mocker) -> None:
+    prompt = _create_prompt(scheduler_db, app_company.id)
+    [(prompt_id, first_lease)] = claim_prompts_to_refresh(scheduler_db)
+    # the lease expires, the prompt is claimed again while the first task is late
+    prompt = scheduler_db.get_one(MonitoredPrompt, prompt_id, populate_existing=True)
+    prompt.task_scheduled_at = None
+    save_monitored_prompt(scheduler_db, prompt)
+    [(_, second_lease)] = claim_prompts_to_refresh(scheduler_db)
+    send_task = mocker.patch.object(analyze_module.celery_app, "send_task")
+    mocker.patch.object(analyze_module, "get_channels", return_value={"openai": "api"})
+
+    analyze_module.analyze_prompt(prompt_id, first_lease)
+    assert send_task.call_count == 0
+    analyze_module.analyze_prompt(prompt_id, second_lease)
+    assert send_task.call_count == 1
+    assert send_task.call_args.kwargs["args"][-1] == second_lease
+
+    # a channel of the first lease doesn't save its run
+    run = MonitoredPromptRun(
+        monitored_prompt_id=prompt_id,
+        llm_provider="openai",
+        llm_model="m",
+        raw_response="{}",
+        brand_mentioned=False,
+        run_at=default_now(),
+    )
+    channel_module.save_channel_run(
+        prompt_id, app_company, "openai", run, run.run_at, ["openai"], first_lease
+    )
+    prompt = scheduler_db.get_one(MonitoredPrompt, prompt_id, populate_existing=True)
+    assert prompt.last_run_at is None
+    assert prompt.task_scheduled_at is not None
+
+
+def test_analyze_prompt_without_quota_skips_cycle(scheduler_db, app_company, mocker) -> None:
+    prompt = _create_prompt(scheduler_db, app_company.id)
+    [(prompt_id, lease_id)] = claim_prompts_to_refresh(scheduler_db)
+    mocker.patch.object(analyze_module, "ensure_quota_available", return_value=False)
+    send_task = mocker.patch.object(analyze_module.celery_app, "send_task")
+
+    analyze_module.analyze_prompt(prompt_id, lease_id)
+
+    assert send_task.call_count == 0
+    prompt = scheduler_db.get_one(MonitoredPrompt, prompt_id, populate_existing=True)
+    # released, and not due again before the next cycle
+    assert prompt.task_scheduled_at is None
+    assert prompt.last_run_at is None
+    assert prompt.next_run_at.replace(tzinfo=None) > default_now().replace(tzinfo=None)
+    assert list(claim_prompts_to_refresh(scheduler_db)) == []
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import select
+
+from app.llm.prompt_analyzers import openai_api, shared
+from app.models import MonitoredPrompt
+from app.models.shared_response import SharedResponse
+from app.models.types import default_now
+from app.tests.fixtures import create_company
+
+
+@pytest.fixture
+def shared_db(db_session, celery_db):
+    celery_db(shared)
+    return db_session
+
+
+def _completion(prompt, country):
+    annotations = [{"url_citation": {"url": "https://example.com/crm"}}]
+    message = {"content": "c and d are great CRMs", "annotations": annotations}
+    return SimpleNamespace(model_dump=lambda: {"message": message})
+
+
+def test_shared_response(shared_db, app_company, mocker) -> None:
+    other_company = create_company(shared_db, name="d", website="https://d.com")
+    completion = mocker.patch.object(openai_api, "_get_openai_completion", side_effect=_completion)
+    prompts = [
+        MonitoredPrompt(id=1, company_id=app_company.id, prompt="Best CRM  for startups"),
+        MonitoredPrompt(id=2, company_id=other_company.id, prompt="best crm for startups"),
+    ]
+
+    runs = [
+        openai_api.analyze_prompt(prompts[0], app_company),
+        openai_api.analyze_prompt(prompts[1], other_company),
+    ]
+
+    # one LLM call, analyzed for each company
+    assert completion.call_count == 1
+    assert [run.brand_mentioned for run in runs] == [True, True]
+    assert [run.company_domain_rank for run in runs] == [1, None]
+
+    # the country is part of the key
+    prompt = MonitoredPrompt(id=3, company_id=app_company.id, prompt="best CRM for startups")
+    prompt.target_country = "DE"
+    openai_api.analyze_prompt(prompt, app_company)
+    assert completion.call_count == 2
+    assert completion.call_args.args == ("best CRM for startups", "DE")
+
+
+def test_shared_response_async_single_flight(shared_db, app_company, mocker) -> None:
+    calls = 0
+
+    async def completion(prompt, country):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return _completion(prompt, country)
+
+    mocker.patch.object(openai_api, "_get_openai_completion_async", side_effect=completion)
+    prompts = [
+        MonitoredPrompt(id=i, company_id=app_company.id, prompt="best crm for startups")
+        for i in range(5)
+    ]
+
+    async def run():
+        return await asyncio.gather(
+            *(openai_api.analyze_prompt_async(prompt, app_company) for prompt in prompts)
+        )
+
+    runs = asyncio.run(run())
+
+    assert calls == 1
+    assert [run.monitored_prompt_id for run in runs] == list(range(5))
+
+
+def test_shared_response_not_reused_across_cycles(shared_db, app_company, mocker) -> None:
+    completion = mocker.patch.object(openai_api, "_get_openai_completion", side_effect=_completion)
+    prompt = MonitoredPrompt(
+        id=1, company_id=app_company.id, prompt="best crm", refresh_interval_seconds=3600
+    )
+    openai_api.analyze_prompt(prompt, app_company)
+    openai_api.analyze_prompt(prompt, app_company)
+    assert completion.call_count == 1
+
+    # the next cycle of an hourly prompt, within shared_response_ttl_seconds
+    shared_response = shared_db.exec(select(SharedResponse)).one()
+    shared_response.fetched_at = default_now() - timedelta(minutes=50)
+    shared_db.flush()
+    openai_api.analyze_prompt(prompt, app_company)
+    assert completion.call_count == 2
+
+    # a weekly prompt still gets it
+    weekly = MonitoredPrompt(id=2, company_id=app_company.id, prompt="best crm")
+    shared_response.fetched_at = default_now() - timedelta(minutes=50)
+    shared_db.flush()
+    openai_api.analyze_prompt(weekly, app_company)
+    assert completion.call_count == 2
@@ -0,0 +1,50 @@
+import time
+
+from app.settings import settings
+from app.worker import task_dispatcher
+from app.worker.task_dispatcher import dispatch_tasks
+
+
+def _analyze(prompt_id: int):
+    if prompt_id == 2:
+        raise RuntimeError("boom")
+    if prompt_id == 3:
+        time.sleep(0.5)
+
+
+def test_dispatch_tasks_inline(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "task_mode", "inline")
+    monkeypatch.setattr(settings, "inline_max_workers", 4)
+    monkeypatch.setattr(settings, "inline_task_timeout_seconds", 0.2)
+    mocker.patch.object(task_dispatcher, "analyze_prompt", side_effect=_analyze)
+
+    started_at = time.monotonic()
+    result = dispatch_tasks("analyzers.analyze_prompt", [(1,), (2,), (3,), (4,)])
+
+    assert time.monotonic() - started_at < 0.5
+    assert (result.succeeded, result.failed, result.timed_out) == (2, 1, 1)
+    assert result.cancelled == []
+
+
+def test_dispatch_tasks_inline_deadline(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "task_mode", "inline")
+    monkeypatch.setattr(settings, "inline_max_workers", 1)
+    mocker.patch.object(task_dispatcher, "analyze_prompt", side_effect=_analyze)
+
+    result = dispatch_tasks(
+        "analyzers.analyze_prompt", [(3,), (1,), (4,)], deadline=time.monotonic() + 0.2
+    )
+
+    assert (result.succeeded, result.timed_out) == (0, 1)
+    assert result.cancelled == [(1,), (4,)]
+
+
+def test_dispatch_tasks_celery(mocker, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "task_mode", "celery")
+    send_task = mocker.patch.object(task_dispatcher.celery_app, "send_task")
+
+    result = dispatch_tasks("analyzers.analyze_prompt", [(1,), (2,)], queue="q")
+
+    assert send_task.call_count == 2
+    send_task.assert_called_with("analyzers.analyze_prompt", args=[2], queue="q")
+    assert result == task_dispatcher.TaskBatchResult()
@@ -1,3 +1,4 @@
+import gzip
 import hashlib
 import re
 import unicodedata
@@ -8,6 +9,17 @@ def calculate_hash(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
 
+def compress_text(s: str) -> bytes:
+    # Level 6: most of the gain of 9 for JSON, at a fraction of the CPU
+    return gzip.compress(s.encode("utf-8"), compresslevel=6)
+
+
+def decompress_text(data: bytes, encoding: str = "gzip") -> str:
+    if encoding != "gzip":
+        raise ValueError(f"Unknown encoding: {encoding}")
+    return gzip.decompress(data).decode("utf-8")
+
+
 def canonicalize_title(title: str) -> str:
     title = unicodedata.normalize("NFKC", title.lower())
     if "|" in title:
@@ -1 +1,3 @@
 from .analyze_prompt import analyze_prompt as analyze_prompt
+from .analyze_prompt_channel import analyze_prompt_channel as analyze_prompt_channel
+from .reanalyze_runs import reanalyze_runs as reanalyze_runs
@@ -1,20 +1,40 @@
 import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session
 
 from app.crud.company import get_company_by_id
-from app.crud.prompts import save_monitored_prompt, save_monitored_prompt_run
-from app.crud.quota import QuotaType, ensure_quota_available, increment_quota
+from app.crud.llm_batches import queue_batch_requests
+from app.crud.prompts import holds_prompt_lease, skip_prompt_cycle
+from app.crud.quota import QuotaType, ensure_quota_available
 from app.db import get_celery_db
-from app.llm.prompt_analyzers import analyze_prompt as analyze_prompt_llm
-from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun
+from app.llm.batch import get_batch_providers
+from app.llm.prompt_analyzers import get_channels
+from app.models.monitored_prompt import MonitoredPrompt
 from app.models.types import default_now
 from app.settings import settings
 
-from ..celery_app import celery_app
+from ..celery_app import Q_PROMPT_WATCH_PRIORITY, celery_app
+from .analyze_prompt_channel import analyze_prompt_channel
 
 logger = logging.getLogger(__name__)
 
 
+# Early returns end the claim, or the prompt stays leased until the lease expires.
+# Without a lease id the lease may be another task's, it's left alone.
+def _release_lease(db: Session, prompt: MonitoredPrompt, lease_id: int | None):
+    # Not due, the trigger won't claim it again before it is
+    if lease_id is not None:
+        prompt.task_scheduled_at = None
+        db.flush()
+
+
+def _skip_cycle(db: Session, prompt: MonitoredPrompt, lease_id: int | None):
+    if lease_id is not None:
+        skip_prompt_cycle(db, prompt)
+
+
 @celery_app.task(
     name="analyzers.analyze_prompt",
     acks_late=True,
@@ -22,65 +42,76 @@ logger = logging.getLogger(__name__)
     retry_backoff=True,
     max_retries=settings.celery_max_retries,
 )
-def analyze_prompt(prompt_id: int):
+def analyze_prompt(prompt_id: int, lease_id: int | None = None):
+    # lease_id is the claim's fencing token, a late duplicate of a reclaimed task
+    # finds another one and drops out, see holds_prompt_lease
+    channels = get_channels()
     with get_celery_db() as db:
         prompt = db.get(MonitoredPrompt, prompt_id)
         if not prompt:
             logger.info(f"Prompt {prompt_id} not found.")
             return
+        if not holds_prompt_lease(prompt, lease_id):
+            logger.info(f"Prompt {prompt_id} lease {lease_id} is gone, skipping.")
+            return
         if prompt.is_active is False:
             logger.info(f"Prompt {prompt_id} is not active.")
+            _release_lease(db, prompt, lease_id)
             return
         if prompt.next_run_at.replace(tzinfo=datetime.UTC) > default_now():
             logger.info(f"Prompt {prompt_id} is not scheduled to run yet.")
+            _release_lease(db, prompt, lease_id)
             return
-        db.expunge(prompt)
         company = get_company_by_id(db, prompt.company_id)
         if not company:
             logger.info(f"Company {prompt.company_id} not found.")
+            _skip_cycle(db, prompt, lease_id)
             return
         if not ensure_quota_available(db, company, QuotaType.LLM_CALLS):
+            _skip_cycle(db, prompt, lease_id)
             return
+        if not channels:
+            logger.info(f"All channels disabled for prompt {prompt_id}.")
+            _skip_cycle(db, prompt, lease_id)
+            return
+        db.expunge(prompt)
         db.expunge(company)
-    to_save: list[MonitoredPromptRun] = []
-    if settings.monitoring_channel_gemini:
-        logger.info(f"Analyzing prompt {prompt_id} with Gemini...")
-        to_save.append(
-            analyze_prompt_llm(
-                prompt,
-                company,
-                provider="gemini",
-                analyzer_type=settings.monitoring_channel_gemini,
-            )
-        )
-    if settings.monitoring_channel_openai:
-        logger.info(f"Analyzing prompt {prompt_id} with OpenAI...")
-        to_save.append(
-            analyze_prompt_llm(
-                prompt,
-                company,
-                provider="openai",
-                analyzer_type=settings.monitoring_channel_openai,
-            )
-        )
-    if not to_save:
-        logger.info(f"All channels disabled for prompt {prompt_id}.")
+    # Each channel runs and retries on its own, the last one to finish
+    # advances next_run_at, see analyze_prompt_channel.
+    cycle_at_dt = default_now()
+    cycle_at = cycle_at_dt.isoformat()
+    providers = list(channels)
+    batch_providers = get_batch_providers(prompt, channels)
+    if batch_providers:
+        # Picked up by the next submit_llm_batches, the cycle closes when all are in
+        with get_celery_db() as db:
+            queue_batch_requests(db, prompt_id, batch_providers, cycle_at_dt, providers, lease_id)
+        logger.info(f"Queued {batch_providers} of prompt {prompt_id} for a batch job.")
+        channels = {p: t for p, t in channels.items() if p not in batch_providers}
+        if not channels:
+            return
+    if settings.task_mode == "inline":
+        with ThreadPoolExecutor(len(channels)) as executor:
+            futures = [
+                executor.submit(
+                    analyze_prompt_channel,
+                    prompt_id,
+                    provider,
+                    analyzer_type,
+                    cycle_at,
+                    providers,
+                    lease_id,
+                )
+                for provider, analyzer_type in channels.items()
+            ]
+        for future in futures:
+            future.result()
         return
-    now = default_now()
-    logger.info(f"Saving prompt runs for prompt {prompt_id}...")
-    with get_celery_db() as db:
-        for run in to_save:
-            prompt = db.get(MonitoredPrompt, prompt_id)
-            if prompt is None:
-                logger.info(f"Prompt {prompt_id} not found.")
-                continue
-            prompt.task_scheduled_at = None
-            prompt.last_run_at = now
-            prompt.next_run_at = prompt.next_run_at + datetime.timedelta(
-                seconds=prompt.refresh_interval_seconds
-            )
-            run.run_at = now
-            save_monitored_prompt(db, prompt)
-            save_monitored_prompt_run(db, run)
-        increment_quota(db, company, QuotaType.LLM_CALLS)
-    logger.info(f"Finished analyzing prompt {prompt_id}.")
+    queue = Q_PROMPT_WATCH_PRIORITY if prompt.last_run_at is None else None
+    for provider, analyzer_type in channels.items():
+        celery_app.send_task(
+            "analyzers.analyze_prompt_channel",
+            args=[prompt_id, provider, analyzer_type, cycle_at, providers, lease_id],
+            queue=queue,
+        )
+    logger.info(f"Dispatched {len(channels)} channels for prompt {prompt_id}.")
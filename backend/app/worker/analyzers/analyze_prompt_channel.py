@@ -0,0 +1,98 @@
+import datetime
+import logging
+
+from app.crud.company import get_company_by_id
+from app.crud.prompts import (
+    complete_prompt_cycle,
+    get_cycle_providers,
+    holds_prompt_lease,
+    lock_monitored_prompt,
+    save_monitored_prompt_run,
+)
+from app.crud.quota import QuotaType, increment_quota
+from app.db import get_celery_db
+from app.llm.prompt_analyzers import analyze_prompt as analyze_prompt_llm
+from app.models import Company
+from app.models.monitored_prompt import MonitoredPrompt, MonitoredPromptRun
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def save_channel_run(
+    prompt_id: int,
+    company: Company,
+    provider: str,
+    run: MonitoredPromptRun | None,
+    run_at: datetime.datetime,
+    providers: list[str],
+    lease_id: int | None = None,
+):
+    """Saves the run of a channel, the last channel of the cycle to finish closes it"""
+    with get_celery_db() as db:
+        # Serializes channels of the prompt, also their updates of the company stats
+        prompt = lock_monitored_prompt(db, prompt_id)
+        if prompt is None:
+            logger.info(f"Prompt {prompt_id} not found.")
+            return
+        # Checked under the lock, a reclaimed cycle's runs don't land next to the new one's
+        if not holds_prompt_lease(prompt, lease_id):
+            logger.info(f"Prompt {prompt_id} lease {lease_id} is gone, dropping {provider} run.")
+            return
+        if run is not None:
+            save_monitored_prompt_run(db, run)
+        finished = get_cycle_providers(db, prompt_id, run_at)
+        if not finished.issuperset(providers):
+            logger.info(f"Prompt {prompt_id} {provider} done, waiting for other channels.")
+            return
+        last_run_at = prompt.last_run_at
+        if last_run_at is not None and last_run_at.replace(tzinfo=datetime.UTC) >= run_at:
+            logger.info(f"Prompt {prompt_id} cycle already closed.")
+            return
+        complete_prompt_cycle(db, prompt, run_at)
+        increment_quota(db, company, QuotaType.LLM_CALLS)
+    logger.info(f"Finished analyzing prompt {prompt_id}.")
+
+
+@celery_app.task(
+    name="analyzers.analyze_prompt_channel",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def analyze_prompt_channel(
+    prompt_id: int,
+    provider: str,
+    analyzer_type: str,
+    cycle_at: str,
+    providers: list[str],
+    lease_id: int | None = None,
+):
+    # cycle_at identifies the monitoring cycle, runs of all its channels share it as run_at
+    run_at = datetime.datetime.fromisoformat(cycle_at)
+    with get_celery_db() as db:
+        prompt = db.get(MonitoredPrompt, prompt_id)
+        if not prompt:
+            logger.info(f"Prompt {prompt_id} not found.")
+            return
+        # Also checked when saving, this one saves the LLM call
+        if not holds_prompt_lease(prompt, lease_id):
+            logger.info(f"Prompt {prompt_id} lease {lease_id} is gone, skipping {provider}.")
+            return
+        # Redelivered or retried after the run was saved, don't pay for it twice
+        already_saved = provider in get_cycle_providers(db, prompt_id, run_at)
+        db.expunge(prompt)
+        company = get_company_by_id(db, prompt.company_id)
+        if not company:
+            logger.info(f"Company {prompt.company_id} not found.")
+            return
+        db.expunge(company)
+    run = None
+    if not already_saved:
+        logger.info(f"Analyzing prompt {prompt_id} with {provider}...")
+        run = analyze_prompt_llm(prompt, company, provider=provider, analyzer_type=analyzer_type)
+        run.run_at = run_at
+    save_channel_run(prompt_id, company, provider, run, run_at, providers, lease_id)
@@ -0,0 +1,308 @@
+"""Re-derives computed columns of stored runs from raw_response, without LLM calls.
+
+Use after changing brand aliases, domain rules or the analyzers' parsing.
+Progress is checkpointed per job name, an interrupted job continues where it stopped
+and a finished one starts a new pass over all runs.
+--archived re-analyzes the archive files instead (see app.archive), rewriting
+the changed ones. It has no checkpoint, a rerun finds nothing left to change.
+
+    python -m app.worker.analyzers.reanalyze_runs [--company-id 1] [--processes 4] [--restart]
+    python -m app.worker.analyzers.reanalyze_runs --archived [--company-id 1]
+"""
+
+import argparse
+import logging
+import multiprocessing
+from collections import deque
+from collections.abc import Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from sqlmodel import Session, col, select, update
+
+from app.archive import list_archive_files, read_archive_file, write_archive_file
+from app.crud.company import get_company_by_id
+from app.crud.company_stats import updating_company_stats
+from app.crud.prompts import rebuild_prompt_results, save_run_citations
+from app.crud.reanalysis import (
+    delete_reanalysis_checkpoint,
+    get_reanalysis_checkpoint,
+    save_reanalysis_checkpoint,
+)
+from app.crud.rollups import get_run_days, rebuild_daily_stats
+from app.db import engine, get_celery_db, is_sqlite
+from app.llm.prompt_analyzers import rebuild_prompt_run
+from app.models import Company, MonitoredPrompt, MonitoredPromptRun, MonitoredPromptRunPayload
+from app.models.reanalysis import ReanalysisCheckpoint
+from app.models.types import default_now
+from app.settings import settings
+from app.utils import decompress_text
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+COMPUTED_COLUMNS = ("top_domain", "brand_mentioned", "company_domain_rank", "mentioned_pages")
+
+
+def _stream_runs(company_id: int | None, after_id: int, batch_size: int) -> Iterator[list]:
+    statement = (
+        select(
+            MonitoredPromptRun.id,
+            MonitoredPromptRun.monitored_prompt_id,
+            MonitoredPrompt.company_id,
+            MonitoredPromptRun.llm_provider,
+            MonitoredPromptRun.raw_response,
+            MonitoredPromptRunPayload.encoding,
+            MonitoredPromptRunPayload.data,
+            *(getattr(MonitoredPromptRun, column) for column in COMPUTED_COLUMNS),
+        )
+        .join(MonitoredPrompt, col(MonitoredPrompt.id) == MonitoredPromptRun.monitored_prompt_id)
+        .outerjoin(
+            MonitoredPromptRunPayload,
+            col(MonitoredPromptRunPayload.run_id) == MonitoredPromptRun.id,
+        )
+        .order_by(col(MonitoredPromptRun.id).asc())
+    )
+    if company_id is not None:
+        statement = statement.where(MonitoredPrompt.company_id == company_id)
+    if not is_sqlite:
+        # Server-side cursor, rows are fetched batch by batch
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                statement.where(col(MonitoredPromptRun.id) > after_id)
+            )
+            for rows in result.partitions():
+                yield [tuple(row) for row in rows]
+        return
+    # SQLite has no server-side cursors, and a long read would block the batch
+    # writes: page by id instead
+    last_id = after_id
+    while True:
+        with Session(engine) as db:
+            rows = db.exec(
+                statement.where(col(MonitoredPromptRun.id) > last_id).limit(batch_size)
+            ).all()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+
+
+def _reanalyze_batch(rows: Sequence[tuple], companies: dict[int, dict]) -> list[dict]:
+    # Runs in pool processes: plain data in, changed columns out
+    changes = []
+    for run_id, prompt_id, company_id, provider, raw_response, encoding, data, *current in rows:
+        if data is not None:
+            # Decompressed here, in the pool processes
+            raw_response = decompress_text(data, encoding)
+        company = Company(**companies[company_id])
+        prompt = MonitoredPrompt(id=prompt_id, company_id=company_id, prompt="", prompt_type="")
+        stored = dict(zip(COMPUTED_COLUMNS, current, strict=True))
+        try:
+            run = rebuild_prompt_run(
+                prompt,
+                company,
+                provider=provider,
+                raw_response=raw_response,
+                mentioned_pages=stored["mentioned_pages"],
+            )
+        except Exception:
+            logger.exception(f"Failed to re-analyze run {run_id}.")
+            continue
+        values = {column: getattr(run, column) for column in COMPUTED_COLUMNS}
+        if values != stored:
+            changes.append({"id": run_id, **values})
+    return changes
+
+
+def _reanalyze_archive_file(path: Path, companies: dict[int, dict]) -> tuple[int, int]:
+    records = list(read_archive_file(path))
+    rows = [
+        (
+            record["id"],
+            record["monitored_prompt_id"],
+            record["company_id"],
+            record["llm_provider"],
+            record["raw_response"],
+            None,
+            None,
+            *(record[column] for column in COMPUTED_COLUMNS),
+        )
+        for record in records
+    ]
+    changes = {change["id"]: change for change in _reanalyze_batch(rows, companies)}
+    if changes:
+        write_archive_file(
+            path, [{**record, **changes.get(record["id"], {})} for record in records]
+        )
+    return len(records), len(changes)
+
+
+def run_archive_reanalysis(
+    *, company_id: int | None = None, processes: int | None = None
+) -> tuple[int, int]:
+    """Processed and changed archived runs"""
+    processes = settings.reanalysis_processes if processes is None else processes
+    files = list_archive_files(company_id)
+    companies: dict[int, dict] = {}
+    with get_celery_db() as db:
+        for file_company_id in {file_company_id for file_company_id, _ in files}:
+            company = get_company_by_id(db, file_company_id)
+            if company is None:
+                logger.info(f"Company {file_company_id} not found, skipping its archive.")
+                continue
+            companies[file_company_id] = company.model_dump()
+    paths = [path for file_company_id, path in files if file_company_id in companies]
+    file_companies = [
+        {file_company_id: companies[file_company_id]}
+        for file_company_id, _ in files
+        if file_company_id in companies
+    ]
+    logger.info(f"Re-analyzing {len(paths):,} archive files...")
+    processed = changed = 0
+    if processes > 0:
+        # spawn: forked children would share the parent's DB connections
+        executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        with executor:
+            results = list(executor.map(_reanalyze_archive_file, paths, file_companies))
+    else:
+        results = list(map(_reanalyze_archive_file, paths, file_companies))
+    for path, (count, file_changed) in zip(paths, results, strict=True):
+        processed += count
+        changed += file_changed
+        if file_changed:
+            logger.info(f"Rewrote {path}, {file_changed:,} of {count:,} runs changed.")
+    logger.info(f"Re-analyzed {processed:,} archived runs, {changed:,} changed.")
+    return processed, changed
+
+
+def _write_batch(checkpoint: ReanalysisCheckpoint, changes: list[dict], last_id: int, count: int):
+    # Changes and checkpoint are committed together, a restart doesn't skip or redo a batch
+    with get_celery_db() as db:
+        if changes:
+            db.exec(update(MonitoredPromptRun), params=changes)  # type: ignore
+            run_ids = [change["id"] for change in changes]
+            prompt_ids = db.exec(
+                select(MonitoredPromptRun.monitored_prompt_id)
+                .where(col(MonitoredPromptRun.id).in_(run_ids))
+                .distinct()
+            ).all()
+            with updating_company_stats(db, prompt_ids):
+                save_run_citations(db, run_ids)
+                rebuild_prompt_results(db, prompt_ids)
+            # Days with archived runs keep their rollups
+            for company_id, day in sorted(get_run_days(db, run_ids)):
+                rebuild_daily_stats(db, company_id, day)
+        checkpoint.last_run_id = last_id
+        checkpoint.processed += count
+        checkpoint.changed += len(changes)
+        save_reanalysis_checkpoint(db, checkpoint)
+    logger.info(
+        f"Re-analyzed {checkpoint.processed:,} runs, {checkpoint.changed:,} changed, "
+        f"up to run {last_id}."
+    )
+
+
+def run_reanalysis(
+    *,
+    name: str | None = None,
+    company_id: int | None = None,
+    processes: int | None = None,
+    batch_size: int | None = None,
+    restart: bool = False,
+) -> ReanalysisCheckpoint:
+    name = name or (f"company-{company_id}" if company_id is not None else "all")
+    processes = settings.reanalysis_processes if processes is None else processes
+    batch_size = batch_size or settings.reanalysis_batch_size
+    with get_celery_db() as db:
+        if restart:
+            delete_reanalysis_checkpoint(db, name)
+        checkpoint = get_reanalysis_checkpoint(db, name)
+        db.expunge_all()
+    if checkpoint.finished_at is not None:
+        # Rules or aliases changed since the last pass, older runs are stale too
+        checkpoint = ReanalysisCheckpoint(name=name)
+    logger.info(f"Re-analyzing runs of {name} after run {checkpoint.last_run_id}...")
+
+    companies: dict[int, dict] = {}
+    # spawn: forked children would share the parent's DB connections
+    executor = (
+        ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        if processes > 0
+        else None
+    )
+    # Batches are written in order, a few in flight keep the pool busy
+    pending: deque[tuple[Future, int, int]] = deque()
+    try:
+        for rows in _stream_runs(company_id, checkpoint.last_run_id, batch_size):
+            missing = {row[2] for row in rows} - companies.keys()
+            if missing:
+                with get_celery_db() as db:
+                    for missing_id in missing:
+                        company = get_company_by_id(db, missing_id)
+                        assert company is not None
+                        companies[missing_id] = company.model_dump()
+            batch_companies = {row[2]: companies[row[2]] for row in rows}
+            if executor is not None:
+                future = executor.submit(_reanalyze_batch, rows, batch_companies)
+            else:
+                future = Future()
+                future.set_result(_reanalyze_batch(rows, batch_companies))
+            pending.append((future, rows[-1][0], len(rows)))
+            while pending and (len(pending) > 2 * max(processes, 1) or pending[0][0].done()):
+                done, last_id, count = pending.popleft()
+                _write_batch(checkpoint, done.result(), last_id, count)
+        while pending:
+            done, last_id, count = pending.popleft()
+            _write_batch(checkpoint, done.result(), last_id, count)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    with get_celery_db() as db:
+        checkpoint.finished_at = default_now()
+        save_reanalysis_checkpoint(db, checkpoint)
+    logger.info(f"Re-analysis of {name} finished.")
+    return checkpoint
+
+
+@celery_app.task(
+    name="analyzers.reanalyze_runs",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def reanalyze_runs(company_id: int | None = None, restart: bool = False, archived: bool = False):
+    # Celery prefork children are daemonic and can't start a process pool.
+    # Retries continue from the checkpoint.
+    processes = 0 if multiprocessing.current_process().daemon else None
+    if archived:
+        processed, changed = run_archive_reanalysis(company_id=company_id, processes=processes)
+        return {"processed": processed, "changed": changed}
+    checkpoint = run_reanalysis(company_id=company_id, processes=processes, restart=restart)
+    return checkpoint.model_dump(mode="json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--name", help="checkpoint name, defaults to company-<id> or all")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore an interrupted job's checkpoint"
+    )
+    parser.add_argument("--archived", action="store_true", help="re-analyze the archive files")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.archived:
+        run_archive_reanalysis(company_id=args.company_id, processes=args.processes)
+    else:
+        run_reanalysis(
+            name=args.name,
+            company_id=args.company_id,
+            processes=args.processes,
+            batch_size=args.batch_size,
+            restart=args.restart,
+        )
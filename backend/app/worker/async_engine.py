@@ -0,0 +1,225 @@
+"""Prompt monitoring on one event loop, for task_mode=async.
+
+Claims due prompts like the trigger does, but analyzes them itself with the
+async analyzers, many in flight at once, and writes finished prompts in batches.
+With llm_batch_mode, batch channels are queued for a batch job like analyze_prompt
+does, the last channel saved closes the cycle.
+
+    python -m app.worker.async_engine
+"""
+
+import asyncio
+import datetime
+import logging
+import signal
+from dataclasses import dataclass, field
+
+from app.crud.company import get_company_by_id
+from app.crud.llm_batches import queue_batch_requests
+from app.crud.prompts import (
+    claim_prompts_to_refresh,
+    complete_prompt_cycle,
+    get_cycle_providers,
+    holds_prompt_lease,
+    lock_monitored_prompt,
+    reclaim_expired_prompt_leases,
+    save_monitored_prompt_run,
+    skip_prompt_cycle,
+)
+from app.crud.quota import QuotaType, ensure_quota_available, increment_quota
+from app.db import get_celery_db
+from app.llm.batch import get_batch_providers
+from app.llm.prompt_analyzers import analyze_prompt_async, get_channels
+from app.models import Company, MonitoredPrompt, MonitoredPromptRun
+from app.models.types import default_now
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PromptCycle:
+    prompt: MonitoredPrompt
+    company: Company
+    lease_id: int
+    # Channels analyzed here, and all providers of the cycle (batch ones included)
+    channels: dict[str, str]
+    providers: list[str]
+    run_at: datetime.datetime = field(default_factory=default_now)
+    runs: list[MonitoredPromptRun] = field(default_factory=list)
+    # False if a channel failed, the lease then expires and the prompt is retried
+    complete: bool = True
+
+
+def _claim(limit: int) -> tuple[int, list[PromptCycle]]:
+    """Number of claimed prompts, and the cycles to analyze of those that run"""
+    with get_celery_db() as db:
+        reclaimed = reclaim_expired_prompt_leases(db)
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed:,} prompts with expired task lease.")
+        claimed = claim_prompts_to_refresh(db, limit=limit)
+    channels = get_channels()
+    cycles = []
+    with get_celery_db() as db:
+        for prompt_id, lease_id in claimed:
+            prompt = db.get(MonitoredPrompt, prompt_id)
+            if not prompt:
+                continue
+            company = get_company_by_id(db, prompt.company_id)
+            if not company:
+                logger.info(f"Company {prompt.company_id} not found.")
+                skip_prompt_cycle(db, prompt)
+                continue
+            if not ensure_quota_available(db, company, QuotaType.LLM_CALLS):
+                # Released alone, it would be claimed again right away
+                skip_prompt_cycle(db, prompt)
+                continue
+            cycle = PromptCycle(
+                prompt=prompt,
+                company=company,
+                lease_id=lease_id,
+                channels=channels,
+                providers=list(channels),
+            )
+            batch_providers = get_batch_providers(prompt, channels)
+            if batch_providers:
+                # Same cycle, poll_llm_batches saves their runs
+                queue_batch_requests(
+                    db, prompt_id, batch_providers, cycle.run_at, cycle.providers, lease_id
+                )
+                cycle.channels = {p: t for p, t in channels.items() if p not in batch_providers}
+            if cycle.channels:
+                cycles.append(cycle)
+        db.expunge_all()
+    return len(claimed), cycles
+
+
+def _write(cycles: list[PromptCycle]):
+    with get_celery_db() as db:
+        for cycle in cycles:
+            # Serializes with batch runs of the cycle, see save_channel_run
+            prompt = lock_monitored_prompt(db, cycle.prompt.id)  # type: ignore
+            if prompt is None or not holds_prompt_lease(prompt, cycle.lease_id):
+                logger.info(f"Prompt {cycle.prompt.id} lease is gone, dropping its runs.")
+                continue
+            for run in cycle.runs:
+                run.run_at = cycle.run_at
+                save_monitored_prompt_run(db, run)
+            if not cycle.complete:
+                continue
+            finished = get_cycle_providers(db, prompt.id, cycle.run_at)  # type: ignore
+            if not finished.issuperset(cycle.providers):
+                # Waiting for batch channels, the last one saved closes the cycle
+                continue
+            complete_prompt_cycle(db, prompt, cycle.run_at)
+            increment_quota(db, cycle.company, QuotaType.LLM_CALLS)
+    logger.info(f"Saved {len(cycles):,} analyzed prompts.")
+
+
+class AsyncEngine:
+    def __init__(self):
+        self.in_flight: set[asyncio.Task] = set()
+        self.finished: asyncio.Queue[PromptCycle | None] = asyncio.Queue()
+        self.stopping = asyncio.Event()
+
+    async def _analyze_channel(
+        self, prompt: MonitoredPrompt, company: Company, provider: str, analyzer_type: str
+    ) -> MonitoredPromptRun:
+        attempt = 0
+        while True:
+            try:
+                return await analyze_prompt_async(
+                    prompt, company, provider=provider, analyzer_type=analyzer_type
+                )
+            except Exception as e:
+                if attempt >= settings.celery_max_retries:
+                    raise
+                logger.warning(f"Prompt {prompt.id} {provider} failed, retrying: {e}")
+                await asyncio.sleep(2**attempt)
+                attempt += 1
+
+    async def _analyze(self, cycle: PromptCycle):
+        results = await asyncio.gather(
+            *(
+                self._analyze_channel(cycle.prompt, cycle.company, provider, analyzer_type)
+                for provider, analyzer_type in cycle.channels.items()
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, MonitoredPromptRun):
+                cycle.runs.append(result)
+            else:
+                cycle.complete = False
+                logger.error(f"Failed to analyze prompt {cycle.prompt.id}.", exc_info=result)
+        await self.finished.put(cycle)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            cycle = await self.finished.get()
+            if cycle is None:
+                return
+            batch = [cycle]
+            flush_at = loop.time() + settings.async_engine_flush_seconds
+            while len(batch) < settings.async_engine_write_batch_size:
+                try:
+                    cycle = await asyncio.wait_for(self.finished.get(), flush_at - loop.time())
+                except TimeoutError:
+                    break
+                if cycle is None:
+                    done = True
+                    break
+                batch.append(cycle)
+            try:
+                await asyncio.to_thread(_write, batch)
+            except Exception:
+                # Leases of unsaved prompts expire and they are analyzed again
+                logger.exception(f"Failed to save {len(batch):,} analyzed prompts.")
+
+    async def run(self):
+        if not get_channels():
+            logger.info("All channels disabled.")
+            return
+        writer = asyncio.create_task(self._writer())
+        max_in_flight = settings.async_engine_max_in_flight
+        while not self.stopping.is_set():
+            free = max_in_flight - len(self.in_flight)
+            claimed, cycles = await asyncio.to_thread(_claim, free) if free > 0 else (0, [])
+            for cycle in cycles:
+                task = asyncio.create_task(self._analyze(cycle))
+                self.in_flight.add(task)
+                task.add_done_callback(self.in_flight.discard)
+            if claimed:
+                logger.info(f"Claimed {claimed:,} prompts, {len(self.in_flight):,} in flight.")
+            # Prompts skipped or left to batch jobs count too, more may be due
+            if free > 0 and claimed < free:
+                # Nothing more is due, poll again later
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), settings.async_engine_poll_seconds)
+                except TimeoutError:
+                    pass
+            elif self.in_flight:
+                await asyncio.wait(self.in_flight, return_when=asyncio.FIRST_COMPLETED)
+        logger.info(f"Stopping, waiting for {len(self.in_flight):,} prompts in flight...")
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+        await self.finished.put(None)
+        await writer
+
+    def stop(self):
+        self.stopping.set()
+
+
+async def main():
+    engine = AsyncEngine()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, engine.stop)
+    await engine.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -10,6 +10,8 @@ logger = logging.getLogger(__name__)
 
 Q_CRAWL = "crawl"
 Q_PROMPT_WATCH = "prompt_watch"
+# First runs of newly created prompts, consumed by a dedicated worker
+Q_PROMPT_WATCH_PRIORITY = "prompt_watch_priority"
 Q_SCHEDULED = "scheduled"
 Q_LLM_HIGH_PRIORITY = "llm_high_priority"
 
@@ -31,8 +33,22 @@ def create_celery_app(name: str, *, broker: str, backend: str, result_expires: i
 
     celery_app.conf.task_routes = {
         "scheduled.trigger_prompt_monitoring": Q_SCHEDULED,
+        "scheduled.rebalance_prompt_schedule": Q_SCHEDULED,
+        "scheduled.purge_redirect_cache": Q_SCHEDULED,
+        "scheduled.purge_shared_responses": Q_SCHEDULED,
+        "scheduled.submit_llm_batches": Q_SCHEDULED,
+        "scheduled.poll_llm_batches": Q_SCHEDULED,
+        "scheduled.move_run_payloads": Q_SCHEDULED,
+        "scheduled.backfill_run_citations": Q_SCHEDULED,
+        "scheduled.backfill_prompt_results": Q_SCHEDULED,
+        "scheduled.rebuild_company_stats": Q_SCHEDULED,
+        "scheduled.rollup_daily_stats": Q_SCHEDULED,
+        "scheduled.archive_runs": Q_SCHEDULED,
+        "scheduled.maintain_run_partitions": Q_SCHEDULED,
         "fetchers.company_crawl": Q_CRAWL,
         "analyzers.analyze_prompt": Q_PROMPT_WATCH,
+        "analyzers.analyze_prompt_channel": Q_PROMPT_WATCH,
+        "analyzers.reanalyze_runs": Q_SCHEDULED,
         "recommendations.generate": Q_LLM_HIGH_PRIORITY,
     }
     celery_app.conf.beat_schedule = {
@@ -40,6 +56,42 @@ def create_celery_app(name: str, *, broker: str, backend: str, result_expires: i
             "task": "scheduled.trigger_prompt_monitoring",
             "schedule": crontab(*settings.schedule_trigger_prompt_monitoring.split(" ")),
         },
+        "rebalance_prompt_schedule": {
+            "task": "scheduled.rebalance_prompt_schedule",
+            "schedule": crontab(*settings.schedule_rebalance_prompt_schedule.split(" ")),
+        },
+        "purge_redirect_cache": {
+            "task": "scheduled.purge_redirect_cache",
+            "schedule": crontab(*settings.schedule_purge_redirect_cache.split(" ")),
+        },
+        "purge_shared_responses": {
+            "task": "scheduled.purge_shared_responses",
+            "schedule": crontab(*settings.schedule_purge_shared_responses.split(" ")),
+        },
+        "submit_llm_batches": {
+            "task": "scheduled.submit_llm_batches",
+            "schedule": crontab(*settings.schedule_submit_llm_batches.split(" ")),
+        },
+        "poll_llm_batches": {
+            "task": "scheduled.poll_llm_batches",
+            "schedule": crontab(*settings.schedule_poll_llm_batches.split(" ")),
+        },
+        "rebuild_company_stats": {
+            "task": "scheduled.rebuild_company_stats",
+            "schedule": crontab(*settings.schedule_rebuild_company_stats.split(" ")),
+        },
+        "rollup_daily_stats": {
+            "task": "scheduled.rollup_daily_stats",
+            "schedule": crontab(*settings.schedule_rollup_daily_stats.split(" ")),
+        },
+        "archive_runs": {
+            "task": "scheduled.archive_runs",
+            "schedule": crontab(*settings.schedule_archive_runs.split(" ")),
+        },
+        "maintain_run_partitions": {
+            "task": "scheduled.maintain_run_partitions",
+            "schedule": crontab(*settings.schedule_maintain_run_partitions.split(" ")),
+        },
     }
     return celery_app
 
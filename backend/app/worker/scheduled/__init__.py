@@ -1,5 +1,29 @@
+from .archive_runs import archive_runs
+from .backfill_prompt_results import backfill_prompt_results
+from .backfill_run_citations import backfill_run_citations
+from .maintain_run_partitions import maintain_run_partitions
+from .move_run_payloads import move_run_payloads
+from .poll_llm_batches import poll_llm_batches
+from .purge_redirect_cache import purge_redirect_cache
+from .purge_shared_responses import purge_shared_responses
+from .rebalance_prompt_schedule import rebalance_prompt_schedule
+from .rebuild_company_stats import rebuild_company_stats
+from .rollup_daily_stats import rollup_daily_stats
+from .submit_llm_batches import submit_llm_batches
 from .trigger_prompt_monitoring import trigger_prompt_monitoring
 
 __all__ = [
+    "archive_runs",
+    "backfill_prompt_results",
+    "backfill_run_citations",
+    "maintain_run_partitions",
+    "move_run_payloads",
+    "poll_llm_batches",
+    "purge_redirect_cache",
+    "purge_shared_responses",
+    "rebalance_prompt_schedule",
+    "rebuild_company_stats",
+    "rollup_daily_stats",
+    "submit_llm_batches",
     "trigger_prompt_monitoring",
 ]
@@ -0,0 +1,75 @@
+"""Moves runs older than run_archive_after_days to the archive files, see app.archive.
+
+Files are written before the runs are deleted, an interrupted job leaves runs
+in both places at worst. New runs are rolled up first, then the rollups of the
+archived days are frozen: they count the archived runs and are not recomputed
+anymore, see crud.rollups.freeze_daily_stats. Prompt results keep the archived
+runs' counts aside, backfill_prompt_results adds them back.
+
+    python -m app.worker.scheduled.archive_runs [--days 365]
+"""
+
+import argparse
+import datetime
+import logging
+from collections import defaultdict
+
+from app.archive import archive_runs as write_archive
+from app.archive import run_to_record
+from app.crud.prompts import archive_prompt_results, delete_runs, get_runs_to_archive
+from app.crud.rollups import freeze_daily_stats
+from app.db import get_celery_db
+from app.models.types import default_now
+from app.settings import settings
+
+from ..celery_app import celery_app
+from .rollup_daily_stats import rollup_new_runs
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.archive_runs",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def archive_runs(days: int | None = None, batch_size: int = 1000):
+    days = days or settings.run_archive_after_days
+    if not days:
+        logger.info("Run archiving is disabled.")
+        return 0
+    before = default_now() - datetime.timedelta(days=days)
+    rollup_new_runs()
+    with get_celery_db() as db:
+        freeze_daily_stats(db, before)
+    archived = 0
+    last_id = 0
+    while True:
+        with get_celery_db() as db:
+            runs = get_runs_to_archive(db, before, last_id, batch_size)
+            if not runs:
+                break
+            partitions: defaultdict[tuple[int, str], list[dict]] = defaultdict(list)
+            for run, company_id, raw_response in runs:
+                month = f"{run.run_at:%Y-%m}"
+                partitions[company_id, month].append(run_to_record(run, company_id, raw_response))
+            for (company_id, month), records in partitions.items():
+                write_archive(company_id, month, records)
+            run_ids = [run.id for run, _, _ in runs if run.id is not None]
+            archive_prompt_results(db, run_ids)
+            delete_runs(db, run_ids, before)
+        archived += len(run_ids)
+        last_id = run_ids[-1]
+        logger.info(f"Archived {archived:,} runs, up to run {last_id}.")
+    logger.info(f"Archived {archived:,} runs from before {before:%Y-%m-%d}.")
+    return archived
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, help="defaults to run_archive_after_days")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    archive_runs(args.days)
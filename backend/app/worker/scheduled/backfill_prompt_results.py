@@ -0,0 +1,41 @@
+"""Builds monitored_prompt_results for prompts with runs from before the table existed.
+
+Safe to interrupt and run again, results of a prompt are recomputed from its runs.
+
+    python -m app.worker.scheduled.backfill_prompt_results
+"""
+
+import logging
+
+from app.crud.prompts import backfill_prompt_results as backfill_batch
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.backfill_prompt_results",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def backfill_prompt_results(batch_size: int = 1000):
+    last_id = 0
+    while True:
+        with get_celery_db() as db:
+            next_id = backfill_batch(db, last_id, batch_size)
+        if next_id is None:
+            break
+        last_id = next_id
+        logger.info(f"Rebuilt results of prompts up to {last_id}.")
+    logger.info("Rebuilt results of all prompts.")
+    return last_id
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backfill_prompt_results()
@@ -0,0 +1,41 @@
+"""Builds run_citations for runs saved before the table existed.
+
+Safe to interrupt and run again, existing citations of a run are replaced.
+
+    python -m app.worker.scheduled.backfill_run_citations
+"""
+
+import logging
+
+from app.crud.prompts import backfill_run_citations as backfill_batch
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.backfill_run_citations",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def backfill_run_citations(batch_size: int = 1000):
+    last_id = 0
+    while True:
+        with get_celery_db() as db:
+            next_id = backfill_batch(db, last_id, batch_size)
+        if next_id is None:
+            break
+        last_id = next_id
+        logger.info(f"Built citations of runs up to {last_id}.")
+    logger.info("Built citations of all runs.")
+    return last_id
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backfill_run_citations()
@@ -0,0 +1,51 @@
+"""Creates the monthly partitions of monitored_prompt_runs ahead of the runs and
+drops the old ones archiving emptied, see app.crud.run_partitions. Postgres only.
+
+    python -m app.worker.scheduled.maintain_run_partitions
+"""
+
+import datetime
+import logging
+
+from app.crud.run_partitions import (
+    add_months,
+    create_run_partitions,
+    drop_empty_run_partitions,
+    is_partitioned,
+)
+from app.db import get_celery_db
+from app.models.types import default_now
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.maintain_run_partitions",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def maintain_run_partitions():
+    today = default_now().date()
+    with get_celery_db() as db:
+        if not is_partitioned(db):
+            logger.info("monitored_prompt_runs isn't partitioned.")
+            return {"created": [], "dropped": []}
+        created = create_run_partitions(
+            db, today, add_months(today, settings.run_partition_months_ahead)
+        )
+        dropped = []
+        if settings.run_archive_after_days:
+            before = today - datetime.timedelta(days=settings.run_archive_after_days)
+            dropped = drop_empty_run_partitions(db, before)
+    logger.info(f"Created partitions {created}, dropped {dropped}.")
+    return {"created": created, "dropped": dropped}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    maintain_run_partitions()
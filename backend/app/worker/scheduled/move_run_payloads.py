@@ -0,0 +1,42 @@
+"""Moves inline raw_response of runs saved before monitored_prompt_run_payloads.
+
+Safe to interrupt and run again. Postgres only gives the space back to the OS
+after VACUUM FULL (or pg_repack) of monitored_prompt_runs.
+
+    python -m app.worker.scheduled.move_run_payloads
+"""
+
+import logging
+
+from app.crud.prompts import move_raw_responses_to_payloads
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.move_run_payloads",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def move_run_payloads(batch_size: int = 1000):
+    last_id = 0
+    while True:
+        with get_celery_db() as db:
+            next_id = move_raw_responses_to_payloads(db, last_id, batch_size)
+        if next_id is None:
+            break
+        last_id = next_id
+        logger.info(f"Moved raw responses of runs up to {last_id}.")
+    logger.info("Moved all raw responses.")
+    return last_id
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    move_run_payloads()
@@ -0,0 +1,138 @@
+import datetime
+import json
+import logging
+from collections.abc import Sequence
+
+from app.crud.company import get_company_by_id
+from app.crud.llm_batches import (
+    delete_batch_requests,
+    finish_batch_job,
+    get_batch_job_requests,
+    get_submitted_batch_jobs,
+    renew_batch_prompt_leases,
+)
+from app.crud.prompts import get_cycle_providers
+from app.db import get_celery_db
+from app.llm.batch import COMPLETED, FAILED, build_batch_run, get_batch_backend
+from app.models import Company
+from app.models.llm_batch import LLMBatchJob, LLMBatchJobStatus, LLMBatchRequest
+from app.models.monitored_prompt import MonitoredPrompt
+from app.settings import settings
+from app.worker.analyzers.analyze_prompt_channel import save_channel_run
+from app.worker.task_dispatcher import dispatch_tasks
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+def _get_cycle_at(request: LLMBatchRequest) -> datetime.datetime:
+    return request.cycle_at.replace(tzinfo=datetime.UTC)
+
+
+def run_without_batch(requests: Sequence[LLMBatchRequest]):
+    """Falls back to the regular channel tasks, in the same cycle"""
+    dispatch_tasks(
+        "analyzers.analyze_prompt_channel",
+        [
+            (
+                request.monitored_prompt_id,
+                request.provider,
+                "api",
+                _get_cycle_at(request).isoformat(),
+                json.loads(request.providers),
+                request.lease_id,
+            )
+            for request in requests
+        ],
+    )
+    with get_celery_db() as db:
+        delete_batch_requests(db, [request.id for request in requests if request.id])
+
+
+def _ingest_request(request: LLMBatchRequest, response: dict, companies: dict[int, Company]):
+    cycle_at = _get_cycle_at(request)
+    with get_celery_db() as db:
+        prompt = db.get(MonitoredPrompt, request.monitored_prompt_id)
+        if not prompt:
+            return
+        # Ingested before, e.g. the poll was interrupted
+        already_saved = request.provider in get_cycle_providers(db, prompt.id, cycle_at)
+        db.expunge(prompt)
+        if prompt.company_id not in companies:
+            company = get_company_by_id(db, prompt.company_id)
+            if not company:
+                return
+            db.expunge(company)
+            companies[prompt.company_id] = company
+    company = companies[prompt.company_id]
+    run = None
+    if not already_saved:
+        run = build_batch_run(request.provider, prompt, company, response)
+        run.run_at = cycle_at
+    assert prompt.id is not None
+    save_channel_run(
+        prompt.id,
+        company,
+        request.provider,
+        run,
+        cycle_at,
+        json.loads(request.providers),
+        request.lease_id,
+    )
+
+
+def _ingest(job: LLMBatchJob, results: dict[str, dict]):
+    with get_celery_db() as db:
+        requests = get_batch_job_requests(db, job)
+        db.expunge_all()
+    companies: dict[int, Company] = {}
+    missing = []
+    for request in requests:
+        response = results.get(str(request.id))
+        if response is None:
+            missing.append(request)
+            continue
+        try:
+            _ingest_request(request, response, companies)
+        except Exception:
+            logger.exception(f"Failed to ingest batch request {request.id}.")
+            missing.append(request)
+            continue
+        with get_celery_db() as db:
+            delete_batch_requests(db, [request.id])  # type: ignore
+    if missing:
+        logger.warning(f"{len(missing):,} requests of batch job {job.id} failed, running them.")
+        run_without_batch(missing)
+    logger.info(f"Ingested {len(requests) - len(missing):,} results of batch job {job.id}.")
+
+
+@celery_app.task(
+    name="scheduled.poll_llm_batches",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def poll_llm_batches():
+    with get_celery_db() as db:
+        renew_batch_prompt_leases(db)
+        jobs = get_submitted_batch_jobs(db)
+        db.expunge_all()
+    for job in jobs:
+        backend = get_batch_backend()
+        assert job.external_id is not None
+        status = backend.get_status(job.external_id)
+        if status == COMPLETED:
+            _ingest(job, backend.get_results(job.external_id))
+            with get_celery_db() as db:
+                finish_batch_job(db, job, LLMBatchJobStatus.COMPLETED)
+        elif status == FAILED:
+            logger.warning(f"Batch job {job.id} failed, running its requests without batch.")
+            with get_celery_db() as db:
+                requests = get_batch_job_requests(db, job)
+                db.expunge_all()
+            run_without_batch(requests)
+            with get_celery_db() as db:
+                finish_batch_job(db, job, LLMBatchJobStatus.FAILED, error=status)
+    return len(jobs)
@@ -0,0 +1,23 @@
+import logging
+
+from app.crud.redirect_cache import delete_expired_redirects
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.purge_redirect_cache",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def purge_redirect_cache():
+    with get_celery_db() as db:
+        deleted = delete_expired_redirects(db)
+    logger.info(f"Deleted {deleted:,} expired redirect cache entries.")
+    return deleted
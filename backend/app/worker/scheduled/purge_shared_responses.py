@@ -0,0 +1,23 @@
+import logging
+
+from app.crud.shared_responses import delete_expired_shared_responses
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.purge_shared_responses",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def purge_shared_responses():
+    with get_celery_db() as db:
+        deleted = delete_expired_shared_responses(db)
+    logger.info(f"Deleted {deleted:,} expired shared responses.")
+    return deleted
@@ -0,0 +1,26 @@
+import logging
+
+from app.crud.prompts import rebalance_prompt_schedule as rebalance_prompt_schedule_db
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.rebalance_prompt_schedule",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def rebalance_prompt_schedule():
+    if not settings.prompt_schedule_leveling:
+        logger.info("Prompt schedule leveling is disabled.")
+        return 0
+    with get_celery_db() as db:
+        moved = rebalance_prompt_schedule_db(db)
+    logger.info(f"Rebalanced next run of {moved:,} prompts.")
+    return moved
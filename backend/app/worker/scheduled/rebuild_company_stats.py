@@ -0,0 +1,46 @@
+"""Rebuilds the dashboard stats of companies, recovers from drift of the incremental updates.
+
+python -m app.worker.scheduled.rebuild_company_stats [--company-id 1]
+"""
+
+import argparse
+import logging
+
+from app.crud.company import get_companies
+from app.crud.company_stats import rebuild_company_stats as rebuild_stats
+from app.db import get_celery_db
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="scheduled.rebuild_company_stats",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def rebuild_company_stats(company_id: int | None = None):
+    if company_id is not None:
+        company_ids = [company_id]
+    else:
+        with get_celery_db() as db:
+            company_ids = [company.id for company in get_companies(db)]
+    for company_id in company_ids:
+        assert company_id is not None
+        # One transaction per company, keeps the stats rows locked briefly
+        with get_celery_db() as db:
+            rebuild_stats(db, company_id)
+    logger.info(f"Rebuilt stats of {len(company_ids):,} companies.")
+    return len(company_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--company-id", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    rebuild_company_stats(args.company_id)
@@ -0,0 +1,91 @@
+"""Rolls up new runs into the daily trend tables, see crud.rollups.
+
+Runs are picked up by id after a watermark and the (company, day) they fall in
+is recomputed, so a run committed after a higher id was rolled up is counted
+the next time its day is. --since recomputes every day from a date, e.g. after
+changing what they count. Days with archived runs are skipped, see archive_runs.
+
+    python -m app.worker.scheduled.rollup_daily_stats [--since 2026-01-01]
+"""
+
+import argparse
+import datetime
+import logging
+
+from app.crud.company import get_companies
+from app.crud.rollups import (
+    get_new_run_days,
+    get_rollup_watermark,
+    rebuild_daily_stats,
+    save_rollup_watermark,
+)
+from app.db import get_celery_db
+from app.models.types import default_now
+from app.settings import settings
+
+from ..celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "daily_stats"
+
+
+def rollup_new_runs(batch_size: int = 1000) -> int:
+    with get_celery_db() as db:
+        watermark = get_rollup_watermark(db, WATERMARK)
+        db.expunge_all()
+    rolled_up = 0
+    while True:
+        # Rollups and watermark are committed together
+        with get_celery_db() as db:
+            last_id, days = get_new_run_days(db, watermark.last_run_id, batch_size)
+            if last_id is None:
+                break
+            for company_id, day in sorted(days):
+                rebuild_daily_stats(db, company_id, day)
+            watermark.last_run_id = last_id
+            watermark = save_rollup_watermark(db, watermark)
+            db.expunge(watermark)
+        rolled_up += len(days)
+    logger.info(f"Rolled up {rolled_up:,} company days, up to run {watermark.last_run_id}.")
+    return rolled_up
+
+
+def rollup_since(since: datetime.date, company_id: int | None = None) -> int:
+    if company_id is not None:
+        company_ids = [company_id]
+    else:
+        with get_celery_db() as db:
+            company_ids = [company.id for company in get_companies(db)]
+    days = (default_now().date() - since).days + 1
+    rolled_up = 0
+    for company_id in company_ids:
+        assert company_id is not None
+        with get_celery_db() as db:
+            for offset in range(days):
+                day = since + datetime.timedelta(days=offset)
+                rolled_up += rebuild_daily_stats(db, company_id, day)
+    logger.info(f"Rolled up {rolled_up:,} company days of {len(company_ids):,} companies.")
+    return rolled_up
+
+
+@celery_app.task(
+    name="scheduled.rollup_daily_stats",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def rollup_daily_stats(since: str | None = None, company_id: int | None = None):
+    if since is not None:
+        return rollup_since(datetime.date.fromisoformat(since), company_id)
+    return rollup_new_runs()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--since", help="recompute every day from this date (YYYY-MM-DD)")
+    parser.add_argument("--company-id", type=int, help="with --since, only this company")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    rollup_daily_stats(args.since, args.company_id)
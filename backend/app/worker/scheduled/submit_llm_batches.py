@@ -0,0 +1,82 @@
+import datetime
+import logging
+
+from app.crud.llm_batches import (
+    create_batch_job,
+    finish_batch_job,
+    get_pending_batch_providers,
+    reset_unsubmitted_batch_jobs,
+    save_batch_job,
+)
+from app.crud.prompts import get_monitored_prompt_by_ids
+from app.db import get_celery_db
+from app.llm.batch import get_batch_backend, get_batch_request
+from app.models.llm_batch import LLMBatchJob, LLMBatchJobStatus
+from app.models.types import default_now
+from app.settings import settings
+
+from ..celery_app import celery_app
+from .poll_llm_batches import run_without_batch
+
+logger = logging.getLogger(__name__)
+
+
+def _submit(provider: str) -> int:
+    model = getattr(settings, f"api_monitoring_model_{provider}")
+    job = LLMBatchJob(provider=provider, model=model, backend=settings.llm_batch_backend)
+    with get_celery_db() as db:
+        requests = create_batch_job(db, job, settings.llm_batch_max_requests)
+        prompts = {
+            prompt.id: prompt
+            for prompt in get_monitored_prompt_by_ids(
+                db, [request.monitored_prompt_id for request in requests]
+            )
+        }
+        body = {
+            str(request.id): get_batch_request(provider, prompts[request.monitored_prompt_id])
+            for request in requests
+        }
+        db.expunge_all()
+    if not requests:
+        with get_celery_db() as db:
+            finish_batch_job(db, job, LLMBatchJobStatus.COMPLETED)
+        return 0
+    try:
+        job.external_id = get_batch_backend().submit(provider, model, body)
+    except Exception as e:
+        logger.exception(f"Failed to submit batch job {job.id}, running it without batch.")
+        with get_celery_db() as db:
+            finish_batch_job(db, job, LLMBatchJobStatus.FAILED, error=str(e))
+        run_without_batch(requests)
+        return 0
+    job.status = LLMBatchJobStatus.SUBMITTED
+    with get_celery_db() as db:
+        save_batch_job(db, job)
+    logger.info(f"Submitted batch job {job.id} with {len(requests):,} {provider} requests.")
+    return len(requests)
+
+
+@celery_app.task(
+    name="scheduled.submit_llm_batches",
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.celery_max_retries,
+)
+def submit_llm_batches():
+    with get_celery_db() as db:
+        # The job is committed before submitting it, a crash in between leaves it created
+        reset = reset_unsubmitted_batch_jobs(
+            db,
+            default_now() - datetime.timedelta(seconds=settings.llm_batch_submit_timeout_seconds),
+        )
+        if reset:
+            logger.warning(f"Reset {reset:,} batch jobs never submitted.")
+        providers = get_pending_batch_providers(db)
+    submitted = 0
+    for provider in providers:
+        while count := _submit(provider):
+            submitted += count
+            if count < settings.llm_batch_max_requests:
+                break
+    return submitted
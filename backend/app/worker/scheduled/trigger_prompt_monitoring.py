@@ -1,15 +1,81 @@
 import logging
+import time
 
-from app.crud.prompts import get_prompt_ids_to_refresh, mark_prompts_as_scheduled
+from app.crud.prompts import (
+    claim_prompts_to_refresh,
+    count_prompts_to_refresh,
+    reclaim_expired_prompt_leases,
+    release_prompt_leases,
+)
 from app.db import get_celery_db
+from app.models.prompt_monitoring import PromptMonitoringTriggerStats
 from app.settings import settings
-from app.worker.task_dispatcher import dispatch_task
+from app.worker.task_dispatcher import dispatch_tasks
 
-from ..celery_app import celery_app
+from ..celery_app import Q_PROMPT_WATCH_PRIORITY, celery_app
 
 logger = logging.getLogger(__name__)
 
 
+def _claim_and_dispatch(
+    stats: PromptMonitoringTriggerStats,
+    drain: bool,
+    deadline: float,
+    *,
+    first_run: bool,
+    queue: str | None = None,
+):
+    batch_size = settings.trigger_prompt_monitoring_batch_size
+    while True:
+        # Checked before claiming, claimed prompts stay leased until dispatched or released
+        if time.monotonic() >= deadline:
+            logger.info("Prompt monitoring trigger ran out of time budget.")
+            return
+        # Claim is committed before dispatching, so an overlapping trigger
+        # (beat tick or cron endpoint) can't pick the same prompts.
+        with get_celery_db() as db:
+            claimed = list(claim_prompts_to_refresh(db, limit=batch_size, first_run=first_run))
+        # (prompt_id, lease_id), the lease id fences off tasks of a reclaimed lease
+        result = dispatch_tasks(
+            "analyzers.analyze_prompt",
+            claimed,
+            queue=queue,
+            deadline=deadline,
+        )
+        if result.cancelled:
+            # Inline batch ran out of time, let the next trigger pick these up
+            with get_celery_db() as db:
+                release_prompt_leases(db, [args[0] for args in result.cancelled])
+        stats.dispatched += len(claimed) - len(result.cancelled)
+        stats.succeeded += result.succeeded
+        stats.failed += result.failed
+        stats.timed_out += result.timed_out
+        stats.cancelled += len(result.cancelled)
+        if not drain or len(claimed) < batch_size:
+            return
+
+
+def _dispatch_due_prompts(drain: bool) -> PromptMonitoringTriggerStats:
+    started_at = time.monotonic()
+    with get_celery_db() as db:
+        reclaimed = reclaim_expired_prompt_leases(db)
+    if reclaimed:
+        logger.warning(f"Reclaimed {reclaimed:,} prompts with expired task lease.")
+    with get_celery_db() as db:
+        due = count_prompts_to_refresh(db)
+    stats = PromptMonitoringTriggerStats(due=due, dispatched=0, remaining=0, reclaimed=reclaimed)
+    if not due:
+        return stats
+    deadline = started_at + settings.trigger_prompt_monitoring_max_seconds
+    # First runs of new prompts go first and to their own queue,
+    # so new companies don't wait behind the recurring backlog.
+    _claim_and_dispatch(stats, drain, deadline, first_run=True, queue=Q_PROMPT_WATCH_PRIORITY)
+    _claim_and_dispatch(stats, drain, deadline, first_run=False)
+    with get_celery_db() as db:
+        stats.remaining = count_prompts_to_refresh(db)
+    return stats
+
+
 @celery_app.task(
     name="scheduled.trigger_prompt_monitoring",
     acks_late=True,
@@ -17,15 +83,18 @@ logger = logging.getLogger(__name__)
     retry_backoff=True,
     max_retries=settings.celery_max_retries,
 )
-def trigger_prompt_monitoring():
-    scheduled_count = 0
-    with get_celery_db() as db:
-        scheduled_ids = list(get_prompt_ids_to_refresh(db, limit=500))
-        if not scheduled_ids:
-            logger.info("No prompts for monitoring.")
-            return
-        for prompt_id in scheduled_ids:
-            dispatch_task("analyzers.analyze_prompt", args=(prompt_id,))
-        scheduled_count += len(scheduled_ids)
-        mark_prompts_as_scheduled(db, scheduled_ids)
-    logger.info(f"Scheduled {scheduled_count:,} prompts for monitoring.")
+def trigger_prompt_monitoring(drain: bool | None = None):
+    if settings.task_mode == "async":
+        logger.info("Prompt monitoring is run by the async engine.")
+        return PromptMonitoringTriggerStats(due=0, dispatched=0, remaining=0).model_dump()
+    if drain is None:
+        drain = settings.trigger_prompt_monitoring_drain
+    stats = _dispatch_due_prompts(drain)
+    if not stats.due:
+        logger.info("No prompts for monitoring.")
+    else:
+        logger.info(
+            f"Scheduled {stats.dispatched:,} of {stats.due:,} due prompts for monitoring, "
+            f"{stats.remaining:,} left."
+        )
+    return stats.model_dump()
@@ -1,4 +1,10 @@
+import logging
+import math
+import time
 from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from pydantic import BaseModel
 
 from app.settings import settings
 from app.worker.analyzers.analyze_prompt import analyze_prompt
@@ -6,6 +12,16 @@ from app.worker.celery_app import celery_app
 from app.worker.fetchers.company_crawl import fetch_company_crawl
 from app.worker.recommendations.generate import generate
 
+logger = logging.getLogger(__name__)
+
+
+class TaskBatchResult(BaseModel):
+    succeeded: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    # Args of tasks that never started, the caller should release or retry them
+    cancelled: list[tuple] = []
+
 
 def _run_inline(task_name: str, args: Sequence[object]):
     if task_name == "fetchers.company_crawl":
@@ -20,8 +36,83 @@ def _run_inline(task_name: str, args: Sequence[object]):
     raise ValueError(f"Unsupported inline task: {task_name}")
 
 
-def dispatch_task(task_name: str, args: Sequence[object] = ()):
+def _collect(future: Future, task_name: str, result: TaskBatchResult):
+    exc = future.exception()
+    if exc is None:
+        result.succeeded += 1
+        return
+    result.failed += 1
+    logger.error(f"Inline task {task_name} failed.", exc_info=exc)
+
+
+def _run_inline_batch(
+    task_name: str, args_list: Sequence[Sequence[object]], deadline: float | None
+) -> TaskBatchResult:
+    result = TaskBatchResult()
+    task_timeout = settings.inline_task_timeout_seconds
+    started_at: dict[int, float] = {}
+
+    def run(index: int, args: Sequence[object]):
+        started_at[index] = time.monotonic()
+        _run_inline(task_name, args)
+
+    executor = ThreadPoolExecutor(settings.inline_max_workers, thread_name_prefix="inline-task")
+    futures = {executor.submit(run, i, args): i for i, args in enumerate(args_list)}
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            task_deadlines = [
+                started_at[futures[f]] + task_timeout for f in pending if futures[f] in started_at
+            ]
+            # Wake up at least every second to pick up tasks that started meanwhile
+            wake_at = min([*task_deadlines, deadline or math.inf, now + 1])
+            done, pending = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                _collect(future, task_name, result)
+            now = time.monotonic()
+            expired = {
+                f
+                for f in pending
+                if futures[f] in started_at and now - started_at[futures[f]] >= task_timeout
+            }
+            result.timed_out += len(expired)
+            pending -= expired
+    finally:
+        for future in sorted(pending, key=futures.__getitem__):
+            if future.cancel():
+                result.cancelled.append(tuple(args_list[futures[future]]))
+            elif future.done():
+                _collect(future, task_name, result)
+            else:
+                result.timed_out += 1
+        # Abandoned tasks keep running in their threads, don't block the caller on them
+        executor.shutdown(wait=False, cancel_futures=True)
+    if result.timed_out:
+        logger.warning(f"{result.timed_out:,} inline {task_name} tasks timed out.")
+    return result
+
+
+def dispatch_task(task_name: str, args: Sequence[object] = (), queue: str | None = None):
     if settings.task_mode == "inline":
         _run_inline(task_name, args)
         return
-    celery_app.send_task(task_name, args=list(args))
+    # queue=None keeps the default routing from celery_app.conf.task_routes
+    celery_app.send_task(task_name, args=list(args), queue=queue)
+
+
+def dispatch_tasks(
+    task_name: str,
+    args_list: Sequence[Sequence[object]],
+    queue: str | None = None,
+    deadline: float | None = None,
+) -> TaskBatchResult:
+    # Inline mode runs the batch concurrently and waits for it, until deadline
+    # (time.monotonic() based). Celery mode just sends the tasks.
+    if settings.task_mode == "inline":
+        return _run_inline_batch(task_name, args_list, deadline)
+    for args in args_list:
+        dispatch_task(task_name, args, queue=queue)
+    return TaskBatchResult()
@@ -0,0 +1,129 @@
+"""Per-call overhead of building provider clients vs the cached ones.
+
+OpenAI calls go to a local keep-alive HTTP server, so the numbers only show
+client construction and TCP connects; with TLS to the real API the gap is larger.
+Gemini only measures client construction from a generated service account file.
+
+    cd backend
+    python -m benchmarks.analyzer_clients --calls 200
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from openai import OpenAI
+
+from app.llm.prompt_analyzers import clients
+from app.settings import settings
+
+COMPLETION = json.dumps(
+    {
+        "id": "c",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "m",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "ok", "annotations": []},
+            }
+        ],
+    }
+).encode()
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        CompletionHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _complete(client: OpenAI):
+    client.chat.completions.create(model="m", messages=[{"role": "user", "content": "p"}])
+
+
+def _bench(name: str, calls: int, get_client):
+    _complete(get_client())  # warm up
+    CompletionHandler.connections = 0
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        _complete(get_client())
+    elapsed = (time.perf_counter() - started_at) / calls * 1000
+    print(f"{name:>24}: {elapsed:6.2f} ms/call, {CompletionHandler.connections} connections")
+
+
+def _write_credentials(path: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    info = {
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "1",
+        "private_key": pem,
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    with open(path, "w") as f:
+        json.dump(info, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    settings.openai_api_key = "bench"
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    _bench("openai, client per call", args.calls, lambda: OpenAI(api_key="bench"))
+    _bench("openai, cached client", args.calls, clients.get_openai_client)
+    server.shutdown()
+
+    settings.vertex_credentials_path = os.path.join(tempfile.mkdtemp(), "credentials.json")
+    _write_credentials(settings.vertex_credentials_path)
+    started_at = time.perf_counter()
+    for _ in range(args.calls):
+        clients._create_gemini_client(settings.vertex_credentials_path, settings.vertex_location)
+    elapsed = (time.perf_counter() - started_at) / args.calls * 1000
+    print(f"{'gemini, client per call':>24}: {elapsed:6.2f} ms/call")
+    clients.get_gemini_client()
+    started_at = time.perf_counter()
+    for _ in range(args.calls):
+        clients.get_gemini_client()
+    elapsed = (time.perf_counter() - started_at) / args.calls * 1000
+    print(f"{'gemini, cached client':>24}: {elapsed:6.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main()
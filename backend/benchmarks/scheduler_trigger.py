@@ -0,0 +1,115 @@
+"""Scheduler trigger query against a growing monitored_prompts table.
+
+The number of due prompts is fixed, only not-due rows (future, inactive,
+leased) grow, so with ix_monitored_prompts_due the timings should stay flat.
+
+    cd backend
+    python -m benchmarks.scheduler_trigger --sizes 10000 100000 1000000
+    python -m benchmarks.scheduler_trigger --dsn postgresql+psycopg://...  # empty database
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.crud.prompts import claim_prompts_to_refresh, count_prompts_to_refresh
+from app.models import Company, MonitoredPrompt
+from app.models.types import default_now
+
+DUE = 1000
+INSERT_BATCH = 10_000
+
+
+def _fill(engine, company_id: int, start: int, stop: int):
+    now = default_now()
+    with engine.begin() as conn:
+        for offset in range(start, stop, INSERT_BATCH):
+            rows = []
+            for i in range(offset, min(offset + INSERT_BATCH, stop)):
+                due = i < DUE
+                rows.append(
+                    {
+                        "company_id": company_id,
+                        "prompt": f"prompt {i}",
+                        "prompt_type": "product",
+                        "refresh_interval_seconds": 3600 * 24 * 7,
+                        "is_active": i % 10 != 0,
+                        "next_run_at": now
+                        + datetime.timedelta(seconds=-i if due else i % (3600 * 24 * 7)),
+                        "task_scheduled_at": now if not due and i % 50 == 1 else None,
+                        "created_at": now,
+                    }
+                )
+            conn.execute(insert(MonitoredPrompt), rows)
+
+
+def _best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings) * 1000
+
+
+def _claim_and_rollback(engine, limit: int):
+    with Session(engine) as db:
+        claim_prompts_to_refresh(db, limit=limit)
+        db.rollback()
+
+
+def _count(engine):
+    with Session(engine) as db:
+        count_prompts_to_refresh(db)
+
+
+def _explain(engine):
+    with Session(engine) as db:
+        statement = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+        query = (
+            "SELECT id FROM monitored_prompts WHERE next_run_at <= :now "
+            "AND task_scheduled_at IS NULL AND is_active IS "
+            + ("1" if engine.dialect.name == "sqlite" else "true")
+            + " ORDER BY next_run_at LIMIT 500"
+        )
+        for row in db.execute(text(f"{statement} {query}"), {"now": default_now()}):
+            print("   ", row[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", default="")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    dsn = args.dsn or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(dsn)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        company = Company(
+            name="bench", description="", website="bench.example", llm_understanding=""
+        )
+        db.add(company)
+        db.commit()
+        company_id = company.id
+
+    filled = 0
+    for size in sorted(args.sizes):
+        _fill(engine, company_id, filled, size)
+        filled = size
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        claim_ms = _best_of(lambda: _claim_and_rollback(engine, args.limit))
+        count_ms = _best_of(lambda: _count(engine))
+        print(f"{size:>10,} prompts: claim {claim_ms:7.2f} ms, count {count_ms:7.2f} ms")
+    _explain(engine)
+
+
+if __name__ == "__main__":
+    main()